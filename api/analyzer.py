@@ -0,0 +1,463 @@
+"""
+Local static analysis behind `codemate review`, `debug` and `optimize`.
+
+Python files are parsed with `ast` and checked for three kinds of findings:
+
+* review   - cyclomatic complexity, long functions, unused imports and
+             unused local variables
+* debug    - likely bugs: bare `except:`, mutable default arguments,
+             `== None`, `is` against literals, unreachable statements,
+             duplicate dictionary keys
+* optimize - performance smells: deeply nested loops, `range(len(...))`,
+             string building with `+=` in loops, membership tests against
+             list literals in loops, `sorted(...)[0]`
+
+Results are cached per file keyed by (path, mtime, size), so re-running on
+an unchanged file costs one stat(). Directory runs send the files that are
+not cached to the offload process pool.
+"""
+
+import ast
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+COMPLEXITY_THRESHOLD = 10
+FUNCTION_LENGTH_THRESHOLD = 60
+NESTED_LOOP_THRESHOLD = 3
+MAX_CACHED_FILES = 5000
+
+# Directories never worth analysing
+SKIP_DIRS = {'.git', '__pycache__', 'node_modules', 'venv', '.venv', 'env', 'build', 'dist', '.tox', '.mypy_cache'}
+
+CATEGORIES = ('review', 'debug', 'optimize')
+
+_FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef)
+_LOOP_NODES = (ast.For, ast.AsyncFor, ast.While)
+_BRANCH_NODES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.IfExp, ast.ExceptHandler,
+                 ast.With, ast.AsyncWith, ast.Assert, ast.comprehension)
+_TERMINATORS = (ast.Return, ast.Raise, ast.Continue, ast.Break)
+
+
+def _finding(category: str, line: int, kind: str, message: str) -> Dict[str, any]:
+    return {"category": category, "line": line, "kind": kind, "message": message}
+
+
+def cyclomatic_complexity(node: ast.AST) -> int:
+    """McCabe complexity of a function: 1 + decision points, nested functions excluded."""
+    complexity = 1
+    stack = list(ast.iter_child_nodes(node))
+    while stack:
+        child = stack.pop()
+        if isinstance(child, _FUNCTION_NODES + (ast.ClassDef, ast.Lambda)):
+            continue
+        if isinstance(child, _BRANCH_NODES):
+            complexity += 1
+            if isinstance(child, ast.comprehension):
+                complexity += len(child.ifs)
+        elif isinstance(child, ast.BoolOp):
+            complexity += len(child.values) - 1
+        elif hasattr(ast, 'match_case') and isinstance(child, ast.match_case):
+            complexity += 1
+        stack.extend(ast.iter_child_nodes(child))
+    return complexity
+
+
+def _function_scope_names(func: ast.AST) -> Tuple[Dict[str, int], set]:
+    """(plain assignments in func's own scope -> first line, names loaded anywhere inside it).
+
+    Only `name = ...` style stores count: loop variables and tuple unpacking
+    are often unused on purpose.
+    """
+    stored: Dict[str, int] = {}
+    loaded = set()
+    declared = set()
+    stack = [(child, True) for child in ast.iter_child_nodes(func)]
+    while stack:
+        node, own_scope = stack.pop()
+        if isinstance(node, (ast.Global, ast.Nonlocal)):
+            declared.update(node.names)
+        elif isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Store):
+            loaded.add(node.id)
+        elif own_scope and isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else ([node.target] if node.value else [])
+            for target in targets:
+                if isinstance(target, ast.Name):
+                    stored.setdefault(target.id, target.lineno)
+        nested = isinstance(node, _FUNCTION_NODES + (ast.ClassDef, ast.Lambda))
+        stack.extend((child, own_scope and not nested) for child in ast.iter_child_nodes(node))
+    for name in declared:
+        stored.pop(name, None)
+    return stored, loaded
+
+
+class _Analyzer(ast.NodeVisitor):
+    def __init__(self):
+        self.findings: List[Dict[str, any]] = []
+        self.loop_depth = 0
+        self.functions = 0
+        self.total_complexity = 0
+
+    def add(self, category: str, node: ast.AST, kind: str, message: str):
+        self.findings.append(_finding(category, getattr(node, 'lineno', 0), kind, message))
+
+    # review
+
+    def visit_FunctionDef(self, node):
+        self.functions += 1
+        complexity = cyclomatic_complexity(node)
+        self.total_complexity += complexity
+        if complexity > COMPLEXITY_THRESHOLD:
+            self.add('review', node, 'complexity',
+                     f"Function '{node.name}' has cyclomatic complexity {complexity} (threshold {COMPLEXITY_THRESHOLD})")
+        length = (getattr(node, 'end_lineno', node.lineno) or node.lineno) - node.lineno + 1
+        if length > FUNCTION_LENGTH_THRESHOLD:
+            self.add('review', node, 'long-function', f"Function '{node.name}' is {length} lines long")
+
+        stored, loaded = _function_scope_names(node)
+        for name, line in sorted(stored.items(), key=lambda item: item[1]):
+            if name not in loaded and not name.startswith('_'):
+                self.findings.append(_finding('review', line, 'unused-variable',
+                                              f"Local variable '{name}' in '{node.name}' is assigned but never used"))
+
+        for default in node.args.defaults + [d for d in node.args.kw_defaults if d is not None]:
+            if isinstance(default, (ast.List, ast.Dict, ast.Set)) or (
+                    isinstance(default, ast.Call) and isinstance(default.func, ast.Name)
+                    and default.func.id in ('list', 'dict', 'set')):
+                self.add('debug', default, 'mutable-default',
+                         f"Mutable default argument in '{node.name}' is shared between calls")
+
+        # Loops in a nested function don't count towards the enclosing loop depth
+        saved_depth, self.loop_depth = self.loop_depth, 0
+        self.generic_visit(node)
+        self.loop_depth = saved_depth
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    # debug
+
+    def visit_ExceptHandler(self, node):
+        if node.type is None:
+            self.add('debug', node, 'bare-except', "Bare 'except:' also catches KeyboardInterrupt and SystemExit")
+        self.generic_visit(node)
+
+    def visit_Compare(self, node):
+        for op, right in zip(node.ops, node.comparators):
+            if isinstance(op, (ast.Eq, ast.NotEq)) and isinstance(right, ast.Constant) and right.value is None:
+                self.add('debug', node, 'none-comparison', "Use 'is None' / 'is not None' instead of '==' / '!='")
+            elif isinstance(op, (ast.Is, ast.IsNot)) and isinstance(right, ast.Constant) \
+                    and isinstance(right.value, (str, bytes, int, float)) and not isinstance(right.value, bool):
+                self.add('debug', node, 'is-literal', "'is' compares identity; use '==' to compare with a literal")
+        self.generic_visit(node)
+
+    def visit_Dict(self, node):
+        seen = set()
+        for key in node.keys:
+            if isinstance(key, ast.Constant):
+                if key.value in seen:
+                    self.add('debug', key, 'duplicate-key', f"Duplicate dictionary key {key.value!r}")
+                seen.add(key.value)
+        self.generic_visit(node)
+
+    def generic_visit(self, node):
+        for field in ('body', 'orelse', 'finalbody'):
+            statements = getattr(node, field, None)
+            if isinstance(statements, list):
+                for statement, following in zip(statements, statements[1:]):
+                    if isinstance(statement, _TERMINATORS):
+                        self.add('debug', following, 'unreachable',
+                                 f"Unreachable code after '{type(statement).__name__.lower()}'")
+                        break
+        super().generic_visit(node)
+
+    # optimize
+
+    def _enter_loop(self, node: ast.AST):
+        self.loop_depth += 1
+        if self.loop_depth == NESTED_LOOP_THRESHOLD:
+            self.add('optimize', node, 'nested-loops',
+                     f"Loops nested {self.loop_depth} deep; consider a dict/set lookup or restructuring")
+
+    def _visit_loop(self, node):
+        self._enter_loop(node)
+        if isinstance(node, (ast.For, ast.AsyncFor)) and _is_range_len(node.iter):
+            self.add('optimize', node, 'range-len', "Iterate directly or use enumerate() instead of range(len(...))")
+        for child in ast.walk(node):
+            if isinstance(child, ast.AugAssign) and isinstance(child.op, ast.Add) and isinstance(child.target, ast.Name) \
+                    and isinstance(child.value, (ast.JoinedStr, ast.Constant)) \
+                    and isinstance(getattr(child.value, 'value', ''), str):
+                self.add('optimize', child, 'string-concat',
+                         "String built with '+=' in a loop; collect parts in a list and ''.join() them")
+                break
+        self.generic_visit(node)
+        self.loop_depth -= 1
+
+    visit_For = visit_AsyncFor = visit_While = _visit_loop
+
+    def _visit_comprehension(self, node, *elements):
+        # Each `for` clause of a comprehension is a loop too
+        depth = self.loop_depth
+        for generator in node.generators:
+            self.visit(generator.iter)
+            self._enter_loop(generator.iter)
+            for condition in generator.ifs:
+                self.visit(condition)
+        for element in elements:
+            self.visit(element)
+        self.loop_depth = depth
+
+    def visit_ListComp(self, node):
+        self._visit_comprehension(node, node.elt)
+
+    visit_SetComp = visit_GeneratorExp = visit_ListComp
+
+    def visit_DictComp(self, node):
+        self._visit_comprehension(node, node.key, node.value)
+
+    def visit_Subscript(self, node):
+        if isinstance(node.value, ast.Call) and isinstance(node.value.func, ast.Name) \
+                and node.value.func.id == 'sorted' and isinstance(node.slice, (ast.Constant, ast.UnaryOp)):
+            self.add('optimize', node, 'sorted-index', "Use min()/max() instead of sorting to take one element")
+        self.generic_visit(node)
+
+
+def _is_range_len(node: ast.AST) -> bool:
+    return (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'range'
+            and len(node.args) == 1 and isinstance(node.args[0], ast.Call)
+            and isinstance(node.args[0].func, ast.Name) and node.args[0].func.id == 'len')
+
+
+def _membership_in_loops(tree: ast.AST) -> List[Dict[str, any]]:
+    findings = []
+    for loop in ast.walk(tree):
+        if not isinstance(loop, _LOOP_NODES):
+            continue
+        for child in ast.walk(loop):
+            if isinstance(child, ast.Compare) and any(isinstance(op, (ast.In, ast.NotIn)) for op in child.ops) \
+                    and any(isinstance(c, ast.List) and len(c.elts) > 3 for c in child.comparators):
+                findings.append(_finding('optimize', child.lineno, 'list-membership',
+                                         "Membership test against a list literal in a loop; use a set"))
+    # Nested loops walk the same nodes more than once
+    unique = {(f["line"], f["kind"]): f for f in findings}
+    return list(unique.values())
+
+
+def _unused_imports(tree: ast.Module) -> List[Dict[str, any]]:
+    imported: Dict[str, Tuple[int, str]] = {}
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            if isinstance(node, ast.ImportFrom) and node.module == '__future__':
+                continue
+            for alias in node.names:
+                if alias.name == '*':
+                    continue
+                name = (alias.asname or alias.name).split('.')[0]
+                imported[name] = (node.lineno, alias.asname or alias.name)
+    if not imported:
+        return []
+
+    used = set()
+    exported = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            used.add(node.id)
+        elif isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == '__all__' for t in node.targets):
+            if isinstance(node.value, (ast.List, ast.Tuple)):
+                exported.update(e.value for e in node.value.elts if isinstance(e, ast.Constant))
+        elif isinstance(node, ast.Constant) and isinstance(node.value, str):
+            # Names used only in string annotations
+            used.update(part for part in node.value.replace('[', ' ').replace(']', ' ').replace(',', ' ').split())
+    return [_finding('review', line, 'unused-import', f"'{shown}' is imported but never used")
+            for name, (line, shown) in sorted(imported.items(), key=lambda item: item[1][0])
+            if name not in used and name not in exported]
+
+
+def analyze_source(source: str, filename: str = '<string>', tree: Optional[ast.AST] = None) -> Dict[str, any]:
+    """Analyse Python source; returns findings plus a few file metrics."""
+    try:
+        if tree is None:
+            tree = ast.parse(source, filename)
+    except SyntaxError as e:
+        return {
+            "findings": [_finding('debug', e.lineno or 0, 'syntax-error', f"Syntax error: {e.msg}")],
+            "functions": 0, "average_complexity": 0.0, "lines": source.count('\n') + 1
+        }
+
+    analyzer = _Analyzer()
+    analyzer.visit(tree)
+    findings = analyzer.findings + _membership_in_loops(tree)
+    # `__init__.py` files import names to re-export them
+    if os.path.basename(filename) != '__init__.py':
+        findings += _unused_imports(tree)
+    findings.sort(key=lambda f: (f["line"], f["kind"]))
+    return {
+        "findings": findings,
+        "functions": analyzer.functions,
+        "average_complexity": round(analyzer.total_complexity / analyzer.functions, 1) if analyzer.functions else 0.0,
+        "lines": source.count('\n') + 1
+    }
+
+
+def analyze_file(path: str) -> Dict[str, any]:
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        source = f.read()
+    return analyze_source(source, path)
+
+
+def analyze_chunk(path: str, recursive: bool = False) -> Dict[str, any]:
+    """offload.run_chunks adapter: every chunk is a single file, so recursive is unused."""
+    try:
+        return analyze_file(path)
+    except OSError as e:
+        return {"findings": [_finding('debug', 0, 'unreadable', str(e))], "functions": 0,
+                "average_complexity": 0.0, "lines": 0}
+
+
+def file_key(path: str) -> Optional[Tuple[str, int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def python_files(root: str) -> List[str]:
+    """All .py files under root, skipping hidden, virtualenv and build directories."""
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS and not d.startswith('.'))
+        files.extend(os.path.join(dirpath, name) for name in sorted(filenames) if name.endswith('.py'))
+    return files
+
+
+class AnalysisCache:
+    """Per-file analysis results (and parsed trees) keyed by (path, mtime, size), LRU-bounded."""
+
+    def __init__(self, max_files: int = MAX_CACHED_FILES):
+        self.max_files = max_files
+        self._entries: "OrderedDict[str, Tuple[Tuple[str, int, int], Dict[str, any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, int, int], field: str):
+        with self._lock:
+            entry = self._entries.get(key[0])
+            if entry is None or entry[0] != key or field not in entry[1]:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key[0])
+            self.hits += 1
+            return entry[1][field]
+
+    def put(self, key: Tuple[str, int, int], field: str, value):
+        with self._lock:
+            entry = self._entries.get(key[0])
+            if entry is None or entry[0] != key:
+                entry = (key, {})
+                self._entries[key[0]] = entry
+            entry[1][field] = value
+            self._entries.move_to_end(key[0])
+            while len(self._entries) > self.max_files:
+                self._entries.popitem(last=False)
+
+    def parse(self, path: str) -> Tuple[str, ast.AST]:
+        """Return (source, tree) for path, reusing the cached tree while the file is unchanged."""
+        key = file_key(path)
+        if key is None:
+            raise FileNotFoundError(path)
+        cached = self.get(key, 'tree')
+        if cached is not None:
+            return cached
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            source = f.read()
+        parsed = (source, ast.parse(source, path))
+        self.put(key, 'tree', parsed)
+        return parsed
+
+    def analyze(self, paths: List[str], run_chunks=None) -> Tuple[Dict[str, Dict[str, any]], int]:
+        """Analyse paths, returning ({path: result}, number served from cache).
+
+        Uncached files go through run_chunks (offload.run_chunks) when
+        given, which spreads them over the process pool.
+        """
+        results = {}
+        pending = []
+        for path in paths:
+            key = file_key(path)
+            cached = self.get(key, 'analysis') if key else None
+            if cached is not None:
+                results[path] = cached
+            else:
+                pending.append((path, key))
+
+        if len(pending) == 1 or (pending and run_chunks is None):
+            for path, key in pending:
+                try:
+                    source, tree = self.parse(path)
+                    results[path] = analyze_source(source, path, tree)
+                except (SyntaxError, OSError):
+                    # analyze_chunk reports both as findings
+                    results[path] = analyze_chunk(path)
+        elif pending:
+            for (path, _), result in zip(pending, run_chunks(analyze_chunk, [(path, False) for path, _ in pending])):
+                results[path] = result
+
+        for path, key in pending:
+            if key is not None:
+                self.put(key, 'analysis', results[path])
+        return results, len(paths) - len(pending)
+
+
+def parse_failures(results: Dict[str, Dict[str, any]]) -> List[Tuple[str, Dict[str, any]]]:
+    """(path, syntax-error finding) for every file that could not be parsed."""
+    return [(path, finding) for path in sorted(results) for finding in results[path]["findings"]
+            if finding["kind"] == 'syntax-error']
+
+
+def format_report(subcommand: str, results: Dict[str, Dict[str, any]], root: str,
+                  cached: int, elapsed: float, max_lines: int = 200) -> str:
+    """Render the findings of one category for the terminal.
+
+    Files that do not parse are listed first whatever the category, since
+    nothing else could be checked in them.
+    """
+    category = subcommand
+    lines = []
+    total = 0
+    files_with_findings = 0
+    shown_path = lambda path: os.path.relpath(path, root) if os.path.isdir(root) else path
+    failures = parse_failures(results)
+    if failures:
+        lines.append("Could not parse:")
+        lines.extend(f"  {shown_path(path)}:{f['line']}  {f['message']}" for path, f in failures)
+        lines.append("")
+    for path in sorted(results):
+        findings = [f for f in results[path]["findings"]
+                    if f["category"] == category and f["kind"] != 'syntax-error']
+        if not findings:
+            continue
+        files_with_findings += 1
+        total += len(findings)
+        shown = shown_path(path)
+        lines.append(f"{shown}:")
+        lines.extend(f"  {f['line']:>5}  {f['kind']:<16} {f['message']}" for f in findings)
+
+    if len(lines) > max_lines:
+        lines = lines[:max_lines] + [f"  ... {total} findings in total, output truncated"]
+
+    header = f"CodeMate {subcommand.title()} (local analysis): {root}"
+    if subcommand == 'review':
+        functions = sum(r["functions"] for r in results.values())
+        complexity = [r["average_complexity"] for r in results.values() if r["functions"]]
+        average = sum(complexity) / len(complexity) if complexity else 0.0
+        header += f"\n{len(results)} files, {sum(r['lines'] for r in results.values())} lines, " \
+                  f"{functions} functions, average complexity {average:.1f}"
+    if not total:
+        lines.append(f"No {category} findings" + (" in the files that parse" if failures else ""))
+    summary = (f"{total} findings in {files_with_findings} of {len(results)} files "
+               f"({elapsed:.2f}s, {cached} cached)")
+    if failures:
+        summary += f"; {len(failures)} files could not be parsed"
+    return "\n".join([header, ""] + lines + ["", summary])
@@ -0,0 +1,251 @@
+"""
+File copy and move engine behind the `cp` and `mv` builtins.
+
+Copies are planned first (one walk collecting directories, files, symlinks
+and the total size), then executed: file data is moved in the kernel with
+`os.copy_file_range` or `os.sendfile` where available, falling back to a
+plain read/write loop, and files are copied concurrently on a thread pool
+(those calls release the GIL). Progress is reported through a
+`jobs.Job` so large operations can run in the background.
+"""
+
+import errno
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+COPY_CHUNK = 8 * 1024 * 1024
+COPY_THREADS = min(8, (os.cpu_count() or 1) * 2)
+
+# Operations at least this big run as background jobs instead of in the request
+BACKGROUND_BYTES = 256 * 1024 * 1024
+BACKGROUND_FILES = 2000
+
+# Errors meaning "this zero-copy call is not supported here", not real I/O errors
+_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF}
+
+
+class CopyCancelled(Exception):
+    pass
+
+
+class CopyPlan:
+    """Everything a copy will do, gathered before any data is written."""
+
+    def __init__(self):
+        self.dirs: List[Tuple[str, str]] = []
+        self.files: List[Tuple[str, str, int]] = []
+        self.links: List[Tuple[str, str]] = []
+        self.errors: List[str] = []
+        self.copied: List[Tuple[str, str]] = []
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(size for _, _, size in self.files)
+
+    @property
+    def total_files(self) -> int:
+        return len(self.files) + len(self.links)
+
+    @property
+    def is_large(self) -> bool:
+        return self.total_bytes >= BACKGROUND_BYTES or self.total_files >= BACKGROUND_FILES
+
+
+def resolve_target(source: str, dest: str, dest_is_dir: bool, dest_must_be_dir: bool = False) -> str:
+    """Where source ends up: inside dest if it is a directory, else dest itself.
+
+    dest_must_be_dir is for a destination written as "dest/": like cp and mv,
+    only a directory may then be renamed to a missing dest; a file raises
+    OSError (ENOTDIR, or ENOENT when dest's parent is missing too).
+    """
+    if dest_is_dir:
+        return os.path.join(dest, os.path.basename(source.rstrip(os.sep)) or source)
+    if dest_must_be_dir and not os.path.isdir(source):
+        code = errno.ENOTDIR if os.path.isdir(os.path.dirname(dest)) else errno.ENOENT
+        raise OSError(code, os.strerror(code), dest)
+    return dest
+
+
+def plan_copy(sources: List[str], dest: str, recursive: bool, command: str = 'cp',
+              dest_must_be_dir: bool = False) -> CopyPlan:
+    """Walk the sources and work out every directory, file and link to copy."""
+    plan = CopyPlan()
+    dest_is_dir = os.path.isdir(dest)
+    if len(sources) > 1 and not dest_is_dir:
+        plan.errors.append(f"{command}: target '{dest}' is not a directory")
+        return plan
+
+    for source in sources:
+        if not os.path.lexists(source):
+            plan.errors.append(f"{command}: cannot stat '{source}': No such file or directory")
+            continue
+        try:
+            target = resolve_target(source, dest, dest_is_dir, dest_must_be_dir)
+        except OSError as e:
+            plan.errors.append(f"{command}: cannot create regular file '{dest}{os.sep}': {e.strerror}")
+            continue
+
+        if os.path.isdir(source) and not os.path.islink(source):
+            if not recursive:
+                plan.errors.append(f"{command}: -r not specified; omitting directory '{source}'")
+                continue
+            real_source = os.path.realpath(source)
+            real_target = os.path.realpath(target)
+            if real_target == real_source or real_target.startswith(real_source + os.sep):
+                plan.errors.append(f"{command}: cannot copy a directory, '{source}', into itself, '{target}'")
+                continue
+            for dirpath, dirnames, filenames in os.walk(source):
+                target_dir = os.path.join(target, os.path.relpath(dirpath, source))
+                plan.dirs.append((dirpath, os.path.normpath(target_dir)))
+                for name in dirnames + filenames:
+                    path = os.path.join(dirpath, name)
+                    if os.path.islink(path):
+                        plan.links.append((os.readlink(path), os.path.join(target_dir, name)))
+                for name in filenames:
+                    path = os.path.join(dirpath, name)
+                    if not os.path.islink(path):
+                        try:
+                            plan.files.append((path, os.path.join(target_dir, name), os.path.getsize(path)))
+                        except OSError as e:
+                            plan.errors.append(f"{command}: cannot stat '{path}': {e.strerror}")
+        elif os.path.islink(source) and recursive:
+            plan.links.append((os.readlink(source), target))
+        else:
+            if os.path.exists(target) and os.path.samefile(source, target):
+                plan.errors.append(f"{command}: '{source}' and '{target}' are the same file")
+                continue
+            plan.files.append((source, target, os.path.getsize(source)))
+        plan.copied.append((source, target))
+    return plan
+
+
+def _copy_fds(fd_in: int, fd_out: int, progress: Callable[[int], None], cancelled: Optional[threading.Event]):
+    """Copy fd_in to fd_out from their current positions, zero-copy when possible."""
+    use_copy_file_range = hasattr(os, 'copy_file_range')
+    use_sendfile = hasattr(os, 'sendfile') and os.name == 'posix'
+    copied = 0
+
+    while use_copy_file_range or use_sendfile:
+        if cancelled is not None and cancelled.is_set():
+            raise CopyCancelled()
+        try:
+            if use_copy_file_range:
+                sent = os.copy_file_range(fd_in, fd_out, COPY_CHUNK)
+            else:
+                sent = os.sendfile(fd_out, fd_in, None, COPY_CHUNK)
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED:
+                raise
+            if use_copy_file_range:
+                use_copy_file_range = False
+            else:
+                use_sendfile = False
+            continue
+        if sent == 0:
+            if copied == 0 and use_copy_file_range:
+                # Some filesystems (procfs, ...) report 0 bytes; confirm with sendfile/read
+                use_copy_file_range = False
+                continue
+            if copied == 0:
+                break
+            return
+        copied += sent
+        progress(sent)
+
+    # Plain read/write fallback
+    buffer = bytearray(min(COPY_CHUNK, 1024 * 1024))
+    view = memoryview(buffer)
+    with open(fd_in, 'rb', closefd=False, buffering=0) as fsrc, open(fd_out, 'wb', closefd=False, buffering=0) as fdst:
+        while True:
+            if cancelled is not None and cancelled.is_set():
+                raise CopyCancelled()
+            n = fsrc.readinto(buffer)
+            if not n:
+                return
+            fdst.write(view[:n])
+            progress(n)
+
+
+def copy_file(source: str, target: str, progress: Callable[[int], None] = lambda n: None,
+              cancelled: Optional[threading.Event] = None):
+    """Copy one file's data and metadata (like shutil.copy2) with progress callbacks."""
+    with open(source, 'rb') as fsrc, open(target, 'wb') as fdst:
+        _copy_fds(fsrc.fileno(), fdst.fileno(), progress, cancelled)
+    shutil.copystat(source, target)
+
+
+def execute_copy(plan: CopyPlan, job=None, threads: int = COPY_THREADS, command: str = 'cp') -> List[str]:
+    """Carry out a plan, returning error messages. Files are copied on a thread pool."""
+    errors = []
+    cancelled = job.cancelled if job is not None else None
+    progress = (lambda n: job.add_progress(nbytes=n)) if job is not None else (lambda n: None)
+
+    for _, target_dir in plan.dirs:
+        os.makedirs(target_dir, exist_ok=True)
+
+    for link_target, target in plan.links:
+        try:
+            if os.path.lexists(target):
+                os.remove(target)
+            os.symlink(link_target, target)
+        except OSError as e:
+            errors.append(f"{command}: cannot create symlink '{target}': {e.strerror}")
+        if job is not None:
+            job.add_progress(items=1)
+
+    def copy_one(entry):
+        source, target, _ = entry
+        try:
+            copy_file(source, target, progress, cancelled)
+        except CopyCancelled:
+            raise
+        except OSError as e:
+            errors.append(f"{command}: cannot copy '{source}': {e.strerror or e}")
+        if job is not None:
+            job.add_progress(items=1)
+
+    if len(plan.files) > 1 and threads > 1:
+        # Largest files first so one big file doesn't start last
+        ordered = sorted(plan.files, key=lambda entry: entry[2], reverse=True)
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            for future in [pool.submit(copy_one, entry) for entry in ordered]:
+                try:
+                    future.result()
+                except CopyCancelled:
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    return errors + [f"{command}: cancelled"]
+    else:
+        for entry in plan.files:
+            try:
+                copy_one(entry)
+            except CopyCancelled:
+                return errors + [f"{command}: cancelled"]
+
+    # Directory timestamps last, deepest first, since copying into them changes them
+    for source_dir, target_dir in reversed(plan.dirs):
+        try:
+            shutil.copystat(source_dir, target_dir)
+        except OSError:
+            pass
+    return errors
+
+
+def remove_path(path: str):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    else:
+        os.remove(path)
+
+
+def try_rename(source: str, target: str) -> bool:
+    """Rename in place; False if source and target are on different filesystems."""
+    try:
+        os.rename(source, target)
+        return True
+    except OSError as e:
+        if e.errno == errno.EXDEV:
+            return False
+        raise
@@ -0,0 +1,550 @@
+"""
+Filesystem change watching for CodeMate Terminal's directory caches.
+
+`get_watcher()` returns an inotify watcher (through ctypes, Linux only) or,
+where inotify is unavailable, a watcher that polls directory mtimes. Either
+one reports the directories whose contents changed to its subscribers.
+`DirectoryCache` is such a subscriber: it caches per-directory results such
+as `ls` listings and `du` totals, drops them when the watcher reports a
+change, and records the changes so the browser can poll for them.
+
+Events from inotify are queued by the kernel as soon as the change happens;
+`flush()` drains them synchronously, so a cache lookup right after `mkdir` or
+`rm` in the same request never returns a stale listing.
+"""
+
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Upper bound on directories watched per process (inotify's default
+# max_user_watches is 8192 and is shared with other programs)
+MAX_WATCHED_DIRS = 4096
+POLL_INTERVAL = 1.0
+
+# inotify constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_LISTING_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+_CONTENT_MASK = _LISTING_MASK | IN_MODIFY | IN_CLOSE_WRITE | IN_ATTRIB
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class BaseWatcher:
+    """Watches directory roots and reports changed directories to subscribers.
+
+    Callbacks receive the absolute path of the directory whose contents
+    changed, or None when changes may have been lost and everything should
+    be treated as stale.
+    """
+
+    # Whether writes to files (not just entries added/removed) are reported
+    tracks_file_changes = False
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._subscribers: List[Callable[[Optional[str]], None]] = []
+        self._roots: Dict[Tuple[str, bool], int] = {}
+
+    def subscribe(self, callback: Callable[[Optional[str]], None]):
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[Optional[str]], None]):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def _notify(self, path: Optional[str]):
+        for callback in list(self._subscribers):
+            try:
+                callback(path)
+            except Exception:
+                pass
+
+    def watch(self, root: str, recursive: bool = False) -> bool:
+        """Start watching root (and its subdirectories); False if it cannot be watched."""
+        key = (os.path.abspath(root), recursive)
+        with self._lock:
+            if key in self._roots:
+                self._roots[key] += 1
+                return True
+            if not self._add_root(*key):
+                return False
+            self._roots[key] = 1
+            return True
+
+    def unwatch(self, root: str, recursive: bool = False):
+        key = (os.path.abspath(root), recursive)
+        with self._lock:
+            if key not in self._roots:
+                return
+            self._roots[key] -= 1
+            if self._roots[key] == 0:
+                del self._roots[key]
+                self._remove_root(*key)
+
+    def _covering_roots(self, path: str) -> int:
+        """Number of recursive roots path lies under."""
+        return sum(1 for root, recursive in self._roots
+                   if recursive and (path == root or path.startswith(root + os.sep)))
+
+    def flush(self):
+        """Deliver any pending change events before returning."""
+
+    def close(self):
+        pass
+
+    def _add_root(self, root: str, recursive: bool) -> bool:
+        raise NotImplementedError
+
+    def _remove_root(self, root: str, recursive: bool):
+        raise NotImplementedError
+
+
+def _subdirectories(root: str, limit: int) -> Optional[List[str]]:
+    """Return root and all directories below it, or None if there are more than limit."""
+    dirs = [root]
+    index = 0
+    while index < len(dirs):
+        try:
+            with os.scandir(dirs[index]) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            dirs.append(entry.path)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        if len(dirs) > limit:
+            return None
+        index += 1
+    return dirs
+
+
+class InotifyWatcher(BaseWatcher):
+    """Linux inotify watcher driven by a background reader thread."""
+
+    tracks_file_changes = True
+
+    def __init__(self):
+        super().__init__()
+        import ctypes
+        import ctypes.util
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._wd_paths: Dict[int, str] = {}
+        self._path_wds: Dict[str, int] = {}
+        self._dir_refs: Dict[str, int] = {}
+        self._read_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='codemate-inotify', daemon=True)
+        self._thread.start()
+
+    def _add_dir(self, path: str) -> bool:
+        if path in self._dir_refs:
+            self._dir_refs[path] += 1
+            return True
+        if len(self._dir_refs) >= MAX_WATCHED_DIRS:
+            return False
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), _CONTENT_MASK)
+        if wd < 0:
+            return False
+        self._wd_paths[wd] = path
+        self._path_wds[path] = wd
+        self._dir_refs[path] = 1
+        return True
+
+    def _remove_dir(self, path: str):
+        if path not in self._dir_refs:
+            return
+        self._dir_refs[path] -= 1
+        if self._dir_refs[path] > 0:
+            return
+        del self._dir_refs[path]
+        wd = self._path_wds.pop(path, None)
+        if wd is not None:
+            self._wd_paths.pop(wd, None)
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+    def _add_root(self, root: str, recursive: bool) -> bool:
+        if not os.path.isdir(root):
+            return False
+        dirs = _subdirectories(root, MAX_WATCHED_DIRS - len(self._dir_refs)) if recursive else [root]
+        if dirs is None:
+            return False
+        added = []
+        for path in dirs:
+            if not self._add_dir(path):
+                for done in added:
+                    self._remove_dir(done)
+                return False
+            added.append(path)
+        return True
+
+    def _remove_root(self, root: str, recursive: bool):
+        if recursive:
+            for path in [p for p in self._dir_refs if p == root or p.startswith(root + os.sep)]:
+                self._remove_dir(path)
+        else:
+            self._remove_dir(root)
+
+    def _handle(self, data: bytes):
+        offset = 0
+        changed = []
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + name_len].rstrip(b'\0')
+            offset += name_len
+
+            if mask & IN_Q_OVERFLOW:
+                changed.append(None)
+                continue
+            with self._lock:
+                directory = self._wd_paths.get(wd)
+                if directory is None:
+                    continue
+                if mask & IN_IGNORED:
+                    # The kernel dropped the watch (directory deleted or unmounted)
+                    self._wd_paths.pop(wd, None)
+                    self._path_wds.pop(directory, None)
+                    self._dir_refs.pop(directory, None)
+                    changed.append(directory)
+                    continue
+                if mask & IN_ISDIR and mask & IN_MOVED_FROM:
+                    # Watches follow the inode, so drop those registered under
+                    # the old path; the subtree is re-added where it lands
+                    old_dir = os.path.join(directory, os.fsdecode(name))
+                    for path in [p for p in self._path_wds if p == old_dir or p.startswith(old_dir + os.sep)]:
+                        old_wd = self._path_wds.pop(path)
+                        self._wd_paths.pop(old_wd, None)
+                        self._dir_refs.pop(path, None)
+                        self._libc.inotify_rm_watch(self._fd, old_wd)
+                        changed.append(path)
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    # New subdirectories of recursive roots are watched too,
+                    # with one reference per root covering them
+                    new_dir = os.path.join(directory, os.fsdecode(name))
+                    for _ in range(self._covering_roots(directory)):
+                        for path in _subdirectories(new_dir, MAX_WATCHED_DIRS) or [new_dir]:
+                            self._add_dir(path)
+            changed.append(directory)
+
+        # Report each directory once per batch, in order
+        seen = set()
+        for directory in changed:
+            if directory not in seen:
+                seen.add(directory)
+                self._notify(directory)
+
+    def _read_pending(self):
+        with self._read_lock:
+            while True:
+                try:
+                    data = os.read(self._fd, 64 * 1024)
+                except BlockingIOError:
+                    return
+                except OSError:
+                    return
+                if not data:
+                    return
+                self._handle(data)
+
+    def _run(self):
+        import select
+        while not self._closed:
+            try:
+                ready, _, _ = select.select([self._fd], [], [], 1.0)
+            except (OSError, ValueError):
+                return
+            if ready:
+                self._read_pending()
+
+    def flush(self):
+        self._read_pending()
+
+    def close(self):
+        self._closed = True
+        try:
+            os.close(self._fd)
+        except OSError:
+            pass
+
+
+class PollingWatcher(BaseWatcher):
+    """Portable fallback that compares directory mtimes.
+
+    Only entries being added, removed or renamed change a directory's
+    mtime, so file writes are not reported (tracks_file_changes is False).
+    """
+
+    def __init__(self, interval: float = POLL_INTERVAL):
+        super().__init__()
+        self.interval = interval
+        self._mtimes: Dict[str, Optional[int]] = {}
+        self._dir_refs: Dict[str, int] = {}
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='codemate-fspoll', daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _mtime(path: str) -> Optional[int]:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _add_dir(self, path: str):
+        if path in self._dir_refs:
+            self._dir_refs[path] += 1
+        else:
+            self._dir_refs[path] = 1
+            self._mtimes[path] = self._mtime(path)
+
+    def _remove_dir(self, path: str):
+        if path in self._dir_refs:
+            self._dir_refs[path] -= 1
+            if self._dir_refs[path] == 0:
+                del self._dir_refs[path]
+                self._mtimes.pop(path, None)
+
+    def _add_root(self, root: str, recursive: bool) -> bool:
+        if not os.path.isdir(root):
+            return False
+        dirs = _subdirectories(root, MAX_WATCHED_DIRS - len(self._dir_refs)) if recursive else [root]
+        if dirs is None:
+            return False
+        for path in dirs:
+            self._add_dir(path)
+        return True
+
+    def _remove_root(self, root: str, recursive: bool):
+        if recursive:
+            for path in [p for p in self._dir_refs if p == root or p.startswith(root + os.sep)]:
+                self._remove_dir(path)
+        else:
+            self._remove_dir(root)
+
+    def _poll(self):
+        changed = []
+        with self._lock:
+            for path, old_mtime in list(self._mtimes.items()):
+                mtime = self._mtime(path)
+                if mtime == old_mtime:
+                    continue
+                self._mtimes[path] = mtime
+                changed.append(path)
+                # New subdirectories of recursive roots start being watched too
+                if mtime is not None:
+                    for sub in _subdirectories(path, MAX_WATCHED_DIRS) or []:
+                        if sub not in self._dir_refs and len(self._dir_refs) < MAX_WATCHED_DIRS:
+                            for _ in range(self._covering_roots(sub)):
+                                self._add_dir(sub)
+        for path in changed:
+            self._notify(path)
+
+    def _run(self):
+        while not self._closed:
+            time.sleep(self.interval)
+            self._poll()
+
+    def flush(self):
+        self._poll()
+
+    def close(self):
+        self._closed = True
+
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+def get_watcher() -> BaseWatcher:
+    """Return the process-wide watcher, preferring inotify."""
+    global _watcher
+    if _watcher is None:
+        with _watcher_lock:
+            if _watcher is None:
+                try:
+                    _watcher = InotifyWatcher()
+                except (OSError, AttributeError, ImportError):
+                    _watcher = PollingWatcher()
+    return _watcher
+
+
+class DirectoryCache:
+    """Per-directory results (listings, sizes, ...) kept valid by a watcher.
+
+    Values are stored under (kind, path). Recursive entries such as `du`
+    totals are dropped when anything below path changes; the others only
+    when path itself changes. Each change is also appended to a numbered log
+    the browser can poll with `changes_since()`.
+
+    Usage: `get()`; on a miss `prepare()`, scan, then `put()` with the token
+    prepare returned, so changes made during the scan are not cached.
+    """
+
+    def __init__(self, watcher: Optional[BaseWatcher] = None, max_entries: int = 256,
+                 log_size: int = 1000):
+        self._watcher = watcher
+        if watcher is not None:
+            watcher.subscribe(self.invalidate)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[object, bool]]" = OrderedDict()
+        # Change counters for directories with entries or scans in flight
+        self._generations: Dict[str, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self._log = deque(maxlen=log_size)
+        self._seq = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def watcher(self) -> BaseWatcher:
+        """The watcher, started on first use so idle servers spawn no thread."""
+        if self._watcher is None:
+            self._watcher = get_watcher()
+            self._watcher.subscribe(self.invalidate)
+        return self._watcher
+
+    def get(self, kind: str, path: str):
+        """Return the cached value or None."""
+        path = os.path.abspath(path)
+        self.watcher.flush()
+        with self._lock:
+            entry = self._entries.get((kind, path))
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((kind, path))
+            self.hits += 1
+            return entry[0]
+
+    def prepare(self, path: str, recursive: bool = False) -> Optional[Tuple[int, int]]:
+        """Start watching path before it is scanned.
+
+        Returns the token to hand to put(), or None if the path cannot be
+        watched (or file writes would go unnoticed) and should not be cached.
+        """
+        path = os.path.abspath(path)
+        watcher = self.watcher
+        if recursive and not watcher.tracks_file_changes:
+            return None
+        if not watcher.watch(path, recursive):
+            return None
+        with self._lock:
+            self._generations.setdefault(path, 0)
+            return (self._epoch, self._generations[path])
+
+    def put(self, kind: str, path: str, value, token: Optional[Tuple[int, int]], recursive: bool = False):
+        """Cache value unless path changed since prepare() returned token."""
+        if token is None:
+            return
+        path = os.path.abspath(path)
+        watcher = self.watcher
+        watcher.flush()
+        # Every prepare() took a watch reference; entries hold one each
+        release = []
+        with self._lock:
+            if (self._epoch, self._generations.get(path, 0)) != token:
+                release.append((path, recursive))
+            else:
+                if (kind, path) in self._entries:
+                    release.append((path, recursive))
+                self._entries[(kind, path)] = (value, recursive)
+                self._entries.move_to_end((kind, path))
+                while len(self._entries) > self.max_entries:
+                    (_, old_path), (_, old_recursive) = self._entries.popitem(last=False)
+                    release.append((old_path, old_recursive))
+            self._prune_generations()
+        for old_path, old_recursive in release:
+            watcher.unwatch(old_path, old_recursive)
+
+    def _prune_generations(self):
+        if len(self._generations) > 4 * self.max_entries:
+            live = {path for _, path in self._entries}
+            self._generations = {path: gen for path, gen in self._generations.items() if path in live}
+
+    def invalidate(self, changed: Optional[str]):
+        """Watcher callback: drop entries affected by a change in directory changed."""
+        dropped = []
+        with self._lock:
+            self._seq += 1
+            self._log.append((self._seq, changed))
+            if changed is None:
+                self._epoch += 1
+            else:
+                # Bump the directory and its ancestors so in-flight recursive scans notice
+                path = changed
+                while True:
+                    if path in self._generations:
+                        self._generations[path] += 1
+                    parent = os.path.dirname(path)
+                    if parent == path:
+                        break
+                    path = parent
+            for key, (_, recursive) in list(self._entries.items()):
+                path = key[1]
+                if (changed is None or path == changed
+                        or (recursive and changed.startswith(path.rstrip(os.sep) + os.sep))):
+                    del self._entries[key]
+                    dropped.append((path, recursive))
+        for path, recursive in dropped:
+            self._watcher.unwatch(path, recursive)
+
+    def version(self) -> int:
+        """Counter bumped by every reported change, after delivering pending events."""
+        self.watcher.flush()
+        with self._lock:
+            return self._seq
+
+    def changes_since(self, since: int) -> Dict[str, any]:
+        """Return directories changed after sequence number since.
+
+        "reset" is true when the log no longer reaches back that far (or
+        changes were lost), meaning every listing should be refreshed.
+        """
+        with self._lock:
+            reset = bool(self._log) and since < self._log[0][0] - 1
+            paths = []
+            for seq, path in self._log:
+                if seq <= since:
+                    continue
+                if path is None:
+                    reset = True
+                elif path not in paths:
+                    paths.append(path)
+            return {"seq": self._seq, "changes": paths, "reset": reset}
+
+    def stats(self) -> Dict[str, any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "watcher": type(self._watcher).__name__ if self._watcher else None
+            }
@@ -0,0 +1,254 @@
+"""
+Persistent command history for CodeMate Terminal sessions.
+
+Commands are appended as one JSON line each to a log file that outlives the
+process: its name is a stable history id (CODEMATE_HISTORY_ID, "terminal" by
+default) rather than the per-start session id, so a restarted server picks up
+where the last one stopped. Only a bounded tail is kept in memory, and it is
+loaded from disk the first time it is needed so that large history files do
+not slow down startup.
+"""
+
+import json
+import os
+import tempfile
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+DEFAULT_TAIL_SIZE = 1000
+READ_BLOCK_SIZE = 64 * 1024
+DEFAULT_HISTORY_ID = 'terminal'
+
+
+def get_history_id() -> str:
+    """Return the name of the log terminals append to unless told otherwise."""
+    return os.getenv('CODEMATE_HISTORY_ID') or DEFAULT_HISTORY_ID
+
+
+def get_history_dir() -> str:
+    """Return the directory history logs are written to."""
+    configured = os.getenv('CODEMATE_HISTORY_DIR')
+    if configured:
+        return configured
+
+    home_dir = os.path.join(os.path.expanduser('~'), '.codemate', 'history')
+    try:
+        os.makedirs(home_dir, exist_ok=True)
+        if os.access(home_dir, os.W_OK):
+            return home_dir
+    except OSError:
+        pass
+
+    # Read-only home directories (e.g. serverless runtimes) fall back to /tmp
+    return os.path.join(tempfile.gettempdir(), 'codemate', 'history')
+
+
+def _read_lines_reversed(path: str) -> Iterator[str]:
+    """Yield the lines of a file from last to first without reading it whole."""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            remainder = b''
+            while position > 0:
+                read_size = min(READ_BLOCK_SIZE, position)
+                position -= read_size
+                f.seek(position)
+                block = f.read(read_size) + remainder
+                lines = block.split(b'\n')
+                remainder = lines.pop(0)
+                for line in reversed(lines):
+                    if line:
+                        yield line.decode('utf-8', errors='replace')
+            if remainder:
+                yield remainder.decode('utf-8', errors='replace')
+    except FileNotFoundError:
+        return
+
+
+class CommandHistory:
+    """Append-only command history with a bounded in-memory tail."""
+
+    def __init__(self, history_id: str, history_dir: Optional[str] = None,
+                 tail_size: int = DEFAULT_TAIL_SIZE, shared: bool = False):
+        self.history_id = history_id
+        self._history_dir = history_dir
+        self.tail_size = tail_size
+        # shared: other processes may append to the same log (pre-fork workers)
+        self.shared = shared
+        self._tail = deque(maxlen=tail_size)
+        self._loaded = False
+        self._known_size = 0
+        self._persist = True
+        self._lock = threading.Lock()
+
+    @property
+    def history_dir(self) -> str:
+        """Log directory, resolved on first use to keep construction free of I/O."""
+        if self._history_dir is None:
+            self._history_dir = get_history_dir()
+        return self._history_dir
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.history_dir, f"{self.history_id}.jsonl")
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._tail)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def _log_size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def _ensure_loaded(self):
+        """Load the tail of the on-disk log the first time it is needed.
+
+        For shared logs, entries other processes appended since we last looked
+        are read incrementally from the previously known end of the file.
+        """
+        if self._loaded and not (self.shared and self._log_size() != self._known_size):
+            return
+        with self._lock:
+            size = self._log_size()
+            if self._loaded:
+                if size == self._known_size:
+                    return
+                if size > self._known_size:
+                    self._read_appended(size)
+                    return
+            self._tail.clear()
+            self._known_size = size
+            entries = []
+            for entry in self._iter_disk_entries():
+                if entries and entries[-1]["command"] == entry["command"]:
+                    continue
+                entries.append(entry)
+                if len(entries) >= self.tail_size:
+                    break
+            self._tail.extend(reversed(entries))
+            self._loaded = True
+
+    def _read_appended(self, size: int):
+        """Add entries written between the known end of the log and size to the tail."""
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self._known_size)
+                data = f.read(size - self._known_size)
+        except OSError:
+            return
+        # Leave a partially written last line for the next read
+        complete = data[:data.rfind(b'\n') + 1]
+        self._known_size += len(complete)
+        for line in complete.splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(entry, dict) or not entry.get("command"):
+                continue
+            if self._tail and self._tail[-1]["command"] == entry["command"]:
+                self._tail[-1] = entry
+            else:
+                self._tail.append(entry)
+
+    def _iter_disk_entries(self) -> Iterator[Dict[str, any]]:
+        """Yield entries from the on-disk log, newest first."""
+        for line in _read_lines_reversed(self.path):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict) and entry.get("command"):
+                yield entry
+
+    def _append_to_disk(self, entry: Dict[str, any]):
+        """Append one entry to the log, disabling persistence on failure."""
+        if not self._persist:
+            return
+        try:
+            os.makedirs(self.history_dir, exist_ok=True)
+            line = (json.dumps(entry) + '\n').encode('utf-8')
+            with open(self.path, 'ab') as f:
+                f.write(line)
+            if not self.shared:
+                self._known_size += len(line)
+        except OSError:
+            self._persist = False
+
+    def record(self, command: str, exit_code: int = 0, duration: float = 0.0) -> Dict[str, any]:
+        """Record an executed command with its exit code and duration in seconds."""
+        self._ensure_loaded()
+        entry = {
+            "command": command,
+            "timestamp": datetime.now().isoformat(),
+            "exit_code": exit_code,
+            "duration_ms": round(duration * 1000, 3)
+        }
+        with self._lock:
+            if self.shared and self._persist:
+                # Other processes may have appended meanwhile; pick our entry
+                # up from the log so the tail keeps the on-disk order
+                self._append_to_disk(entry)
+                if self._persist:
+                    self._read_appended(self._log_size())
+                    return entry
+            # Collapse consecutive duplicates in memory; the log keeps every run
+            if self._tail and self._tail[-1]["command"] == command:
+                self._tail[-1] = entry
+            else:
+                self._tail.append(entry)
+            self._append_to_disk(entry)
+        return entry
+
+    def recent(self, limit: int = 20) -> List[Dict[str, any]]:
+        """Return the most recent entries, oldest first."""
+        self._ensure_loaded()
+        with self._lock:
+            entries = list(self._tail)
+        return entries[-limit:] if limit > 0 else entries
+
+    def commands(self) -> List[str]:
+        """Return the commands held in the in-memory tail, oldest first."""
+        return [entry["command"] for entry in self.recent(0)]
+
+    def search(self, text: str, limit: int = 20) -> List[Dict[str, any]]:
+        """Reverse-search history for commands containing text, newest first.
+
+        Each distinct command is returned once. The in-memory tail is searched
+        first and the on-disk log is only scanned if more matches are needed.
+        """
+        self._ensure_loaded()
+        needle = text.lower()
+        seen = set()
+        matches = []
+
+        def consider(entry):
+            command = entry["command"]
+            if command in seen or needle not in command.lower():
+                return False
+            seen.add(command)
+            matches.append(entry)
+            return len(matches) >= limit
+
+        with self._lock:
+            tail = list(self._tail)
+        for entry in reversed(tail):
+            if consider(entry):
+                return matches
+
+        # Older entries only exist on disk once the tail has filled up;
+        # anything re-read from the tail region is skipped via `seen`
+        if len(tail) >= self.tail_size:
+            for entry in self._iter_disk_entries():
+                if consider(entry):
+                    break
+
+        return matches
@@ -0,0 +1,210 @@
+"""
+Typo-tolerant fallback for natural-language commands.
+
+When none of TerminalAPI.ai_patterns match, the utterance is classified
+against a few canonical phrasings per intent instead:
+
+1. Words are split into entities (file and folder names) and intent words.
+   Words after "called", "named", "to", "into" or "in", words that look like
+   paths, and names present in the working directory are entities. So is
+   anything that is not within one edit of the phrasing vocabulary. The
+   vocabulary check uses a symmetric-delete table, so "foldr" still counts
+   as "folder".
+2. The corrected intent words are turned into a character trigram TF-IDF
+   vector. It is compared by cosine similarity with the precomputed vectors
+   of every canonical phrasing, going through a trigram inverted index.
+3. The best intent above MIN_SIMILARITY gets its slots filled from the
+   entities in order, e.g. "creat a foldr called x" becomes `mkdir x`.
+
+All tables are built once per process; classifying a miss takes a fraction
+of a millisecond.
+"""
+
+import math
+import re
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+MIN_SIMILARITY = 0.5
+# A lone intent word has to match a phrasing closely ("dogs in x" is not "docs")
+SINGLE_WORD_SIMILARITY = 0.75
+
+# intent: (canonical phrasings, command template, number of required entities)
+INTENTS: Dict[str, Tuple[Tuple[str, ...], str, int]] = {
+    'create_folder': (("create a folder", "make a directory", "new folder", "add a folder",
+                       "make a new folder", "create directory"), "mkdir {0}", 1),
+    'create_file': (("create a file", "make a file", "new file", "create an empty file",
+                     "add a document"), "touch {0}", 1),
+    'delete_file': (("delete", "delete file", "remove file", "erase", "get rid of",
+                     "remove folder"), "rm {0}", 1),
+    'move_file': (("move to", "move file into", "put into", "transfer to", "relocate to"),
+                  "mv {0} {1}", 2),
+    'copy_file': (("copy to", "copy file into", "duplicate to", "make a copy of"), "cp {0} {1}", 2),
+    'change_directory': (("go to", "go into", "navigate to", "enter folder", "change directory to",
+                          "switch to", "open folder"), "cd {0}", 1),
+    'list_files': (("list files", "show files", "show my files", "show me my files", "what files are here",
+                    "display contents", "see files", "list directory contents"), "ls", 0),
+    'find_files': (("find files called", "find file named", "locate file", "search for files named",
+                    "where is file"), "find . -name '*{0}*'", 1),
+    'grep_search': (("search for text in", "find text in", "grep in", "look for word in"),
+                    "grep '{0}' {1}", 2),
+    'codemate_debug': (("debug code", "debug file", "find bugs in"), "codemate debug {0}", 1),
+    'codemate_review': (("review code", "review file"), "codemate review {0}", 1),
+    'codemate_optimize': (("optimize code", "optimize file", "speed up code"), "codemate optimize {0}", 1),
+    'codemate_test': (("test code", "generate tests for", "write tests for"), "codemate test {0}", 1),
+    'codemate_docs': (("document code", "generate docs for", "outline file"), "codemate docs {0}", 1),
+    'show_help': (("help", "show help", "what commands can i use", "show me the commands"), "help", 0),
+    'system_info': (("system information", "tell me about my system", "computer info", "show system info"),
+                    "system_info", 0),
+    'process_info': (("running processes", "show processes", "list processes", "what is running"), "ps", 0),
+    'memory_info': (("memory usage", "how much memory", "ram usage", "show memory", "free memory"), "free", 0),
+    'cpu_info': (("cpu usage", "processor usage", "show cpu", "cpu load"), "cpu", 0),
+}
+
+# Words that may appear in any request without being entities
+FILLER_WORDS = frozenset("""
+a an the my me i you can could would please want like to into in for of with this that these some all
+called named here there is are be it new
+""".split())
+# The next word after one of these is an entity even if it looks like vocabulary
+ENTITY_MARKERS = frozenset(('called', 'named', 'to', 'into', 'in'))
+PATH_CHARS = re.compile(r"[./~*\\]")
+
+
+def _deletes(word: str) -> Iterable[str]:
+    yield word
+    for i in range(len(word)):
+        yield word[:i] + word[i + 1:]
+
+
+def _trigrams(text: str) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for word in text.split():
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            gram = padded[i:i + 3]
+            counts[gram] = counts.get(gram, 0) + 1
+    return counts
+
+
+class IntentClassifier:
+    """Character-trigram cosine similarity against the canonical phrasings of each intent."""
+
+    def __init__(self, intents: Dict[str, Tuple[Tuple[str, ...], str, int]] = INTENTS):
+        self.intents = intents
+        vocabulary = set(FILLER_WORDS)
+        phrasings = []
+        for intent, (phrases, _, _) in intents.items():
+            for phrase in phrases:
+                phrasings.append((intent, phrase))
+                vocabulary.update(phrase.split())
+
+        # Symmetric-delete table: words within one edit share a delete variant
+        self._variants: Dict[str, str] = {}
+        for word in sorted(vocabulary, key=len):
+            for variant in _deletes(word):
+                self._variants.setdefault(variant, word)
+        self._vocabulary = vocabulary
+
+        document_frequency: Dict[str, int] = {}
+        vectors = [_trigrams(phrase) for _, phrase in phrasings]
+        for vector in vectors:
+            for gram in vector:
+                document_frequency[gram] = document_frequency.get(gram, 0) + 1
+        total = len(vectors)
+        self._idf = {gram: math.log((1 + total) / (1 + df)) + 1 for gram, df in document_frequency.items()}
+        self._max_idf = math.log(1 + total) + 1
+        # trigram -> [(phrasing index, normalised weight)]
+        self._postings: Dict[str, List[Tuple[int, float]]] = {}
+        self._phrasings = phrasings
+        for index, vector in enumerate(vectors):
+            weights = {gram: count * self._idf[gram] for gram, count in vector.items()}
+            norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+            for gram, weight in weights.items():
+                self._postings.setdefault(gram, []).append((index, weight / norm))
+
+    def correct(self, word: str) -> Optional[str]:
+        """The vocabulary word within one edit of word, or None."""
+        if word in self._variants:
+            # A vocabulary word, or one with a letter missing
+            return self._variants[word] if len(word) >= 3 or word in self._vocabulary else None
+        if len(word) < 3:
+            return None
+        for variant in _deletes(word):
+            if variant in self._vocabulary:
+                # One letter too many
+                return variant
+        if len(word) >= 4:
+            for variant in _deletes(word):
+                if variant in self._variants:
+                    # A substituted or swapped letter; three-letter words would match too much
+                    return self._variants[variant]
+        return None
+
+    def classify(self, text: str) -> Tuple[Optional[str], float]:
+        """Best (intent, cosine similarity) for corrected intent words."""
+        # Trigrams no phrasing has still count against the match
+        vector = {gram: count * self._idf.get(gram, self._max_idf) for gram, count in _trigrams(text).items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        if not norm:
+            return None, 0.0
+        scores: Dict[int, float] = {}
+        for gram, weight in vector.items():
+            for index, phrase_weight in self._postings.get(gram, ()):
+                scores[index] = scores.get(index, 0.0) + weight * phrase_weight / norm
+        best = max(scores, key=scores.get)
+        return self._phrasings[best][0], scores[best]
+
+    def split(self, command: str, known_names: Callable[[str], bool]) -> Tuple[List[str], List[str]]:
+        """Split command into (corrected intent words, entities in order)."""
+        words = command.strip().split()
+        intent_words, entities = [], []
+        forced = False
+        for word in words:
+            lower = word.lower().strip('?!,;:"\'')
+            if not lower:
+                continue
+            corrected = self.correct(lower)
+            if forced and corrected not in FILLER_WORDS:
+                entities.append(word.strip('?!,;:"\''))
+            elif PATH_CHARS.search(word) or (corrected is None) or (
+                    corrected not in FILLER_WORDS and known_names(word)):
+                entities.append(word.strip('?!,;:"\''))
+            else:
+                intent_words.append(corrected)
+            forced = corrected in ENTITY_MARKERS
+        return intent_words, entities
+
+    def translate(self, command: str, known_names: Callable[[str], bool] = lambda name: False) -> Optional[str]:
+        """Command for a request no regex matched, or None if nothing is close enough."""
+        intent_words, entities = self.split(command, known_names)
+        meaningful = [word for word in intent_words if word not in FILLER_WORDS]
+        if not meaningful:
+            return None
+        intent, similarity = self.classify(' '.join(intent_words))
+        threshold = MIN_SIMILARITY if len(meaningful) > 1 else SINGLE_WORD_SIMILARITY
+        if intent is None or similarity < threshold:
+            return None
+        _, template, slots = self.intents[intent]
+        if intent == 'list_files' and len(entities) == 1:
+            # `ls` may still take the folder that was named
+            return f"{template} {entities[0]}"
+        # Leftover words mean the request was about something else
+        # ("what time does the bakery open")
+        if len(entities) != slots:
+            return None
+        return template.format(*entities)
+
+
+_classifier: Optional[IntentClassifier] = None
+_classifier_lock = threading.Lock()
+
+
+def get_classifier() -> IntentClassifier:
+    """Return the process-wide classifier, building its tables on first use."""
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = IntentClassifier()
+    return _classifier
@@ -0,0 +1,175 @@
+"""
+Background jobs for long-running builtins.
+
+Commands such as a multi-GB `cp -r` run on a worker thread instead of inside
+the HTTP request. The command returns a job id straight away; progress is
+read back with the `jobs` builtin or `GET /api/jobs/<id>`.
+
+When several server processes share a session, job snapshots are also
+written to the shared state directory so any worker can report on them.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+MAX_JOBS = 100
+# Minimum seconds between progress snapshots written to disk
+PERSIST_INTERVAL = 0.5
+
+
+class Job:
+    """One background operation and its progress counters."""
+
+    def __init__(self, kind: str, description: str, on_change: Optional[Callable[['Job', bool], None]] = None):
+        self.id = uuid.uuid4().hex[:8]
+        self.kind = kind
+        self.description = description
+        self.status = 'running'
+        self.bytes_done = 0
+        self.bytes_total = 0
+        self.items_done = 0
+        self.items_total = 0
+        self.output = ''
+        self.exit_code = None
+        self.started = time.time()
+        self.finished = None
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._on_change = on_change
+
+    def add_progress(self, nbytes: int = 0, items: int = 0):
+        """Record progress; safe to call from several copy threads at once."""
+        with self._lock:
+            self.bytes_done += nbytes
+            self.items_done += items
+        if self._on_change:
+            self._on_change(self, False)
+
+    def finish(self, output: str, exit_code: int):
+        self.output = output
+        self.exit_code = exit_code
+        self.status = 'cancelled' if self.cancelled.is_set() else ('done' if exit_code == 0 else 'failed')
+        self.finished = time.time()
+        self._done.set()
+        if self._on_change:
+            self._on_change(self, True)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> Dict[str, any]:
+        elapsed = (self.finished or time.time()) - self.started
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "description": self.description,
+            "status": self.status,
+            "bytes_done": self.bytes_done,
+            "bytes_total": self.bytes_total,
+            "items_done": self.items_done,
+            "items_total": self.items_total,
+            "percent": round(100.0 * self.bytes_done / self.bytes_total, 1) if self.bytes_total else None,
+            "rate_mb_s": round(self.bytes_done / elapsed / (1024 * 1024), 2) if elapsed > 0 else 0.0,
+            "elapsed_s": round(elapsed, 2),
+            "output": self.output,
+            "exit_code": self.exit_code
+        }
+
+
+class JobRegistry:
+    """Starts jobs on daemon threads and keeps the most recent ones."""
+
+    def __init__(self, persist_dir: Optional[str] = None, max_jobs: int = MAX_JOBS):
+        self.persist_dir = persist_dir
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_persist: Dict[str, float] = {}
+
+    def start(self, kind: str, description: str, func: Callable[[Job], tuple],
+              setup: Optional[Callable[[Job], None]] = None) -> Job:
+        """Run func(job) -> (output, exit_code) in the background and return the job.
+
+        setup(job), if given, runs first on the calling thread, e.g. to fill
+        in totals before the id is handed out.
+        """
+        job = Job(kind, description, self._persist if self.persist_dir else None)
+        if setup:
+            setup(job)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                oldest = next((jid for jid, j in self._jobs.items() if j.status != 'running'), None)
+                if oldest is None:
+                    break
+                del self._jobs[oldest]
+
+        def run():
+            try:
+                output, exit_code = func(job)
+            except Exception as e:
+                output, exit_code = f"{kind}: {e}", 1
+            job.finish(output, exit_code)
+
+        threading.Thread(target=run, name=f'codemate-job-{job.id}', daemon=True).start()
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, any]]:
+        """Return a job snapshot, including jobs started by other server processes."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if self.persist_dir and job_id.isalnum():
+            try:
+                with open(os.path.join(self.persist_dir, f"{job_id}.json"), 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                return None
+        return None
+
+    def cancel(self, job_id: str) -> bool:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or job.status != 'running':
+            return False
+        job.cancelled.set()
+        return True
+
+    def list(self) -> List[Dict[str, any]]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.to_dict() for job in jobs]
+
+    def _persist(self, job: Job, final: bool):
+        now = time.monotonic()
+        with self._lock:
+            if not final and now - self._last_persist.get(job.id, 0) < PERSIST_INTERVAL:
+                return
+            if final:
+                self._last_persist.pop(job.id, None)
+            else:
+                self._last_persist[job.id] = now
+        try:
+            os.makedirs(self.persist_dir, exist_ok=True)
+            tmp_path = os.path.join(self.persist_dir, f".{job.id}.{threading.get_ident()}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(job.to_dict(), f)
+            os.replace(tmp_path, os.path.join(self.persist_dir, f"{job.id}.json"))
+        except OSError:
+            pass
+
+
+def format_job(job: Dict[str, any]) -> str:
+    """One-line terminal summary of a job snapshot."""
+    progress = f"{job['percent']:.1f}%" if job['percent'] is not None else f"{job['items_done']} items"
+    line = (f"[{job['id']}] {job['status']:<9} {progress:>7}  "
+            f"{job['bytes_done'] / (1024 * 1024):.1f}/{job['bytes_total'] / (1024 * 1024):.1f} MB  "
+            f"{job['items_done']}/{job['items_total']} files  {job['rate_mb_s']} MB/s  {job['description']}")
+    return line
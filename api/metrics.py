@@ -0,0 +1,304 @@
+"""
+Lightweight request and command instrumentation for CodeMate Terminal.
+
+Latencies are recorded into fixed-bucket histograms so that recording is a
+single bisect plus a few integer updates, cheap enough to leave enabled in
+production. Snapshots are exposed as JSON (/api/stats) and in the Prometheus
+text exposition format (/api/metrics/prom).
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+from urllib.parse import urlparse
+
+# Bucket upper bounds in milliseconds; the last bucket is open-ended (+Inf)
+DEFAULT_BUCKETS_MS = (
+    0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100,
+    250, 500, 1000, 2500, 5000, 10000, 30000, 60000
+)
+
+# Label combinations beyond this are folded into "other" to bound memory
+MAX_SERIES = 200
+
+PERCENTILES = (50, 90, 99)
+
+# Routes that end in an id; the id is replaced so each route is one series
+ID_ROUTES = (
+    ('/api/jobs/', ':id'),
+    ('/api/upload/', ':id'),
+    ('/api/output/', ':handle'),
+)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram in milliseconds."""
+
+    __slots__ = ('bounds', 'counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self, bounds: Tuple[float, ...] = DEFAULT_BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value_ms: float):
+        """Record one observation."""
+        self.counts[bisect_left(self.bounds, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        if self.min is None or value_ms < self.min:
+            self.min = value_ms
+        if self.max is None or value_ms > self.max:
+            self.max = value_ms
+
+    def percentile(self, percent: float) -> float:
+        """Estimate a percentile by interpolating inside its bucket."""
+        if not self.count:
+            return 0.0
+
+        rank = self.count * percent / 100.0
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.bounds[index - 1] if index > 0 else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else self.max
+                fraction = (rank - seen) / bucket_count
+                estimate = lower + (upper - lower) * fraction
+                return max(self.min, min(estimate, self.max))
+            seen += bucket_count
+        return self.max
+
+    def to_dict(self) -> Dict[str, any]:
+        """Summarize the histogram for JSON output."""
+        summary = {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "min_ms": round(self.min or 0.0, 3),
+            "max_ms": round(self.max or 0.0, 3)
+        }
+        for percent in PERCENTILES:
+            summary[f"p{percent}_ms"] = round(self.percentile(percent), 3)
+        return summary
+
+
+class SeriesStats:
+    """Latency, outcome and byte counters for one label combination."""
+
+    __slots__ = ('histogram', 'outcomes', 'bytes_in', 'bytes_out')
+
+    def __init__(self):
+        self.histogram = Histogram()
+        self.outcomes = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def record(self, outcome: str, duration_ms: float, bytes_in: int, bytes_out: int):
+        self.histogram.observe(duration_ms)
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+
+    def to_dict(self) -> Dict[str, any]:
+        summary = self.histogram.to_dict()
+        summary["outcomes"] = dict(self.outcomes)
+        summary["bytes_in"] = self.bytes_in
+        summary["bytes_out"] = self.bytes_out
+        return summary
+
+
+class MetricsRegistry:
+    """Process-wide store of request and command metrics."""
+
+    def __init__(self, enabled: bool = True, max_series: int = MAX_SERIES):
+        self.enabled = enabled
+        self.max_series = max_series
+        self.started_at = time.time()
+        self._requests: Dict[Tuple[str, str], SeriesStats] = {}
+        self._commands: Dict[Tuple[str, str], SeriesStats] = {}
+        self._lock = threading.Lock()
+
+    def _series(self, table: Dict[Tuple[str, str], SeriesStats], key: Tuple[str, str]) -> SeriesStats:
+        stats = table.get(key)
+        if stats is None:
+            if len(table) >= self.max_series:
+                key = ('other', key[1])
+                stats = table.get(key)
+            if stats is None:
+                stats = table[key] = SeriesStats()
+        return stats
+
+    def record_request(self, endpoint: str, method: str, status: int, duration: float,
+                       bytes_in: int = 0, bytes_out: int = 0):
+        """Record one HTTP request; duration is in seconds."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._series(self._requests, (endpoint, method)).record(
+                str(status), duration * 1000, bytes_in, bytes_out)
+
+    def record_command(self, command: str, kind: str, exit_code: int, duration: float,
+                       bytes_in: int = 0, bytes_out: int = 0):
+        """Record one executed command; kind is builtin, external, chain or natural_language."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._series(self._commands, (command, kind)).record(
+                str(exit_code), duration * 1000, bytes_in, bytes_out)
+
+    def reset(self):
+        """Drop all recorded metrics."""
+        with self._lock:
+            self._requests.clear()
+            self._commands.clear()
+            self.started_at = time.time()
+
+    def snapshot(self) -> Dict[str, any]:
+        """Return all metrics as a JSON-serializable dict."""
+        with self._lock:
+            requests = [
+                dict(endpoint=endpoint, method=method, **stats.to_dict())
+                for (endpoint, method), stats in sorted(self._requests.items())
+            ]
+            commands = [
+                dict(command=command, kind=kind, **stats.to_dict())
+                for (command, kind), stats in sorted(self._commands.items())
+            ]
+        return {
+            "enabled": self.enabled,
+            "uptime_seconds": round(time.time() - self.started_at, 3),
+            "requests": requests,
+            "commands": commands
+        }
+
+    def to_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP codemate_uptime_seconds Seconds since metrics collection started.",
+            "# TYPE codemate_uptime_seconds gauge",
+            f"codemate_uptime_seconds {time.time() - self.started_at:.3f}"
+        ]
+        with self._lock:
+            self._render_family(lines, 'codemate_request', 'HTTP request', self._requests,
+                                ('endpoint', 'method'), 'status')
+            self._render_family(lines, 'codemate_command', 'command', self._commands,
+                                ('command', 'kind'), 'exit_code')
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _render_family(lines: List[str], prefix: str, description: str,
+                       table: Dict[Tuple[str, str], SeriesStats],
+                       label_names: Tuple[str, str], outcome_label: str):
+        items = sorted(table.items())
+
+        lines.append(f"# HELP {prefix}_duration_seconds {description[0].upper()}{description[1:]} latency.")
+        lines.append(f"# TYPE {prefix}_duration_seconds histogram")
+        for key, stats in items:
+            labels = _format_labels(zip(label_names, key))
+            histogram = stats.histogram
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.bounds, histogram.counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(list(zip(label_names, key)) + [('le', repr(bound / 1000))])
+                lines.append(f"{prefix}_duration_seconds_bucket{bucket_labels} {cumulative}")
+            inf_labels = _format_labels(list(zip(label_names, key)) + [('le', '+Inf')])
+            lines.append(f"{prefix}_duration_seconds_bucket{inf_labels} {histogram.count}")
+            lines.append(f"{prefix}_duration_seconds_sum{labels} {histogram.total / 1000:.6f}")
+            lines.append(f"{prefix}_duration_seconds_count{labels} {histogram.count}")
+
+        lines.append(f"# HELP {prefix}s_total Total {description}s by outcome.")
+        lines.append(f"# TYPE {prefix}s_total counter")
+        for key, stats in items:
+            for outcome, count in sorted(stats.outcomes.items()):
+                labels = _format_labels(list(zip(label_names, key)) + [(outcome_label, outcome)])
+                lines.append(f"{prefix}s_total{labels} {count}")
+
+        for direction in ('in', 'out'):
+            lines.append(f"# HELP {prefix}_bytes_{direction}_total Total {description} bytes {direction}.")
+            lines.append(f"# TYPE {prefix}_bytes_{direction}_total counter")
+            for key, stats in items:
+                labels = _format_labels(zip(label_names, key))
+                value = stats.bytes_in if direction == 'in' else stats.bytes_out
+                lines.append(f"{prefix}_bytes_{direction}_total{labels} {value}")
+
+
+def _format_labels(pairs) -> str:
+    """Format label pairs as {name="value",...} with Prometheus escaping."""
+    rendered = []
+    for name, value in pairs:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        rendered.append(f'{name}="{value}"')
+    return "{" + ",".join(rendered) + "}"
+
+
+# Global registry shared by the API and both HTTP handlers
+metrics = MetricsRegistry(enabled=os.getenv('CODEMATE_METRICS', '1') != '0')
+
+
+class _CountingWriter:
+    """Wraps a handler's wfile to count response bytes."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.bytes_written = 0
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        return self._stream.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class RequestMetricsMixin:
+    """Mixin for BaseHTTPRequestHandler subclasses that records every request."""
+
+    def send_response(self, code, message=None):
+        self._metrics_status = code
+        super().send_response(code, message)
+
+    def handle_one_request(self):
+        if not metrics.enabled:
+            return super().handle_one_request()
+
+        start_time = time.perf_counter()
+        self._metrics_status = None
+        stream = self.wfile
+        self.wfile = _CountingWriter(stream)
+        try:
+            super().handle_one_request()
+        finally:
+            writer, self.wfile = self.wfile, stream
+            method = getattr(self, 'command', None)
+            if method and self._metrics_status is not None:
+                metrics.record_request(
+                    _endpoint_label(getattr(self, 'path', '')),
+                    method,
+                    self._metrics_status,
+                    time.perf_counter() - start_time,
+                    _content_length(self),
+                    writer.bytes_written
+                )
+
+
+def _endpoint_label(path: str) -> str:
+    """Collapse request paths into a bounded set of endpoint labels."""
+    path = urlparse(path).path
+    if not path.startswith('/api/'):
+        return 'static'
+    for prefix, placeholder in ID_ROUTES:
+        if path.startswith(prefix) and len(path) > len(prefix):
+            return prefix + placeholder
+    return path
+
+
+def _content_length(request_handler) -> int:
+    headers = getattr(request_handler, 'headers', None)
+    try:
+        return int(headers.get('Content-Length', 0)) if headers else 0
+    except ValueError:
+        return 0
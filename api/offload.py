@@ -0,0 +1,266 @@
+"""
+Process-pool offload for CPU-heavy builtins.
+
+`find`, `grep`, `du` and `whereis` walk whole directory trees while holding
+the GIL. TerminalAPI hands them to a shared ProcessPoolExecutor instead: a
+tree is split into chunks (the files of one directory, or a whole subtree),
+large subtrees being split further until there are enough chunks to keep the
+pool busy. The chunks are scanned in parallel and the partial results are
+merged back in walk order, names sorted, so the output matches a sequential
+walk.
+
+The pool is created lazily (or warmed at server startup with `warm_pool()`),
+sized by CODEMATE_OFFLOAD_WORKERS (default: one process per CPU). With fewer
+than two workers, or wherever a pool cannot be started (e.g. serverless
+runtimes without /dev/shm), the same worker functions simply run inline.
+"""
+
+import fnmatch
+import os
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+# Below this many chunks the pickling round-trip costs more than it saves
+MIN_PARALLEL_CHUNKS = 2
+# Chunks are grouped into this many batches per worker, enough to balance
+# uneven subtrees without paying one IPC round-trip per chunk
+BATCHES_PER_WORKER = 4
+# split_tree descends at most this many levels looking for enough subtrees
+MAX_SPLIT_DEPTH = 6
+
+_executor = None
+_pool_size = 0
+_executor_lock = threading.Lock()
+_pool_disabled = False
+
+
+def default_pool_size() -> int:
+    """Number of worker processes to use, from CODEMATE_OFFLOAD_WORKERS or the CPU count."""
+    configured = os.getenv('CODEMATE_OFFLOAD_WORKERS')
+    if configured is not None:
+        try:
+            return max(0, int(configured))
+        except ValueError:
+            pass
+    return os.cpu_count() or 1
+
+
+def _noop() -> int:
+    return os.getpid()
+
+
+def _exit_with_parent(parent_pid: int):
+    """Pool initializer: exit if the server process dies without shutting the pool down."""
+    def watch():
+        while os.getppid() == parent_pid:
+            time.sleep(1.0)
+        os._exit(0)
+    threading.Thread(target=watch, name='offload-parent-watch', daemon=True).start()
+
+
+def get_executor():
+    """Return the shared process pool, or None if offloading is unavailable."""
+    global _executor, _pool_size, _pool_disabled
+    if _executor is not None or _pool_disabled:
+        return _executor
+    with _executor_lock:
+        if _executor is None and not _pool_disabled:
+            size = default_pool_size()
+            # A single worker process cannot beat running inline
+            if size < 2:
+                _pool_disabled = True
+                return None
+            try:
+                from concurrent.futures import ProcessPoolExecutor
+                _executor = ProcessPoolExecutor(max_workers=size, initializer=_exit_with_parent,
+                                                initargs=(os.getpid(),))
+                _pool_size = size
+            except (OSError, ImportError, NotImplementedError):
+                _pool_disabled = True
+    return _executor
+
+
+def warm_pool() -> int:
+    """Start the pool's worker processes now so the first heavy command doesn't pay for it.
+
+    Servers call this before they start any threads, since with the fork
+    start method the workers are forked from the calling process.
+    """
+    executor = get_executor()
+    if executor is None:
+        return 0
+    size = _pool_size
+    try:
+        # Workers are started on demand, one per task that finds no idle worker
+        for future in [executor.submit(_noop) for _ in range(size)]:
+            future.result()
+    except Exception:
+        _reset_executor()
+        return 0
+    return size
+
+
+def shutdown_pool():
+    """Stop the worker processes (used on server shutdown)."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def _reset_executor():
+    """Drop a broken pool; the next call creates a fresh one."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _split_dir(path: str) -> List[Tuple[str, bool]]:
+    """path's own files as one chunk, then one recursive chunk per subdirectory, by name."""
+    chunks = [(path, False)]
+    try:
+        with os.scandir(path) as entries:
+            subdirs = []
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                except OSError:
+                    continue
+    except OSError:
+        return chunks
+    chunks.extend((subdir, True) for subdir in sorted(subdirs))
+    return chunks
+
+
+def split_tree(root: str, target_chunks: Optional[int] = None) -> List[Tuple[str, bool]]:
+    """Split a tree into (path, recursive) chunks in sorted walk order.
+
+    Recursive chunks are split again, one level of the tree at a time, until
+    there are target_chunks of them (default: BATCHES_PER_WORKER per pool
+    worker) or the tree runs out of subdirectories. So a tree whose files are
+    all under one src/ still fans out across the pool. Splitting a directory
+    keeps its files as a non-recursive chunk in front of its subdirectories,
+    so concatenating the chunk results gives the output of a sequential walk.
+    """
+    if target_chunks is None:
+        target_chunks = max(MIN_PARALLEL_CHUNKS, default_pool_size() * BATCHES_PER_WORKER)
+    chunks = [(root, True)]
+    for _ in range(MAX_SPLIT_DEPTH):
+        split = []
+        for path, recursive in chunks:
+            split.extend(_split_dir(path) if recursive else [(path, False)])
+        chunks = split
+        recursive_count = sum(1 for _, recursive in chunks if recursive)
+        if recursive_count == 0 or recursive_count >= target_chunks:
+            break
+    return chunks
+
+
+def _walk_chunk(path: str, recursive: bool):
+    """Yield (dirpath, filenames) like os.walk with names sorted, optionally for path alone."""
+    for dirpath, dirnames, filenames in os.walk(path):
+        dirnames.sort()
+        filenames.sort()
+        yield dirpath, filenames
+        if not recursive:
+            break
+
+
+# Worker functions: module-level so they can be pickled by the pool
+
+def find_chunk(path: str, recursive: bool, pattern: str, limit: int, glob: bool = False) -> List[str]:
+    """Return up to limit file paths whose name contains pattern (or matches it, as a glob)."""
+    results = []
+    for dirpath, filenames in _walk_chunk(path, recursive):
+        for filename in filenames:
+            if fnmatch.fnmatchcase(filename, pattern) if glob else pattern in filename:
+                results.append(os.path.join(dirpath, filename))
+                if len(results) >= limit:
+                    return results
+    return results
+
+
+def grep_chunk(path: str, recursive: bool, pattern: str, suffix: str, limit: int) -> List[str]:
+    """Return up to limit "path:line: text" matches for pattern in files ending with suffix."""
+    results = []
+    for dirpath, filenames in _walk_chunk(path, recursive):
+        for filename in filenames:
+            if suffix and not filename.endswith(suffix):
+                continue
+            filepath = os.path.join(dirpath, filename)
+            try:
+                with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
+                    for line_num, line in enumerate(f, 1):
+                        if pattern in line:
+                            results.append(f"{filepath}:{line_num}: {line.strip()}")
+                            if len(results) >= limit:
+                                return results
+            except (OSError, IOError, UnicodeDecodeError):
+                continue
+    return results
+
+
+def size_chunk(path: str, recursive: bool) -> int:
+    """Return the total size in bytes of the files in the chunk."""
+    total_size = 0
+    for dirpath, filenames in _walk_chunk(path, recursive):
+        for filename in filenames:
+            try:
+                total_size += os.path.getsize(os.path.join(dirpath, filename))
+            except (OSError, IOError):
+                pass
+    return total_size
+
+
+def man_pages_chunk(path: str, recursive: bool, command: str) -> List[str]:
+    """Return the first man page for command found in each directory of the chunk."""
+    results = []
+    prefix = command + '.'
+    for dirpath, filenames in _walk_chunk(path, recursive):
+        for filename in filenames:
+            if filename.startswith(prefix):
+                results.append(os.path.join(dirpath, filename))
+                break
+    return results
+
+
+def _run_batch(func: Callable, batch: List[Tuple[str, bool]], args: tuple) -> list:
+    return [func(path, recursive, *args) for path, recursive in batch]
+
+
+def run_chunks(func: Callable, chunks: List[Tuple[str, bool]], *args) -> list:
+    """Run func(path, recursive, *args) for every chunk and return results in chunk order.
+
+    Chunks go to the process pool, in contiguous batches, when there are
+    enough of them to be worth it; otherwise, or if the pool is unavailable
+    or breaks, they run inline.
+    """
+    executor = get_executor() if len(chunks) >= MIN_PARALLEL_CHUNKS else None
+    if executor is not None:
+        batch_count = min(len(chunks), _pool_size * BATCHES_PER_WORKER)
+        batch_size = -(-len(chunks) // batch_count)
+        try:
+            futures = [executor.submit(_run_batch, func, chunks[i:i + batch_size], args)
+                       for i in range(0, len(chunks), batch_size)]
+            return [result for future in futures for result in future.result()]
+        except Exception as e:
+            from concurrent.futures.process import BrokenProcessPool
+            if not isinstance(e, (BrokenProcessPool, OSError)):
+                raise
+            _reset_executor()
+    return [func(path, recursive, *args) for path, recursive in chunks]
+
+
+def merge_limited(partials: List[List[str]], limit: Optional[int]) -> List[str]:
+    """Concatenate per-chunk result lists, keeping at most limit entries."""
+    merged = []
+    for partial in partials:
+        merged.extend(partial)
+        if limit is not None and len(merged) >= limit:
+            return merged[:limit]
+    return merged
@@ -0,0 +1,192 @@
+"""
+Server-side store for command output too large to send in one response.
+
+A command whose output is larger than INLINE_BYTES returns just its first
+INLINE_BYTES, plus a handle. The full output sits in a file under the state
+directory, and `GET /api/output/<handle>?offset=&limit=` pages through it.
+Any worker can serve a page because the files are shared. `cat` and external
+commands write straight into the store, so neither the server nor the JSON
+response ever holds more than the inline part. Outputs from other builtins
+are stored after the fact.
+
+The store is bounded by total size: adding an output deletes the oldest ones
+until the total fits in STORE_BYTES. A single output larger than that is cut
+off at STORE_BYTES. Offsets are byte offsets into the UTF-8 output. Pages
+end after a line break where possible and on a character boundary
+otherwise, so next_offset may fall short of offset + limit.
+"""
+
+import os
+import threading
+import uuid
+from typing import BinaryIO, Dict, Optional, Tuple
+
+INLINE_BYTES = int(os.getenv('CODEMATE_OUTPUT_INLINE_KB', '64')) * 1024
+STORE_BYTES = int(os.getenv('CODEMATE_OUTPUT_STORE_MB', '64')) * 1024 * 1024
+DEFAULT_PAGE = 256 * 1024
+MAX_PAGE = 4 * 1024 * 1024
+# Files are copied into the store in pieces of this size
+COPY_CHUNK = 256 * 1024
+
+
+class OutputError(Exception):
+    """A page request that cannot be honoured; status is the HTTP status to answer with."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def _complete_prefix(data: bytes) -> bytes:
+    """data without a trailing partial UTF-8 sequence."""
+    # Back up over continuation bytes to the lead byte of the last character
+    start = len(data) - 1
+    while start >= 0 and len(data) - start < 4 and (data[start] & 0xC0) == 0x80:
+        start -= 1
+    if start < 0:
+        return data
+    lead = data[start]
+    width = 1 if lead < 0x80 else 2 if lead < 0xE0 else 3 if lead < 0xF0 else 4
+    return data if len(data) - start >= width else data[:start]
+
+
+def _page_end(data: bytes) -> bytes:
+    """data cut after its last line break (if that keeps most of it), else at a character boundary."""
+    newline = data.rfind(b'\n')
+    if newline >= len(data) // 2:
+        return data[:newline + 1]
+    return _complete_prefix(data)
+
+
+def format_size(size: int) -> str:
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f} MB"
+    return f"{size / 1024:.1f} KB"
+
+
+class OutputStore:
+    """Output files in directory, evicted oldest first beyond max_bytes in total."""
+
+    def __init__(self, directory: str, inline_bytes: int = INLINE_BYTES, max_bytes: int = STORE_BYTES):
+        self.directory = directory
+        self.inline_bytes = inline_bytes
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, handle: str) -> str:
+        if not handle.isalnum():
+            raise OutputError(f"Unknown output: {handle}", 404)
+        return os.path.join(self.directory, f"{handle}.out")
+
+    def open(self) -> Tuple[str, BinaryIO]:
+        """Start a new output; write it to the returned file, then pass both to seal()."""
+        os.makedirs(self.directory, exist_ok=True)
+        handle = uuid.uuid4().hex
+        return handle, open(self._path(handle), 'w+b')
+
+    def seal(self, handle: str, f: BinaryIO, truncated: bool = False) -> Tuple[str, Optional[Dict[str, any]]]:
+        """Finish an output written through open(); returns (inline text, truncation info or None).
+
+        Outputs that fit inline are not kept. truncated says the writer already
+        stopped at max_bytes.
+        """
+        try:
+            f.flush()
+            size = f.seek(0, os.SEEK_END)
+            if size > self.max_bytes:
+                f.truncate(self.max_bytes)
+                size, truncated = self.max_bytes, True
+            f.seek(0)
+            head = f.read(self.inline_bytes + 1)
+        finally:
+            f.close()
+        if len(head) <= self.inline_bytes:
+            self.discard(handle)
+            return head.decode('utf-8', 'replace'), None
+        head = _page_end(head[:self.inline_bytes])
+        self._evict(keep=handle)
+        return head.decode('utf-8', 'replace'), {
+            "handle": handle,
+            "next_offset": len(head),
+            "stored_bytes": size,
+            "complete": not truncated,
+            "url": f"/api/output/{handle}",
+        }
+
+    def put(self, text: str) -> Tuple[str, Optional[Dict[str, any]]]:
+        """Store text if it is too large to send inline; same result as seal()."""
+        # Most outputs are short; only encode the ones that might not fit
+        if len(text) * 4 <= self.inline_bytes:
+            return text, None
+        data = text.encode('utf-8', 'replace')
+        if len(data) <= self.inline_bytes:
+            return text, None
+        handle, f = self.open()
+        f.write(data[:self.max_bytes])
+        return self.seal(handle, f, truncated=len(data) > self.max_bytes)
+
+    def copy(self, f: BinaryIO, source: BinaryIO) -> bool:
+        """Append source (a file or pipe) to an open output; False if it stopped at max_bytes."""
+        written = f.tell()
+        while True:
+            chunk = source.read(min(COPY_CHUNK, self.max_bytes - written + 1))
+            if not chunk:
+                return True
+            if written + len(chunk) > self.max_bytes:
+                f.write(chunk[:self.max_bytes - written])
+                return False
+            f.write(chunk)
+            written += len(chunk)
+
+    def read(self, handle: str, offset: int = 0, limit: int = DEFAULT_PAGE) -> Dict[str, any]:
+        """One page of a stored output, starting at byte offset."""
+        limit = max(1, min(limit, MAX_PAGE))
+        try:
+            with open(self._path(handle), 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if offset < 0 or offset > size:
+                    raise OutputError(f"offset must be between 0 and {size}")
+                f.seek(offset)
+                data = f.read(limit)
+        except FileNotFoundError:
+            raise OutputError(f"Unknown output: {handle} (it may have been evicted)", 404)
+        if offset + len(data) < size:
+            # Leave a split line (or at least a split character) for the next page
+            data = _page_end(data) or data
+        return {
+            "handle": handle,
+            "offset": offset,
+            "next_offset": offset + len(data),
+            "stored_bytes": size,
+            "eof": offset + len(data) >= size,
+            "data": data.decode('utf-8', 'replace'),
+        }
+
+    def discard(self, handle: str):
+        try:
+            os.unlink(self._path(handle))
+        except (OSError, OutputError):
+            pass
+
+    def _evict(self, keep: str):
+        """Delete the oldest outputs until the total fits in max_bytes."""
+        with self._lock:
+            entries = []
+            try:
+                with os.scandir(self.directory) as it:
+                    for entry in it:
+                        if entry.name.endswith('.out'):
+                            try:
+                                stat = entry.stat()
+                            except OSError:
+                                continue
+                            entries.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+            except OSError:
+                return
+            total = sum(size for _, _, size in entries)
+            for _, handle, size in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if handle != keep:
+                    self.discard(handle)
+                    total -= size
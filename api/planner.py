@@ -0,0 +1,74 @@
+"""
+Multi-step plans for natural-language requests.
+
+"list files then go to src and find main" is split on conjunctions ("and",
+"then", "after that", commas, semicolons) into clauses. Each clause is
+translated on its own by the single-intent matcher. References to an earlier
+step ("it", "that folder", "there") are replaced by that step's entity
+before translating: the folder just created or entered, or the destination
+of a move or copy. The steps run as one `&&` chain, and each step's
+translation is returned so the UI can show the plan.
+"""
+
+import re
+from typing import Callable, Dict, List, Optional
+
+import shellargs
+
+CLAUSE_SEPARATOR = re.compile(
+    r"\s*[,;]\s*(?:and\s+)?(?:then\s+)?|\s+and\s+then\s+|\s+then\s+|\s+and\s+|\s+after\s+that\s+|\s+afterwards\s+",
+    re.IGNORECASE)
+LEADING_FILLER = re.compile(r"^(?:and|then|also|next|finally|after\s+that)\s+", re.IGNORECASE)
+PRONOUN = re.compile(
+    r"\b(?:(?:that|this|the\s+same|the\s+new)\s+(?:folder|directory|dir|file|one)|it|them)\b", re.IGNORECASE)
+THERE = re.compile(r"(\b(?:to|into|in)\s+)?\bthere\b", re.IGNORECASE)
+
+# Which argument of a translated step later steps can refer to
+ENTITY_COMMANDS = {'mkdir', 'touch', 'cd', 'mv', 'cp', 'cat', 'ls', 'codemate'}
+
+
+def split_clauses(text: str) -> List[str]:
+    clauses = []
+    for clause in CLAUSE_SEPARATOR.split(text.strip()):
+        clause = LEADING_FILLER.sub('', clause.strip())
+        if clause:
+            clauses.append(clause)
+    return clauses
+
+
+def step_entity(command: str) -> Optional[str]:
+    """The name a later "it"/"there" refers to: the last argument of a file or folder command."""
+    try:
+        tokens = shellargs.tokenize(command.split(' && ')[-1])
+    except ValueError:
+        return None
+    if len(tokens) < 2 or tokens[0] not in ENTITY_COMMANDS:
+        return None
+    entity = str(tokens[-1]).rstrip('/')
+    return entity or None
+
+
+def resolve_references(clause: str, entity: Optional[str]) -> str:
+    """Replace pronouns in clause with the previous step's entity."""
+    if entity is None:
+        return clause
+    clause = PRONOUN.sub(lambda match: entity, clause)
+    # "go there" needs a preposition to read as "go to <entity>"
+    return THERE.sub(lambda match: f"{match.group(1) or 'to '}{entity}", clause)
+
+
+def plan(text: str, translate: Callable[[str], Optional[str]]) -> Optional[List[Dict[str, str]]]:
+    """Translate every clause of text; None unless there are several and all translate."""
+    clauses = split_clauses(text)
+    if len(clauses) < 2:
+        return None
+    steps = []
+    entity = None
+    for clause in clauses:
+        resolved = resolve_references(clause, entity)
+        command = translate(resolved)
+        if not command:
+            return None
+        steps.append({"text": clause, "command": command})
+        entity = step_entity(command) or entity
+    return steps
@@ -0,0 +1,142 @@
+"""
+Opt-in per-request profiling for CodeMate Terminal.
+
+Profiling is gated by the CODEMATE_PROFILING server setting. When enabled, a
+request (or a session, via the `profile` builtin) can ask for its command to be
+run under cProfile and/or tracemalloc, and the top functions and allocation
+sites are returned alongside the command output.
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+PROFILING_ENABLED = os.getenv('CODEMATE_PROFILING', '0') == '1'
+
+PROFILE_MODES = ('cpu', 'memory')
+DEFAULT_TOP = 15
+
+# tracemalloc is process-global, so profiled runs are serialized
+_profile_lock = threading.Lock()
+
+
+def parse_profile_modes(value) -> Set[str]:
+    """Parse a header/query/body flag such as "cpu", "memory", "cpu,memory" or "1"."""
+    if not value:
+        return set()
+    if value is True:
+        return set(PROFILE_MODES)
+
+    modes = set()
+    for token in str(value).lower().replace(' ', ',').split(','):
+        if token in ('1', 'true', 'on', 'yes', 'all'):
+            modes.update(PROFILE_MODES)
+        elif token in ('cpu', 'cprofile', 'time'):
+            modes.add('cpu')
+        elif token in ('memory', 'mem', 'tracemalloc', 'alloc'):
+            modes.add('memory')
+    return modes
+
+
+def _cpu_report(profiler, top: int) -> List[Dict[str, any]]:
+    """Return the top functions by cumulative time."""
+    import pstats
+
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, name), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        if filename == __file__:
+            continue
+        rows.append({
+            "function": f"{os.path.basename(filename)}:{line}({name})" if line else name,
+            "ncalls": ncalls,
+            "tottime_ms": round(tottime * 1000, 3),
+            "cumtime_ms": round(cumtime * 1000, 3)
+        })
+    rows.sort(key=lambda row: row["cumtime_ms"], reverse=True)
+    return rows[:top]
+
+
+def _memory_report(snapshot, peak: int, current: int, top: int) -> Dict[str, any]:
+    """Return peak usage and the top allocation sites by size."""
+    import tracemalloc
+
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ))
+    sites = []
+    for stat in snapshot.statistics('lineno')[:top]:
+        frame = stat.traceback[0]
+        sites.append({
+            "location": f"{frame.filename}:{frame.lineno}",
+            "size_kb": round(stat.size / 1024, 2),
+            "count": stat.count
+        })
+    return {
+        "peak_kb": round(peak / 1024, 2),
+        "current_kb": round(current / 1024, 2),
+        "top": sites
+    }
+
+
+def profile_call(func: Callable, *args, modes: Optional[Set[str]] = None,
+                 top: int = DEFAULT_TOP, **kwargs) -> Tuple[any, Dict[str, any]]:
+    """Run func under the requested profilers and return (result, report)."""
+    # Imported here so that servers with profiling disabled never load them
+    import cProfile
+    import tracemalloc
+
+    modes = set(modes or PROFILE_MODES) & set(PROFILE_MODES)
+    report = {"modes": sorted(modes)}
+
+    with _profile_lock:
+        started_tracing = False
+        if 'memory' in modes:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            tracemalloc.reset_peak()
+
+        profiler = cProfile.Profile() if 'cpu' in modes else None
+        start_time = time.perf_counter()
+        try:
+            if profiler is not None:
+                result = profiler.runcall(func, *args, **kwargs)
+            else:
+                result = func(*args, **kwargs)
+        finally:
+            report["duration_ms"] = round((time.perf_counter() - start_time) * 1000, 3)
+            if 'memory' in modes:
+                current, peak = tracemalloc.get_traced_memory()
+                snapshot = tracemalloc.take_snapshot()
+                if started_tracing:
+                    tracemalloc.stop()
+
+        if profiler is not None:
+            report["cpu"] = _cpu_report(profiler, top)
+        if 'memory' in modes:
+            report["memory"] = _memory_report(snapshot, peak, current, top)
+
+    return result, report
+
+
+def format_profile_report(report: Dict[str, any]) -> str:
+    """Render a profile report as terminal text."""
+    lines = [f"Profile ({', '.join(report['modes'])}) - {report['duration_ms']:.1f} ms total"]
+
+    if "cpu" in report:
+        lines.append("")
+        lines.append(f"{'cumtime ms':>11} {'tottime ms':>11} {'calls':>7}  function")
+        for row in report["cpu"]:
+            lines.append(f"{row['cumtime_ms']:11.3f} {row['tottime_ms']:11.3f} {row['ncalls']:7d}  {row['function']}")
+
+    if "memory" in report:
+        memory = report["memory"]
+        lines.append("")
+        lines.append(f"Memory: peak {memory['peak_kb']:.1f} KB, retained {memory['current_kb']:.1f} KB")
+        for site in memory["top"]:
+            lines.append(f"{site['size_kb']:10.1f} KB {site['count']:7d} blocks  {site['location']}")
+
+    return "\n".join(lines)
@@ -0,0 +1,202 @@
+"""
+Retrieval index behind the `ask` builtin.
+
+Answers come from a JSON data file of Q&A entries (ask_answers.json, or
+CODEMATE_ASK_DATA) plus one entry per command line of the `help` text. Each
+entry's question, alternate phrasings and answer are tokenized (lowercased,
+stop words dropped, plural/-ing/-ed endings stripped) into a BM25 inverted
+index, so a question only touches the postings of its own terms and ranking
+cost does not grow with entries that share no word with it.
+
+Query words that are not in the vocabulary are corrected to the closest
+indexed word by character trigram overlap ("folde" -> "folder"), which keeps
+rephrased and mistyped questions answerable.
+
+BM25 scores are not comparable across questions, so an entry only counts as
+an answer if one of its phrasings (question or alternate) shares at least
+half of its words with the question and covers at least half of the
+question's words; "what is python" does not match "outline of a python
+file". Related answers must also score close to the best one.
+"""
+
+import json
+import math
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# BM25 parameters (the usual defaults)
+K1 = 1.2
+B = 0.75
+# Question words count this many times as much as answer words
+QUESTION_WEIGHT = 3
+MIN_SCORE = 1.0
+# Share of words a phrasing and the question must have in common, both ways
+MIN_COVERAGE = 0.5
+# Related answers score at least this share of the best answer
+RELATED_SCORE = 0.8
+TOP_K = 3
+# Minimum trigram Jaccard similarity for a typo correction
+MIN_SIMILARITY = 0.4
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ask_answers.json')
+
+STOP_WORDS = frozenset("""
+a an and are as at be by can do does for from how i in is it me my of on or so that the this to used
+use using what when who why will with you your please show tell about into want much many
+""".split())
+
+WORD = re.compile(r"[a-z0-9_]+")
+
+
+def _stem(word: str) -> str:
+    """Very light suffix stripping, enough to match files/file and listing/list."""
+    for suffix, minimum in (('ing', 5), ('ies', 5), ('es', 5), ('ed', 5), ('s', 4)):
+        if word.endswith(suffix) and len(word) >= minimum:
+            if suffix == 'ies':
+                return word[:-3] + 'y'
+            if suffix == 'es' and not word[-3] in 'sxz':
+                return word[:-1]
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    return [_stem(word) for word in WORD.findall(text.lower()) if word not in STOP_WORDS]
+
+
+def _trigrams(word: str) -> set:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def help_entries(help_text: str) -> List[Dict[str, any]]:
+    """One entry per command described in the help text ("  cmd args   description")."""
+    entries = []
+    lines = help_text.splitlines()
+    for index, line in enumerate(lines):
+        # Descriptions start with a capital letter, usually after two or more spaces
+        match = re.match(r"^  ([a-z]\S*.*?)(?:\s{2,}|(?<=[>\]])\s)([A-Z].*)$", line)
+        if match:
+            usage, description = match.groups()
+        elif re.match(r"^  [a-z]\S*", line) and index + 1 < len(lines) and lines[index + 1].startswith(' ' * 20):
+            # Long usages put the description on the next line
+            usage, description = line.strip(), lines[index + 1].strip()
+        else:
+            continue
+        entries.append({"question": description, "alternates": [usage],
+                        "answer": f"Use: {usage} - {description}"})
+    return entries
+
+
+def load_entries(path: Optional[str] = None) -> List[Dict[str, any]]:
+    path = path or os.getenv('CODEMATE_ASK_DATA') or DATA_FILE
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+class QAIndex:
+    """BM25 over Q&A entries: {"question", "alternates", "answer"}."""
+
+    def __init__(self, entries: List[Dict[str, any]]):
+        self.entries = entries
+        # term -> [(doc_id, BM25 weight)]; weights don't depend on the query, so
+        # a lookup is just a sum over the postings of the question's terms
+        self.postings: Dict[str, List[Tuple[int, float]]] = {}
+        # doc_id -> term sets of its question and alternates
+        self.phrasings: List[List[frozenset]] = []
+        term_counts = []
+        lengths = []
+        for doc_id, entry in enumerate(entries):
+            phrasings = [tokenize(text) for text in [entry.get("question", "")] + entry.get("alternates", [])]
+            self.phrasings.append([frozenset(terms) for terms in phrasings if terms])
+            counts: Dict[str, int] = {}
+            for terms in phrasings:
+                for term in terms:
+                    counts[term] = counts.get(term, 0) + QUESTION_WEIGHT
+            for term in tokenize(entry.get("answer", "")):
+                counts[term] = counts.get(term, 0) + 1
+            term_counts.append(counts)
+            lengths.append(sum(counts.values()))
+
+        average = (sum(lengths) / len(lengths)) if lengths else 1.0
+        frequencies: Dict[str, int] = {}
+        for counts in term_counts:
+            for term in counts:
+                frequencies[term] = frequencies.get(term, 0) + 1
+        total = len(entries)
+        idf = {term: math.log(1 + (total - df + 0.5) / (df + 0.5)) for term, df in frequencies.items()}
+        for doc_id, counts in enumerate(term_counts):
+            norm = K1 * (1 - B + B * lengths[doc_id] / average)
+            for term, count in counts.items():
+                weight = idf[term] * count * (K1 + 1) / (count + norm)
+                self.postings.setdefault(term, []).append((doc_id, weight))
+        self._trigram_terms: Dict[str, List[str]] = {}
+        for term in self.postings:
+            for gram in _trigrams(term):
+                self._trigram_terms.setdefault(gram, []).append(term)
+
+    def _correct(self, term: str) -> Optional[str]:
+        """Closest indexed term by trigram Jaccard similarity, or None."""
+        grams = _trigrams(term)
+        shared: Dict[str, int] = {}
+        for gram in grams:
+            for candidate in self._trigram_terms.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        best, best_score = None, MIN_SIMILARITY
+        for candidate, overlap in shared.items():
+            score = overlap / (len(grams) + len(_trigrams(candidate)) - overlap)
+            if score > best_score or (score == best_score and best is not None and candidate < best):
+                best, best_score = candidate, score
+        return best
+
+    def _covers(self, doc_id: int, terms: frozenset) -> bool:
+        """Whether a phrasing of the entry and the question share enough words."""
+        for phrasing in self.phrasings[doc_id]:
+            shared = len(phrasing & terms)
+            if shared >= MIN_COVERAGE * len(phrasing) and shared >= MIN_COVERAGE * len(terms):
+                return True
+        return False
+
+    def search(self, question: str, k: int = TOP_K) -> List[Tuple[float, Dict[str, any]]]:
+        """Top k (score, entry) pairs, best first; empty if nothing answers the question."""
+        terms = []
+        for term in tokenize(question):
+            if term not in self.postings:
+                # Words the index has never seen still count against coverage
+                term = self._correct(term) or term
+            terms.append(term)
+        query = frozenset(terms)
+
+        scores: Dict[int, float] = {}
+        for term in query:
+            for doc_id, weight in self.postings.get(term, ()):
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        matches = []
+        for doc_id, score in ranked:
+            if score < MIN_SCORE or (matches and score < RELATED_SCORE * matches[0][0]):
+                break
+            if self._covers(doc_id, query):
+                matches.append((score, self.entries[doc_id]))
+                if len(matches) == k:
+                    break
+        return matches
+
+
+_index: Optional[QAIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_index(help_text: str) -> QAIndex:
+    """Return the process-wide index, building it from the data file and help text on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = QAIndex(load_entries() + help_entries(help_text))
+    return _index
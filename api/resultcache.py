@@ -0,0 +1,149 @@
+"""
+Result cache for read-only builtins.
+
+Builtins that only read state (`date`, `free`, `system_info`, `help`, ...)
+declare how long their output stays good with the `read_only` decorator:
+
+    @read_only(ttl=2.0)
+    def _cmd_free(self, args): ...
+
+Results are cached per (command, args, working directory), plus an optional
+version (e.g. the directory-change counter for `ls`) so an entry is dropped
+as soon as what it shows has changed. Versions are counted by each
+TerminalAPI, so versioned entries are also kept per instance. Only
+successful results (exit code 0) are cached: a `which` miss or an `ls` of a
+path that does not exist yet is answered afresh next time. Identical requests that arrive while
+a result is being computed wait for that computation instead of starting
+their own, so a burst of N `cpu` calls costs one one-second sample.
+
+CODEMATE_RESULT_CACHE=0 turns caching off.
+"""
+
+import functools
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+MAX_ENTRIES = 512
+
+ENABLED = os.getenv('CODEMATE_RESULT_CACHE', '1').lower() not in ('0', 'false', 'no', 'off')
+
+
+class _Pending:
+    """A computation other requests for the same key can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class ResultCache:
+    """TTL cache with request coalescing."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        # key -> (expires at, value)
+        self._entries: "OrderedDict[Hashable, Tuple[float, object]]" = OrderedDict()
+        self._pending: Dict[Hashable, _Pending] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get_or_compute(self, key: Hashable, ttl: Optional[float], compute: Callable[[], object],
+                       cacheable: Optional[Callable[[object], bool]] = None):
+        """Return the cached value for key, computing it once if missing or expired.
+
+        ttl None keeps the value until it is evicted. A value for which
+        cacheable(value) is false is handed to the requests waiting on it but
+        not stored.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > time.monotonic()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            pending = self._pending.get(key)
+            if pending is not None:
+                self.coalesced += 1
+                owner = False
+            else:
+                pending = self._pending[key] = _Pending()
+                self.misses += 1
+                owner = True
+
+        if not owner:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+
+        try:
+            pending.value = compute()
+        except BaseException as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._pending[key]
+                if pending.error is None and (cacheable is None or cacheable(pending.value)):
+                    expires = None if ttl is None else time.monotonic() + ttl
+                    self._entries[key] = (expires, pending.value)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            pending.done.set()
+        return pending.value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "coalesced": self.coalesced}
+
+
+# Shared by every session in the process: the cached outputs don't depend on
+# anything but the key
+results = ResultCache()
+
+# Distinguishes the instances whose versions appear in keys
+_scopes = itertools.count()
+
+
+def _scope(instance) -> int:
+    scope = instance.__dict__.get('_result_cache_scope')
+    if scope is None:
+        scope = instance.__dict__.setdefault('_result_cache_scope', next(_scopes))
+    return scope
+
+
+def _succeeded(result) -> bool:
+    return result[1] == 0
+
+
+def read_only(ttl: Optional[float], version: Optional[Callable[[object], Hashable]] = None):
+    """Cache a `_cmd_*(self, args)` builtin's (output, exit_code) for ttl seconds.
+
+    version(self) is added to the key for outputs that must change as soon
+    as something else does. Results with a non-zero exit code are not kept.
+    """
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, args):
+            if not ENABLED:
+                return method(self, args)
+            key = (method.__name__, tuple(args), self.current_path)
+            if version is not None:
+                key += (_scope(self), version(self))
+            return results.get_or_compute(key, ttl, lambda: method(self, args), _succeeded)
+        wrapper.cache_ttl = ttl
+        return wrapper
+    return decorate
@@ -0,0 +1,64 @@
+"""
+File-backed session state shared between server worker processes.
+
+In pre-fork mode every worker owns its own TerminalAPI, so per-session state
+such as the working directory lives in a small JSON file that each worker
+re-reads (only when it changed) before running a command and rewrites
+afterwards.
+"""
+
+import json
+import os
+import tempfile
+from typing import Any, Dict, Optional
+
+
+def get_state_dir() -> str:
+    """Return the directory session state files are kept in."""
+    return os.getenv('CODEMATE_STATE_DIR') or os.path.join(tempfile.gettempdir(), 'codemate', 'sessions')
+
+
+class SessionStateStore:
+    """Shared JSON state for one session, safe to use from several processes."""
+
+    def __init__(self, session_id: str, state_dir: Optional[str] = None):
+        self.session_id = session_id
+        self.state_dir = state_dir or get_state_dir()
+        self.path = os.path.join(self.state_dir, f"{session_id}.json")
+        self._signature = None
+
+    def _current_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def load_if_changed(self) -> Optional[Dict[str, Any]]:
+        """Return the stored state if another process changed it since we last looked."""
+        signature = self._current_signature()
+        if signature is None or signature == self._signature:
+            return None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._signature = signature
+        return state if isinstance(state, dict) else None
+
+    def save(self, state: Dict[str, Any]):
+        """Atomically replace the stored state."""
+        os.makedirs(self.state_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.state_dir, prefix=f".{self.session_id}.")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return
+        self._signature = self._current_signature()
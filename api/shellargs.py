@@ -0,0 +1,165 @@
+"""
+Argument handling shared by the builtins.
+
+Commands are tokenized with POSIX shell quoting (the rules of
+`shlex.split`), and unquoted tokens containing `*`, `?` or `[` are expanded
+against the filesystem relative to the session's working directory, so
+`cp log* backup/` or `rm -r "my dir"` behave as they would in a shell.
+Directory contents come from a caller-supplied listing function (TerminalAPI
+passes its watched listing cache), so every directory is scanned at most once
+per expansion however many patterns touch it.
+"""
+
+import fnmatch
+import os
+import re
+import shlex
+from typing import Callable, Dict, List, Optional, Tuple
+
+GLOB_CHARS = re.compile(r'[*?[]')
+
+# Builtins whose arguments are patterns or text rather than paths
+NO_GLOB_COMMANDS = {
+    'find', 'grep', 'which', 'whereis', 'ask', 'translate', 'codemate',
+    'history', 'help', 'profile', 'jobs', 'trash', 'symbols'
+}
+
+
+class Token(str):
+    """A command-line word; `glob` is True if it had unquoted wildcards."""
+
+    glob = False
+
+
+def tokenize(command: str) -> List[Token]:
+    """Split a command line like shlex.split, remembering which words may be globbed.
+
+    Unbalanced quotes fall back to plain whitespace splitting, which is what
+    builtins used to receive.
+    """
+    lexer = shlex.shlex(command, posix=True)
+    lexer.whitespace_split = True
+    lexer.commenters = ''
+    try:
+        words = list(lexer)
+    except ValueError:
+        return [Token(word) for word in command.split()]
+
+    # shlex drops the quoting, so find where each word came from to tell
+    # `*.py` from `'*.py'`
+    tokens = []
+    position = 0
+    for word in words:
+        raw, position = _next_raw_word(command, position)
+        token = Token(word)
+        token.glob = bool(GLOB_CHARS.search(word)) and _has_unquoted_glob(raw)
+        tokens.append(token)
+    return tokens
+
+
+def _next_raw_word(command: str, position: int) -> Tuple[str, int]:
+    """Return the next whitespace-delimited word of command, honouring quotes."""
+    while position < len(command) and command[position].isspace():
+        position += 1
+    start = position
+    quote = None
+    while position < len(command):
+        char = command[position]
+        if quote:
+            if char == quote:
+                quote = None
+            elif char == '\\' and quote == '"':
+                position += 1
+        elif char in '\'"':
+            quote = char
+        elif char == '\\':
+            position += 1
+        elif char.isspace():
+            break
+        position += 1
+    return command[start:position], position
+
+
+def _has_unquoted_glob(raw: str) -> bool:
+    quote = None
+    escaped = False
+    for char in raw:
+        if escaped:
+            escaped = False
+        elif quote:
+            if char == quote:
+                quote = None
+            elif char == '\\' and quote == '"':
+                escaped = True
+        elif char in '\'"':
+            quote = char
+        elif char == '\\':
+            escaped = True
+        elif char in '*?[':
+            return True
+    return False
+
+
+def expand(tokens: List[Token], cwd: str, list_dir: Callable[[str], List[Tuple[str, bool]]],
+           start: int = 0) -> List[str]:
+    """Expand glob tokens from index start on; unmatched patterns are kept literally, as in sh."""
+    listings: Dict[str, Optional[List[Tuple[str, bool]]]] = {}
+
+    def listing(path: str):
+        if path not in listings:
+            try:
+                listings[path] = list_dir(path)
+            except OSError:
+                listings[path] = None
+        return listings[path]
+
+    args = []
+    for index, token in enumerate(tokens):
+        if index < start or not getattr(token, 'glob', False):
+            args.append(str(token))
+            continue
+        matches = _expand_pattern(token, cwd, listing)
+        args.extend(matches if matches else [str(token)])
+    return args
+
+
+def _expand_pattern(pattern: str, cwd: str, listing) -> List[str]:
+    """Match pattern one path component at a time, listing each directory once."""
+    absolute = os.path.isabs(pattern)
+    parts = [part for part in pattern.split('/') if part]
+    trailing_slash = pattern.endswith('/')
+    # (path shown to the user, path on disk)
+    candidates = [('/' if absolute else '', '/' if absolute else cwd)]
+
+    for depth, part in enumerate(parts):
+        last = depth == len(parts) - 1
+        is_glob = bool(GLOB_CHARS.search(part))
+        regex = re.compile(fnmatch.translate(part)) if is_glob else None
+        next_candidates = []
+        for shown, real in candidates:
+            if not is_glob:
+                next_candidates.append((os.path.join(shown, part), os.path.join(real, part)))
+                continue
+            entries = listing(real)
+            if not entries:
+                continue
+            for name, is_dir in entries:
+                # Like sh, wildcards don't match a leading dot
+                if name.startswith('.') and not part.startswith('.'):
+                    continue
+                if (not last or trailing_slash) and not is_dir:
+                    continue
+                if regex.match(name):
+                    next_candidates.append((os.path.join(shown, name), os.path.join(real, name)))
+        candidates = next_candidates
+        if not candidates:
+            return []
+
+    # Listed names exist; only a literal last component still needs checking
+    if GLOB_CHARS.search(parts[-1]):
+        matches = [shown for shown, _ in candidates]
+    else:
+        matches = [shown for shown, real in candidates if os.path.lexists(real)]
+    if trailing_slash:
+        matches = [match + '/' for match in matches]
+    return sorted(matches)
@@ -0,0 +1,428 @@
+"""
+Incremental symbol index behind `symbols <name>` and `codemate docs`.
+
+For every Python file under a project root the index records its classes,
+functions, methods and module-level constants (with line, signature and the
+first docstring line) and the modules it imports. The index is kept in
+memory and saved as JSON in the state directory, so a new server process
+starts warm.
+
+Keeping it current is incremental: files are re-parsed only when their
+(mtime, size) changed. With inotify (see fswatch) only the directories the
+watcher reported are re-examined, so a lookup on an unchanged 10k-file tree
+is a dictionary access; with the polling watcher the tree is re-stat'ed at
+most every SCAN_INTERVAL seconds. First-time indexing of large trees is
+spread over the offload process pool.
+"""
+
+import ast
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from analyzer import SKIP_DIRS
+
+INDEX_VERSION = 1
+SCAN_INTERVAL = 2.0
+SAVE_DELAY = 2.0
+MAX_RESULTS = 50
+# Project roots kept in memory per process
+MAX_INDEXES = 4
+# Markers of a project root, nearest first wins
+PROJECT_MARKERS = ('.git', 'pyproject.toml', 'setup.py', 'setup.cfg', 'requirements.txt')
+
+
+def find_project_root(path: str) -> Optional[str]:
+    """Nearest directory at or above path that looks like a project root, else path itself.
+
+    Returns None for the filesystem root or the home directory, which are
+    far too big to index.
+    """
+    path = os.path.abspath(path)
+    current = path
+    while True:
+        if any(os.path.exists(os.path.join(current, marker)) for marker in PROJECT_MARKERS):
+            path = current
+            break
+        parent = os.path.dirname(current)
+        if parent == current:
+            break
+        current = parent
+    if os.path.dirname(path) == path or path == os.path.expanduser('~'):
+        return None
+    return path
+
+
+def _signature(node: ast.AST) -> str:
+    try:
+        return f"({ast.unparse(node.args)})"
+    except Exception:
+        return "(...)"
+
+
+def _doc_line(node: ast.AST) -> str:
+    doc = ast.get_docstring(node, clean=True)
+    return doc.strip().splitlines()[0] if doc and doc.strip() else ''
+
+
+def symbols_from_tree(tree: ast.Module) -> Dict[str, any]:
+    """Definitions and imports of a parsed module, in source order."""
+    symbols = []
+
+    def add_definitions(body, parent: str):
+        for node in body:
+            if isinstance(node, ast.ClassDef):
+                bases = ", ".join(ast.unparse(base) for base in node.bases)
+                symbols.append({"name": node.name, "kind": "class", "line": node.lineno, "parent": parent,
+                                "signature": f"({bases})" if bases else "", "doc": _doc_line(node)})
+                add_definitions(node.body, f"{parent}.{node.name}" if parent else node.name)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                kind = "method" if parent else "function"
+                if isinstance(node, ast.AsyncFunctionDef):
+                    kind = "async " + kind
+                symbols.append({"name": node.name, "kind": kind, "line": node.lineno, "parent": parent,
+                                "signature": _signature(node), "doc": _doc_line(node)})
+            elif not parent and isinstance(node, (ast.Assign, ast.AnnAssign)):
+                targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                for target in targets:
+                    if isinstance(target, ast.Name) and target.id.isupper():
+                        symbols.append({"name": target.id, "kind": "constant", "line": node.lineno,
+                                        "parent": "", "signature": "", "doc": ""})
+
+    add_definitions(tree.body, '')
+    imports = set()
+    _collect_imports(tree.body, imports)
+    return {"doc": _doc_line(tree), "symbols": symbols, "imports": sorted(imports)}
+
+
+def _collect_imports(body, imports: set):
+    # Imports are statements, so only statement lists need visiting, which
+    # is several times faster than ast.walk over every expression node
+    for node in body:
+        if isinstance(node, ast.Import):
+            imports.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            imports.add('.' * node.level + (node.module or ''))
+        else:
+            for field in ('body', 'orelse', 'finalbody', 'handlers', 'cases'):
+                children = getattr(node, field, None)
+                if isinstance(children, list):
+                    _collect_imports(children, imports)
+
+
+def symbols_chunk(path: str, recursive: bool = False) -> Dict[str, any]:
+    """offload.run_chunks adapter: index one file (recursive is unused)."""
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            tree = ast.parse(f.read(), path)
+    except (OSError, SyntaxError, ValueError) as e:
+        return {"doc": "", "symbols": [], "imports": [], "error": str(e)}
+    return symbols_from_tree(tree)
+
+
+class SymbolIndex:
+    """Symbols of every Python file under one project root."""
+
+    def __init__(self, root: str, index_path: Optional[str] = None, watcher=None,
+                 run_chunks: Optional[Callable] = None):
+        self.root = root
+        self.index_path = index_path
+        self.run_chunks = run_chunks
+        self.files: Dict[str, Dict[str, any]] = {}
+        self._by_name: Optional[Dict[str, List[tuple]]] = None
+        self._lock = threading.RLock()
+        self._dirty_dirs = set()
+        self._needs_full_scan = True
+        self._last_scan = 0.0
+        self._save_timer = None
+        self._load()
+
+        self._watcher = watcher
+        self._watching = False
+        if watcher is not None and watcher.tracks_file_changes:
+            watcher.subscribe(self._on_change)
+            self._watching = watcher.watch(root, recursive=True)
+            if not self._watching:
+                watcher.unsubscribe(self._on_change)
+
+    def close(self):
+        with self._lock:
+            timer = self._save_timer
+        if timer is not None:
+            timer.cancel()
+            self._save()
+        if self._watching:
+            self._watcher.unsubscribe(self._on_change)
+            self._watcher.unwatch(self.root, recursive=True)
+            self._watching = False
+
+    def _on_change(self, path: Optional[str]):
+        with self._lock:
+            if path is None:
+                self._needs_full_scan = True
+            elif path == self.root or path.startswith(self.root + os.sep):
+                parts = self._relative(path).split(os.sep)
+                if not any(part in SKIP_DIRS or (part.startswith('.') and part != '.') for part in parts):
+                    self._dirty_dirs.add(path)
+
+    # persistence
+
+    def _load(self):
+        if not self.index_path:
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == INDEX_VERSION and data.get("root") == self.root:
+            self.files = data.get("files", {})
+
+    def _schedule_save(self):
+        """Write the index SAVE_DELAY seconds after the last change, off the request path."""
+        if not self.index_path:
+            return
+        if self._save_timer is not None:
+            self._save_timer.cancel()
+        # Not a daemon, so an index built just before exit still reaches disk
+        self._save_timer = threading.Timer(SAVE_DELAY, self._save)
+        self._save_timer.start()
+
+    def _save(self):
+        with self._lock:
+            self._save_timer = None
+            # Entries are replaced, never mutated, so a shallow copy is a snapshot
+            files = dict(self.files)
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": INDEX_VERSION, "root": self.root, "files": files}, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            pass
+
+    # updating
+
+    def refresh(self) -> int:
+        """Bring the index up to date; returns the number of files re-parsed or dropped."""
+        with self._lock:
+            if self._watching:
+                self._watcher.flush()
+                if self._needs_full_scan:
+                    self._needs_full_scan = False
+                    self._dirty_dirs.clear()
+                    stats = self._scan_tree(self.root)
+                    changed = self._apply(stats, prefix=None)
+                elif self._dirty_dirs:
+                    dirty, self._dirty_dirs = self._dirty_dirs, set()
+                    changed = 0
+                    for directory in sorted(dirty):
+                        changed += self._apply(self._scan_dir(directory), prefix=directory)
+                else:
+                    return 0
+            else:
+                # Without file-level events, re-stat the tree now and then
+                now = time.monotonic()
+                if not self._needs_full_scan and now - self._last_scan < SCAN_INTERVAL:
+                    return 0
+                self._needs_full_scan = False
+                self._last_scan = now
+                changed = self._apply(self._scan_tree(self.root), prefix=None)
+            if changed:
+                self._schedule_save()
+            return changed
+
+    def _relative(self, path: str) -> str:
+        return os.path.relpath(path, self.root)
+
+    def _scan_tree(self, top: str) -> Dict[str, tuple]:
+        """(mtime_ns, size) of every Python file under top, by relative path."""
+        stats = {}
+        for dirpath, dirnames, filenames in os.walk(top):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.startswith('.')]
+            for name in filenames:
+                if name.endswith('.py'):
+                    path = os.path.join(dirpath, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    stats[self._relative(path)] = (stat.st_mtime_ns, stat.st_size)
+        return stats
+
+    def _scan_dir(self, directory: str) -> Dict[str, tuple]:
+        """Like _scan_tree for one reported directory; new subdirectories are walked fully."""
+        stats = {}
+        relative_dir = self._relative(directory)
+        known_dirs = None
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            return stats
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name in SKIP_DIRS or entry.name.startswith('.'):
+                        continue
+                    if known_dirs is None:
+                        known_dirs = {os.path.dirname(rel) for rel in self.files}
+                    sub = os.path.normpath(os.path.join(relative_dir, entry.name))
+                    if sub not in known_dirs:
+                        stats.update(self._scan_tree(entry.path))
+                elif entry.name.endswith('.py'):
+                    stat = entry.stat()
+                    stats[self._relative(entry.path)] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                continue
+        return stats
+
+    @staticmethod
+    def _vanished_under(rel: str, directory: str, relative_prefix: str) -> bool:
+        if not rel.startswith(relative_prefix):
+            return False
+        first = rel[len(relative_prefix):].split(os.sep, 1)[0]
+        return first == rel[len(relative_prefix):] or not os.path.isdir(os.path.join(directory, first))
+
+    def _apply(self, stats: Dict[str, tuple], prefix: Optional[str]) -> int:
+        """Re-parse new or changed files in stats and drop vanished ones.
+
+        prefix limits removals to files below that directory that are either
+        directly in it or in a subdirectory that no longer exists.
+        """
+        if prefix is None:
+            vanished = [rel for rel in self.files if rel not in stats]
+        else:
+            relative_dir = self._relative(prefix)
+            relative_prefix = '' if relative_dir == '.' else relative_dir + os.sep
+            vanished = [rel for rel in self.files
+                        if rel not in stats and self._vanished_under(rel, prefix, relative_prefix)]
+        for rel in vanished:
+            self._unindex(rel)
+            del self.files[rel]
+
+        changed = [rel for rel, (mtime, size) in stats.items()
+                   if rel not in self.files or self.files[rel]["mtime_ns"] != mtime or self.files[rel]["size"] != size]
+        paths = [os.path.join(self.root, rel) for rel in changed]
+        if self.run_chunks is not None and len(paths) > 1:
+            entries = self.run_chunks(symbols_chunk, [(path, False) for path in paths])
+        else:
+            entries = [symbols_chunk(path) for path in paths]
+        for rel, entry in zip(changed, entries):
+            entry["mtime_ns"], entry["size"] = stats[rel]
+            self._unindex(rel)
+            self.files[rel] = entry
+            self._index(rel)
+        return len(vanished) + len(changed)
+
+    # queries
+
+    def _index(self, rel: str):
+        if self._by_name is not None:
+            for symbol in self.files[rel]["symbols"]:
+                self._by_name.setdefault(symbol["name"].lower(), []).append((rel, symbol))
+
+    def _unindex(self, rel: str):
+        if self._by_name is not None and rel in self.files:
+            for symbol in self.files[rel]["symbols"]:
+                key = symbol["name"].lower()
+                pairs = [pair for pair in self._by_name.get(key, []) if pair[0] != rel]
+                if pairs:
+                    self._by_name[key] = pairs
+                else:
+                    self._by_name.pop(key, None)
+
+    def _name_table(self) -> Dict[str, List[tuple]]:
+        if self._by_name is None:
+            table: Dict[str, List[tuple]] = {}
+            for rel, entry in self.files.items():
+                for symbol in entry["symbols"]:
+                    table.setdefault(symbol["name"].lower(), []).append((rel, symbol))
+            self._by_name = table
+        return self._by_name
+
+    def lookup(self, query: str, limit: int = MAX_RESULTS) -> List[tuple]:
+        """(relative path, symbol) pairs for a name or Class.method; substring matches if nothing is exact."""
+        self.refresh()
+        with self._lock:
+            table = self._name_table()
+            parent, _, name = query.rpartition('.')
+            matches = [(rel, symbol) for rel, symbol in table.get(name.lower(), [])
+                       if not parent or symbol["parent"].lower().endswith(parent.lower())]
+            if not matches and not parent:
+                needle = name.lower()
+                matches = [pair for key, pairs in table.items() if needle in key for pair in pairs]
+        # Exact-case matches first, then by path
+        matches.sort(key=lambda pair: (pair[1]["name"] != name, pair[0], pair[1]["line"]))
+        return matches[:limit]
+
+    def stats(self) -> Dict[str, any]:
+        with self._lock:
+            return {"root": self.root, "files": len(self.files),
+                    "symbols": sum(len(entry["symbols"]) for entry in self.files.values()),
+                    "watching": self._watching}
+
+
+def index_path_for(state_dir: str, root: str) -> str:
+    digest = hashlib.sha1(root.encode('utf-8', 'surrogateescape')).hexdigest()[:16]
+    return os.path.join(state_dir, 'symbols', f"{digest}.json")
+
+
+_indexes: "OrderedDict[str, SymbolIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_index(root: str, state_dir: str, watcher=None, run_chunks: Optional[Callable] = None) -> SymbolIndex:
+    """Return the process-wide index of root, shared by all sessions."""
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is None:
+            index = SymbolIndex(root, index_path_for(state_dir, root), watcher, run_chunks)
+            _indexes[root] = index
+            while len(_indexes) > MAX_INDEXES:
+                _indexes.popitem(last=False)[1].close()
+        _indexes.move_to_end(root)
+        return index
+
+
+def format_symbol(rel: str, symbol: Dict[str, any]) -> str:
+    qualified = f"{symbol['parent']}.{symbol['name']}" if symbol["parent"] else symbol["name"]
+    line = f"{rel}:{symbol['line']}: {symbol['kind']} {qualified}{symbol['signature']}"
+    if symbol["doc"]:
+        line += f"  # {symbol['doc']}"
+    return line
+
+
+def format_outline(path: str, entry: Dict[str, any]) -> str:
+    """Markdown-ish outline of one module for `codemate docs`."""
+    lines = [f"# {os.path.basename(path)}", ""]
+    if entry.get("error"):
+        return "\n".join(lines + [f"Could not parse: {entry['error']}"])
+    if entry["doc"]:
+        lines += [entry["doc"], ""]
+    if entry["imports"]:
+        lines += [f"Imports: {', '.join(entry['imports'])}", ""]
+
+    constants = [s for s in entry["symbols"] if s["kind"] == "constant"]
+    if constants:
+        lines.append("## Constants")
+        lines += [f"- {s['name']} (line {s['line']})" for s in constants]
+        lines.append("")
+
+    for symbol in entry["symbols"]:
+        if symbol["kind"] == "class":
+            depth = symbol["parent"].count('.') + 1 if symbol["parent"] else 0
+            heading = '#' * min(2 + depth, 6)
+            lines.append(f"{heading} class {symbol['name']}{symbol['signature']}  (line {symbol['line']})")
+            if symbol["doc"]:
+                lines.append(symbol["doc"])
+            lines.append("")
+        elif symbol["kind"] != "constant":
+            indent = "  " * (symbol["parent"].count('.') + 1 if symbol["parent"] else 0)
+            doc = f" - {symbol['doc']}" if symbol["doc"] else ""
+            lines.append(f"{indent}- {symbol['kind']} {symbol['name']}{symbol['signature']}  (line {symbol['line']}){doc}")
+    return "\n".join(lines).rstrip()
@@ -2,160 +2,340 @@ from http.server import BaseHTTPRequestHandler
 import json
 import os
 import sys
-import subprocess
 import re
-import shutil
-import glob
+import select
+import signal
+import socket
+import threading
 import time
+import zlib
+import importlib
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime
-from pathlib import Path
+from urllib.parse import urlparse, parse_qs, quote
 
-# Try to import psutil, fallback if not available
-try:
-    import psutil
-    PSUTIL_AVAILABLE = True
-except ImportError:
-    PSUTIL_AVAILABLE = False
+# Make sibling helper modules importable both locally and on Vercel
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from history import CommandHistory, get_history_id
+from metrics import metrics, RequestMetricsMixin
+from session_store import SessionStateStore, get_state_dir
+import offload
+from jobs import JobRegistry, format_job
+import intents
+import planner
+from resultcache import read_only
+from outputstore import DEFAULT_PAGE, OutputError, OutputStore, format_size
+import shellargs
+from profiling import PROFILING_ENABLED, parse_profile_modes, profile_call, format_profile_report
+
+
+class _LazyModule:
+    """Defers importing a module until one of its attributes is first used.
+    
+    Keeps serverless cold starts fast; a missing module raises ImportError
+    at the point of use, which the command handlers already report.
+    """
+    
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+    
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+    
+    def available(self) -> bool:
+        try:
+            self._load()
+            return True
+        except ImportError:
+            return False
+    
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+
+psutil = _LazyModule('psutil')
+platform = _LazyModule('platform')
+subprocess = _LazyModule('subprocess')
+# Modules behind particular builtins and routes; they pull in ast, tarfile,
+# zipfile, hashlib, concurrent.futures and ctypes, which most requests never need
+fswatch = _LazyModule('fswatch')
+fileops = _LazyModule('fileops')
+trash = _LazyModule('trash')
+analyzer = _LazyModule('analyzer')
+symbols = _LazyModule('symbols')
+testgen = _LazyModule('testgen')
+qa_index = _LazyModule('qa_index')
+transfer = _LazyModule('transfer')
+
+
+class _LazyAttribute:
+    """Instance attribute built by factory(instance) on first access.
+    
+    Built once even if several handler threads ask at the same time; after
+    that it is a plain instance attribute.
+    """
+    
+    _lock = threading.RLock()
+    
+    def __init__(self, factory):
+        self.factory = factory
+        self.name = None
+    
+    def __set_name__(self, owner, name):
+        self.name = name
+    
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        with self._lock:
+            if self.name not in instance.__dict__:
+                instance.__dict__[self.name] = self.factory(instance)
+        return instance.__dict__[self.name]
+
+# Seconds an external command may run before it is killed
+EXTERNAL_TIMEOUT = 30
+# How often a running external command checks whether it was cancelled
+CANCEL_POLL_INTERVAL = 0.1
+# Cancellations are remembered this long for requests that have not arrived yet
+CANCEL_EXPIRY = 600
+
+
+class _RequestContext:
+    """What one execute_command call is given and learns while it runs.
+    
+    A TerminalAPI is shared by every handler thread of a threaded server,
+    so builtins report back through the context of the request running on
+    their thread (TerminalAPI._request) rather than through the instance.
+    """
+    
+    def __init__(self, request_id: Optional[str] = None, disconnected=None):
+        # What cancels the request: cancel() with its id, or the client going away
+        self.request_id = request_id
+        self.disconnected = disconnected
+        # Set when an external command was killed on cancellation
+        self.interrupted = False
+        # Background job a large cp/mv was turned into
+        self.job = None
+        # Set while the steps of an && chain run
+        self.in_chain = False
+        # URL `download` wants the browser to fetch
+        self.download = None
+        # Output a builtin already wrote to the output store
+        self.stored_output = None
+
+
+def _kill_process_group(process):
+    """Kill a process started in its own session, together with everything it started."""
+    try:
+        if os.name == 'posix':
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except OSError:
+        pass
 
-try:
-    import platform
-    PLATFORM_AVAILABLE = True
-except ImportError:
-    PLATFORM_AVAILABLE = False
 
 class TerminalAPI:
     """Enhanced API wrapper for CodeMate Terminal functionality."""
     
-    def __init__(self):
+    def __init__(self, session_id: Optional[str] = None, state_store: Optional[SessionStateStore] = None,
+                 history_id: Optional[str] = None):
         # Start in C: drive by default (Windows) or root directory (Unix)
         if os.name == 'nt':  # Windows
             self.current_path = 'C:\\'
         else:  # Unix/Linux/Mac
             self.current_path = '/'
-        self.command_history = []
-        self.session_id = f"session_{int(time.time())}"
-        
-        # Initialize system info
-        self.system_info = self._get_system_info()
-        
-        # Enhanced AI patterns for natural language processing
-        self.ai_patterns = {
-            # Complex multi-step commands (check these first)
-            'create_and_move': [
-                r'create\s+(?:a\s+)?(?:new\s+)?(?:folder|directory)\s+(?:called\s+|named\s+)?([^\s]+)\s+and\s+move\s+([^\s]+)\s+(?:to|into)\s+(?:it|that\s+folder)',
-                r'make\s+(?:a\s+)?(?:new\s+)?(?:folder|directory)\s+(?:called\s+|named\s+)?([^\s]+)\s+and\s+move\s+([^\s]+)\s+(?:to|into)\s+(?:it|that\s+folder)',
-                r'new\s+(?:folder|directory)\s+(?:called\s+|named\s+)?([^\s]+)\s+and\s+move\s+([^\s]+)\s+(?:to|into)\s+(?:it|that\s+folder)',
-                r'create\s+(?:a\s+)?(?:new\s+)?(?:folder|directory)\s+(?:called\s+|named\s+)?([^\s]+)\s+and\s+move\s+([^\s]+)\s+(?:to|into)\s+it',
-                r'make\s+(?:a\s+)?(?:new\s+)?(?:folder|directory)\s+(?:called\s+|named\s+)?([^\s]+)\s+and\s+move\s+([^\s]+)\s+(?:to|into)\s+it'
-            ],
-            'create_and_copy': [
-                r'create\s+(?:a\s+)?(?:new\s+)?(?:folder|directory)\s+(?:called\s+|named\s+)?([^\s]+)\s+and\s+copy\s+([^\s]+)\s+(?:to|into)\s+(?:it|that\s+folder)',
-                r'make\s+(?:a\s+)?(?:new\s+)?(?:folder|directory)\s+(?:called\s+|named\s+)?([^\s]+)\s+and\s+copy\s+([^\s]+)\s+(?:to|into)\s+(?:it|that\s+folder)',
-                r'new\s+(?:folder|directory)\s+(?:called\s+|named\s+)?([^\s]+)\s+and\s+copy\s+([^\s]+)\s+(?:to|into)\s+(?:it|that\s+folder)'
-            ],
-            'backup_files': [
-                r'create\s+(?:a\s+)?(?:backup|backup\s+folder)\s+(?:called\s+|named\s+)?([^\s]+)\s+and\s+copy\s+(?:all\s+)?([^\s]+)\s+(?:files\s+)?(?:to|into)\s+(?:it|that\s+folder)',
-                r'make\s+(?:a\s+)?(?:backup|backup\s+folder)\s+(?:called\s+|named\s+)?([^\s]+)\s+and\s+copy\s+(?:all\s+)?([^\s]+)\s+(?:files\s+)?(?:to|into)\s+(?:it|that\s+folder)'
-            ],
-            'organize_files': [
-                r'create\s+(?:a\s+)?(?:folder|directory)\s+(?:called\s+|named\s+)?([^\s]+)\s+and\s+move\s+(?:all\s+)?([^\s]+)\s+(?:files\s+)?(?:to|into)\s+(?:it|that\s+folder)',
-                r'organize\s+(?:all\s+)?([^\s]+)\s+(?:files\s+)?(?:into\s+)?(?:a\s+)?(?:folder|directory)\s+(?:called\s+|named\s+)?([^\s]+)'
-            ],
-            
-            # Simple single commands
-            'create_folder': [
-                r'create\s+(?:a\s+)?(?:folder|directory)\s+(?:called\s+|named\s+)?([^\s]+)',
-                r'make\s+(?:a\s+)?(?:folder|directory)\s+(?:called\s+|named\s+)?([^\s]+)',
-                r'new\s+(?:folder|directory)\s+(?:called\s+|named\s+)?([^\s]+)',
-                r'add\s+(?:a\s+)?(?:folder|directory)\s+(?:called\s+|named\s+)?([^\s]+)'
-            ],
-            'create_file': [
-                r'create\s+(?:a\s+)?(?:file|document)\s+(?:called\s+|named\s+)?([^\s]+)',
-                r'make\s+(?:a\s+)?(?:file|document)\s+(?:called\s+|named\s+)?([^\s]+)',
-                r'new\s+(?:file|document)\s+(?:called\s+|named\s+)?([^\s]+)',
-                r'add\s+(?:a\s+)?(?:file|document)\s+(?:called\s+|named\s+)?([^\s]+)'
-            ],
-            'move_file': [
-                r'move\s+([^\s]+)\s+(?:to|into)\s+([^\s]+)',
-                r'put\s+([^\s]+)\s+(?:in|into)\s+([^\s]+)',
-                r'transfer\s+([^\s]+)\s+(?:to|into)\s+([^\s]+)',
-                r'relocate\s+([^\s]+)\s+(?:to|into)\s+([^\s]+)'
-            ],
-            'copy_file': [
-                r'copy\s+([^\s]+)\s+(?:to|into)\s+([^\s]+)',
-                r'duplicate\s+([^\s]+)\s+(?:to|into)\s+([^\s]+)',
-                r'backup\s+([^\s]+)\s+(?:to|into)\s+([^\s]+)'
-            ],
-            'delete_file': [
-                r'delete\s+([^\s]+)',
-                r'remove\s+([^\s]+)',
-                r'erase\s+([^\s]+)',
-                r'get\s+rid\s+of\s+([^\s]+)'
-            ],
-            'list_files': [
-                r'list\s+(?:files|contents)',
-                r'show\s+(?:files|contents)',
-                r'show\s+me\s+(?:my\s+)?(?:files|contents)',
-                r'what\s+(?:files|is)\s+in\s+(?:this\s+)?directory',
-                r'display\s+(?:files|contents)',
-                r'see\s+(?:files|contents)'
-            ],
-            'change_directory': [
-                r'go\s+(?:to\s+|into\s+)?(?:the\s+)?([^\s]+(?:\s+[^\s]+)*)',
-                r'navigate\s+(?:to\s+)?(?:the\s+)?([^\s]+(?:\s+[^\s]+)*)',
-                r'enter\s+(?:the\s+)?([^\s]+(?:\s+[^\s]+)*)',
-                r'change\s+(?:to\s+)?(?:the\s+)?([^\s]+(?:\s+[^\s]+)*)',
-                r'switch\s+(?:to\s+)?(?:the\s+)?([^\s]+(?:\s+[^\s]+)*)'
-            ],
-            'show_help': [
-                r'help\s+(?:me\s+)?(?:with\s+)?(?:commands|terminal)',
-                r'what\s+(?:commands|can)\s+i\s+(?:use|do)',
-                r'how\s+do\s+i\s+(?:use|work\s+with)\s+this',
-                r'show\s+me\s+(?:the\s+)?(?:commands|help)'
-            ],
-            'system_info': [
-                r'what\s+(?:is\s+)?(?:my\s+)?(?:system|computer)\s+(?:info|information)',
-                r'show\s+(?:me\s+)?(?:system|computer)\s+(?:info|information)',
-                r'tell\s+me\s+(?:about\s+)?(?:my\s+)?(?:system|computer)',
-                r'display\s+(?:system|computer)\s+(?:info|information)'
-            ],
-            'process_info': [
-                r'what\s+(?:are\s+)?(?:the\s+)?(?:running\s+)?processes',
-                r'show\s+(?:me\s+)?(?:the\s+)?(?:running\s+)?processes',
-                r'list\s+(?:the\s+)?(?:running\s+)?processes',
-                r'display\s+(?:the\s+)?(?:running\s+)?processes'
-            ],
-            'memory_info': [
-                r'what\s+(?:is\s+)?(?:my\s+)?(?:memory|ram)\s+(?:usage|info)',
-                r'show\s+(?:me\s+)?(?:memory|ram)\s+(?:usage|info)',
-                r'tell\s+me\s+(?:about\s+)?(?:my\s+)?(?:memory|ram)',
-                r'display\s+(?:memory|ram)\s+(?:usage|info)'
-            ],
-            'cpu_info': [
-                r'what\s+(?:is\s+)?(?:my\s+)?(?:cpu|processor)\s+(?:usage|info)',
-                r'show\s+(?:me\s+)?(?:cpu|processor)\s+(?:usage|info)',
-                r'tell\s+me\s+(?:about\s+)?(?:my\s+)?(?:cpu|processor)',
-                r'display\s+(?:cpu|processor)\s+(?:usage|info)'
-            ],
-            'codemate_commands': [
-                r'debug\s+(?:this\s+)?(?:code\s+)?(?:file\s+)?([^\s]+)',
-                r'review\s+(?:this\s+)?(?:code\s+)?(?:file\s+)?([^\s]+)',
-                r'optimize\s+(?:this\s+)?(?:code\s+)?(?:file\s+)?([^\s]+)',
-                r'test\s+(?:this\s+)?(?:code\s+)?(?:file\s+)?([^\s]+)',
-                r'document\s+(?:this\s+)?(?:code\s+)?(?:file\s+)?([^\s]+)'
-            ],
-            'find_files': [
-                r'find\s+(?:files\s+)?(?:called\s+|named\s+)?([^\s]+)',
-                r'search\s+(?:for\s+)?(?:files\s+)?(?:called\s+|named\s+)?([^\s]+)',
-                r'locate\s+(?:files\s+)?(?:called\s+|named\s+)?([^\s]+)'
-            ],
-            'grep_search': [
-                r'search\s+(?:for\s+)?(?:text\s+)?([^\s]+)\s+(?:in\s+)?(?:files\s+)?([^\s]+)',
-                r'find\s+(?:text\s+)?([^\s]+)\s+(?:in\s+)?(?:files\s+)?([^\s]+)',
-                r'grep\s+([^\s]+)\s+(?:in\s+)?([^\s]+)'
+        self.session_id = session_id or f"session_{int(time.time())}"
+        
+        # When several worker processes serve one session, state they must
+        # agree on (e.g. the working directory) round-trips through this store
+        self.state_store = state_store
+        # History outlives the session id, which changes with every start
+        self.command_history = CommandHistory(history_id or get_history_id(), shared=state_store is not None)
+        
+        # Background jobs (large cp/mv); snapshots are shared between workers
+        self.jobs = JobRegistry(os.path.join(state_store.state_dir, 'jobs') if state_store else None)
+        # The _RequestContext of the request each thread is executing
+        self._local = threading.local()
+        
+        # Ctrl+C in the UI cancels requests by id; a cancel may reach another
+        # worker than the one running the command, so it leaves a marker file
+        self._cancelled: Dict[str, float] = {}
+        self._cancel_lock = threading.Lock()
+        self._cancel_dir = os.path.join(state_store.state_dir, 'cancel') if state_store else None
+        
+        # Outputs too large for one response, paged through /api/output/<handle>
+        self.outputs = OutputStore(os.path.join(state_store.state_dir if state_store else get_state_dir(), 'outputs'))
+        
+        # Per-session profiling (only honoured when CODEMATE_PROFILING=1)
+        self.profile_modes = set()
+        self.last_profile = None
+        
+        # System info is probed on first use (see the system_info property)
+        self._system_info = None
+        self._welcome_static = None
+        self._welcome_prefix = None
+        self._welcome_etag = None
+    
+    # Built on first use, so that requests which never touch them don't pay
+    # for the imports (see _LazyModule above)
+    
+    # ls listings and du totals, invalidated by a filesystem watcher
+    dir_cache = _LazyAttribute(lambda self: fswatch.DirectoryCache())
+    # rm -r moves trees here and deletes them in the background
+    trash = _LazyAttribute(lambda self: trash.Trash(self.session_id, self.jobs))
+    # codemate review/debug/optimize results, keyed by (path, mtime, size)
+    analysis_cache = _LazyAttribute(lambda self: analyzer.AnalysisCache())
+    # Built once per process from ask_answers.json and the help text
+    qa_index = _LazyAttribute(lambda self: qa_index.get_index(self._cmd_help([])[0]))
+    # Chunked uploads; manifests outlive the process so uploads can resume
+    uploads = _LazyAttribute(lambda self: transfer.UploadManager(
+        os.path.join(self.state_store.state_dir if self.state_store else get_state_dir(), 'uploads')))
+    
+    # Enhanced AI patterns for natural language processing, shared by all
+    # instances and compiled once on first use
+    ai_patterns = {
+        # Complex multi-step commands (check these first)
+        'create_and_move': [
+            r'create\s+(?:a\s+)?(?:new\s+)?(?:folder|directory)\s+(?:called\s+|named\s+)?([^\s]+)\s+and\s+move\s+([^\s]+)\s+(?:to|into)\s+(?:it|that\s+folder)',
+            r'make\s+(?:a\s+)?(?:new\s+)?(?:folder|directory)\s+(?:called\s+|named\s+)?([^\s]+)\s+and\s+move\s+([^\s]+)\s+(?:to|into)\s+(?:it|that\s+folder)',
+            r'new\s+(?:folder|directory)\s+(?:called\s+|named\s+)?([^\s]+)\s+and\s+move\s+([^\s]+)\s+(?:to|into)\s+(?:it|that\s+folder)',
+            r'create\s+(?:a\s+)?(?:new\s+)?(?:folder|directory)\s+(?:called\s+|named\s+)?([^\s]+)\s+and\s+move\s+([^\s]+)\s+(?:to|into)\s+it',
+            r'make\s+(?:a\s+)?(?:new\s+)?(?:folder|directory)\s+(?:called\s+|named\s+)?([^\s]+)\s+and\s+move\s+([^\s]+)\s+(?:to|into)\s+it'
+        ],
+        'create_and_copy': [
+            r'create\s+(?:a\s+)?(?:new\s+)?(?:folder|directory)\s+(?:called\s+|named\s+)?([^\s]+)\s+and\s+copy\s+([^\s]+)\s+(?:to|into)\s+(?:it|that\s+folder)',
+            r'make\s+(?:a\s+)?(?:new\s+)?(?:folder|directory)\s+(?:called\s+|named\s+)?([^\s]+)\s+and\s+copy\s+([^\s]+)\s+(?:to|into)\s+(?:it|that\s+folder)',
+            r'new\s+(?:folder|directory)\s+(?:called\s+|named\s+)?([^\s]+)\s+and\s+copy\s+([^\s]+)\s+(?:to|into)\s+(?:it|that\s+folder)'
+        ],
+        'backup_files': [
+            r'create\s+(?:a\s+)?(?:backup|backup\s+folder)\s+(?:called\s+|named\s+)?([^\s]+)\s+and\s+copy\s+(?:all\s+)?([^\s]+)\s+(?:files\s+)?(?:to|into)\s+(?:it|that\s+folder)',
+            r'make\s+(?:a\s+)?(?:backup|backup\s+folder)\s+(?:called\s+|named\s+)?([^\s]+)\s+and\s+copy\s+(?:all\s+)?([^\s]+)\s+(?:files\s+)?(?:to|into)\s+(?:it|that\s+folder)'
+        ],
+        'organize_files': [
+            r'create\s+(?:a\s+)?(?:folder|directory)\s+(?:called\s+|named\s+)?([^\s]+)\s+and\s+move\s+(?:all\s+)?([^\s]+)\s+(?:files\s+)?(?:to|into)\s+(?:it|that\s+folder)',
+            r'organize\s+(?:all\s+)?([^\s]+)\s+(?:files\s+)?(?:into\s+)?(?:a\s+)?(?:folder|directory)\s+(?:called\s+|named\s+)?([^\s]+)'
+        ],
+        
+        # Simple single commands
+        'create_folder': [
+            r'create\s+(?:a\s+)?(?:folder|directory)\s+(?:called\s+|named\s+)?([^\s]+)',
+            r'make\s+(?:a\s+)?(?:folder|directory)\s+(?:called\s+|named\s+)?([^\s]+)',
+            r'new\s+(?:folder|directory)\s+(?:called\s+|named\s+)?([^\s]+)',
+            r'add\s+(?:a\s+)?(?:folder|directory)\s+(?:called\s+|named\s+)?([^\s]+)'
+        ],
+        'create_file': [
+            r'create\s+(?:a\s+)?(?:file|document)\s+(?:called\s+|named\s+)?([^\s]+)',
+            r'make\s+(?:a\s+)?(?:file|document)\s+(?:called\s+|named\s+)?([^\s]+)',
+            r'new\s+(?:file|document)\s+(?:called\s+|named\s+)?([^\s]+)',
+            r'add\s+(?:a\s+)?(?:file|document)\s+(?:called\s+|named\s+)?([^\s]+)'
+        ],
+        'move_file': [
+            r'move\s+([^\s]+)\s+(?:to|into)\s+([^\s]+)',
+            r'put\s+([^\s]+)\s+(?:in|into)\s+([^\s]+)',
+            r'transfer\s+([^\s]+)\s+(?:to|into)\s+([^\s]+)',
+            r'relocate\s+([^\s]+)\s+(?:to|into)\s+([^\s]+)'
+        ],
+        'copy_file': [
+            r'copy\s+([^\s]+)\s+(?:to|into)\s+([^\s]+)',
+            r'duplicate\s+([^\s]+)\s+(?:to|into)\s+([^\s]+)',
+            r'backup\s+([^\s]+)\s+(?:to|into)\s+([^\s]+)'
+        ],
+        'delete_file': [
+            r'delete\s+([^\s]+)',
+            r'remove\s+([^\s]+)',
+            r'erase\s+([^\s]+)',
+            r'get\s+rid\s+of\s+([^\s]+)'
+        ],
+        'list_files': [
+            r'list\s+(?:files|contents)',
+            r'show\s+(?:files|contents)',
+            r'show\s+me\s+(?:my\s+)?(?:files|contents)',
+            r'what\s+(?:files|is)\s+in\s+(?:this\s+)?directory',
+            r'display\s+(?:files|contents)',
+            r'see\s+(?:files|contents)'
+        ],
+        'change_directory': [
+            r'go\s+(?:to\s+|into\s+)?(?:the\s+)?([^\s]+(?:\s+[^\s]+)*)',
+            r'navigate\s+(?:to\s+)?(?:the\s+)?([^\s]+(?:\s+[^\s]+)*)',
+            r'enter\s+(?:the\s+)?([^\s]+(?:\s+[^\s]+)*)',
+            r'change\s+(?:to\s+)?(?:the\s+)?([^\s]+(?:\s+[^\s]+)*)',
+            r'switch\s+(?:to\s+)?(?:the\s+)?([^\s]+(?:\s+[^\s]+)*)'
+        ],
+        'show_help': [
+            r'help\s+(?:me\s+)?(?:with\s+)?(?:commands|terminal)',
+            r'what\s+(?:commands|can)\s+i\s+(?:use|do)',
+            r'how\s+do\s+i\s+(?:use|work\s+with)\s+this',
+            r'show\s+me\s+(?:the\s+)?(?:commands|help)'
+        ],
+        'system_info': [
+            r'what\s+(?:is\s+)?(?:my\s+)?(?:system|computer)\s+(?:info|information)',
+            r'show\s+(?:me\s+)?(?:system|computer)\s+(?:info|information)',
+            r'tell\s+me\s+(?:about\s+)?(?:my\s+)?(?:system|computer)',
+            r'display\s+(?:system|computer)\s+(?:info|information)'
+        ],
+        'process_info': [
+            r'what\s+(?:are\s+)?(?:the\s+)?(?:running\s+)?processes',
+            r'show\s+(?:me\s+)?(?:the\s+)?(?:running\s+)?processes',
+            r'list\s+(?:the\s+)?(?:running\s+)?processes',
+            r'display\s+(?:the\s+)?(?:running\s+)?processes'
+        ],
+        'memory_info': [
+            r'what\s+(?:is\s+)?(?:my\s+)?(?:memory|ram)\s+(?:usage|info)',
+            r'show\s+(?:me\s+)?(?:memory|ram)\s+(?:usage|info)',
+            r'tell\s+me\s+(?:about\s+)?(?:my\s+)?(?:memory|ram)',
+            r'display\s+(?:memory|ram)\s+(?:usage|info)'
+        ],
+        'cpu_info': [
+            r'what\s+(?:is\s+)?(?:my\s+)?(?:cpu|processor)\s+(?:usage|info)',
+            r'show\s+(?:me\s+)?(?:cpu|processor)\s+(?:usage|info)',
+            r'tell\s+me\s+(?:about\s+)?(?:my\s+)?(?:cpu|processor)',
+            r'display\s+(?:cpu|processor)\s+(?:usage|info)'
+        ],
+        'codemate_commands': [
+            r'debug\s+(?:this\s+)?(?:code\s+)?(?:file\s+)?([^\s]+)',
+            r'review\s+(?:this\s+)?(?:code\s+)?(?:file\s+)?([^\s]+)',
+            r'optimize\s+(?:this\s+)?(?:code\s+)?(?:file\s+)?([^\s]+)',
+            r'test\s+(?:this\s+)?(?:code\s+)?(?:file\s+)?([^\s]+)',
+            r'document\s+(?:this\s+)?(?:code\s+)?(?:file\s+)?([^\s]+)'
+        ],
+        'find_files': [
+            r'find\s+(?:files\s+)?(?:called\s+|named\s+)?([^\s]+)',
+            r'search\s+(?:for\s+)?(?:files\s+)?(?:called\s+|named\s+)?([^\s]+)',
+            r'locate\s+(?:files\s+)?(?:called\s+|named\s+)?([^\s]+)'
+        ],
+        'grep_search': [
+            r'search\s+(?:for\s+)?(?:text\s+)?([^\s]+)\s+(?:in\s+)?(?:files\s+)?([^\s]+)',
+            r'find\s+(?:text\s+)?([^\s]+)\s+(?:in\s+)?(?:files\s+)?([^\s]+)',
+            r'grep\s+([^\s]+)\s+(?:in\s+)?([^\s]+)'
+        ]
+    }
+    
+    # Categories that already translate a whole multi-step request
+    MULTI_STEP_CATEGORIES = ('create_and_move', 'create_and_copy', 'backup_files', 'organize_files')
+    
+    _compiled_patterns = None
+    
+    @classmethod
+    def _get_compiled_patterns(cls) -> List[Tuple[str, List[re.Pattern]]]:
+        """Compile ai_patterns once per process."""
+        if cls._compiled_patterns is None:
+            cls._compiled_patterns = [
+                (category, [re.compile(pattern) for pattern in patterns])
+                for category, patterns in cls.ai_patterns.items()
             ]
-        }
+        return cls._compiled_patterns
+    
+    @property
+    def system_info(self) -> Dict[str, str]:
+        """System information, probed on first access."""
+        if self._system_info is None:
+            self._system_info = self._get_system_info()
+        return self._system_info
     
     def _get_system_info(self) -> Dict[str, str]:
         """Get system information."""
@@ -164,18 +344,18 @@ class TerminalAPI:
             "python_version": sys.version.split()[0],
             "user": os.getenv('USER', 'unknown'),
             "current_directory": self.current_path,
-            "psutil_available": str(PSUTIL_AVAILABLE),
-            "platform_available": str(PLATFORM_AVAILABLE)
+            "psutil_available": str(psutil.available()),
+            "platform_available": str(platform.available())
         }
         
-        if PLATFORM_AVAILABLE:
+        if platform.available():
             try:
                 info["platform"] = f"{platform.system()} {platform.release()}"
                 info["architecture"] = platform.machine()
             except:
                 pass
         
-        if PSUTIL_AVAILABLE:
+        if psutil.available():
             try:
                 info["cpu_count"] = str(psutil.cpu_count())
                 info["memory_total"] = f"{psutil.virtual_memory().total // (1024**3)} GB"
@@ -184,9 +364,8 @@ class TerminalAPI:
         
         return info
     
-    def get_system_banner(self) -> str:
-        """Get CodeMate ASCII banner."""
-        banner = """
+    # Welcome content is static; it is built and serialized once per instance
+    SYSTEM_BANNER = """
 ╔═══════════════════════════════════════════════════════════════════════════════════════╗
 ║                                                                                       ║
 ║      ██████╗ ██████╗ ██████╗ ███████╗███╗   ███╗ █████╗ ████████╗███████╗          ║
@@ -200,47 +379,123 @@ class TerminalAPI:
 ║                         CodeMate.ai Hackathon                                        ║
 ║                                                                                       ║
 ╚═══════════════════════════════════════════════════════════════════════════════════════╝
-"""
-        return banner.strip()
+""".strip()
+    
+    WELCOME_FEATURES = (
+        "AI Natural Language Processing",
+        "Real-time Command Execution",
+        "Command History & Auto-completion",
+        "System Monitoring",
+        "File Operations",
+        "CodeMate Integration",
+        "Cross-platform Web Access"
+    )
+    
+    WELCOME_AI_EXAMPLES = (
+        "create a folder called test",
+        "show me my files",
+        "what's my memory usage",
+        "create a new folder called demo and move file1.txt into it",
+        "find files called readme",
+        "search for function in *.py files",
+        "tell me about my system",
+        "debug this code file"
+    )
+    
+    def get_system_banner(self) -> str:
+        """Get CodeMate ASCII banner."""
+        return self.SYSTEM_BANNER
+    
+    def _get_welcome_static(self) -> Dict[str, any]:
+        """Session-independent part of the welcome information, built once."""
+        if self._welcome_static is None:
+            self._welcome_static = {
+                "banner": self.SYSTEM_BANNER,
+                "system_info": self.system_info,
+                "features": list(self.WELCOME_FEATURES),
+                "ai_examples": list(self.WELCOME_AI_EXAMPLES),
+                "permission_granted": True
+            }
+        return self._welcome_static
     
     def get_welcome_info(self) -> Dict[str, any]:
         """Get comprehensive welcome information."""
-        info = {
-            "banner": self.get_system_banner(),
-            "system_info": self.system_info,
-            "features": [
-                "AI Natural Language Processing",
-                "Real-time Command Execution", 
-                "Command History & Auto-completion",
-                "System Monitoring",
-                "File Operations",
-                "CodeMate Integration",
-                "Cross-platform Web Access"
-            ],
-            "ai_examples": [
-                "create a folder called test",
-                "show me my files", 
-                "what's my memory usage",
-                "create a new folder called demo and move file1.txt into it",
-                "find files called readme",
-                "search for function in *.py files",
-                "tell me about my system",
-                "debug this code file"
-            ],
-            "permission_granted": True,
-            "session_id": self.session_id,
-            "timestamp": datetime.now().isoformat()
-        }
+        info = dict(self._get_welcome_static())
+        info["session_id"] = self.session_id
+        info["timestamp"] = datetime.now().isoformat()
         return info
     
+    def get_welcome_json(self, wrapped: bool = False) -> Tuple[bytes, str]:
+        """Get the welcome information as JSON bytes plus a weak ETag.
+        
+        The static part is serialized once and only the timestamp is spliced
+        in per call. wrapped nests the payload as {"status": ..., "welcome": ...}
+        the way the Vercel handler responds.
+        """
+        if self._welcome_prefix is None:
+            static_json = json.dumps(self._get_welcome_static())
+            self._welcome_prefix = (static_json[:-1] + ', "session_id": ' + json.dumps(self.session_id)
+                                    + ', "timestamp": "').encode()
+            # The timestamp changes every call, so the tag covers everything else
+            self._welcome_etag = f'W/"{zlib.crc32(self._welcome_prefix):08x}"'
+        
+        body = self._welcome_prefix + datetime.now().isoformat().encode() + b'"}'
+        if wrapped:
+            body = b'{"status": "success", "welcome": ' + body + b'}'
+        return body, self._welcome_etag
+    
+    def fs_changes(self, since: str = '0') -> Dict[str, any]:
+        """Directories changed since a sequence number, for clients refreshing listings."""
+        try:
+            since = int(since)
+        except ValueError:
+            since = 0
+        return self.dir_cache.changes_since(since)
+    
+    def search_history(self, text: str = '', limit: str = '20') -> List[Dict[str, any]]:
+        """Reverse-search command history; an empty query returns recent entries."""
+        try:
+            limit = max(1, min(int(limit), 1000))
+        except (TypeError, ValueError):
+            limit = 20
+        
+        if text:
+            return self.command_history.search(text, limit)
+        return list(reversed(self.command_history.recent(limit)))
+    
     def process_natural_language(self, command: str) -> Optional[str]:
         """Process natural language commands and convert them to terminal commands."""
+        steps = self.plan_natural_language(command)
+        if not steps:
+            return None
+        return ' && '.join(step["command"] for step in steps)
+    
+    def plan_natural_language(self, command: str) -> Optional[List[Dict[str, str]]]:
+        """Translate a request into [{"text": clause, "command": translation}, ...].
+        
+        Requests joined by "and", "then" or commas become one step per clause,
+        unless one of the multi-step patterns covers the whole request.
+        """
+        command_lower = command.lower().strip()
+        compound = any(pattern.search(command_lower)
+                       for category, patterns in self._get_compiled_patterns()
+                       if category in self.MULTI_STEP_CATEGORIES for pattern in patterns)
+        if not compound:
+            steps = planner.plan(command, self._translate_clause)
+            if steps:
+                return steps
+        
+        translated = self._translate_clause(command)
+        return [{"text": command.strip(), "command": translated}] if translated else None
+    
+    def _translate_clause(self, command: str) -> Optional[str]:
+        """Translate a single request with the patterns, then the fuzzy classifier."""
         command_lower = command.lower().strip()
         
         # Check each pattern category
-        for category, patterns in self.ai_patterns.items():
+        for category, patterns in self._get_compiled_patterns():
             for pattern in patterns:
-                match = re.search(pattern, command_lower)
+                match = pattern.search(command_lower)
                 if match:
                     if category == 'create_folder':
                         folder_name = match.group(1)
@@ -313,23 +568,236 @@ class TerminalAPI:
                             folder_name, file_pattern = match.groups()
                             return f"mkdir {folder_name} && mv {file_pattern}* {folder_name}/"
         
-        return None
+        # No exact phrasing matched: fall back to the typo-tolerant classifier
+        return intents.get_classifier().translate(command, self._is_local_name)
     
-    def execute_command(self, command: str, natural_language: bool = False) -> Dict[str, any]:
-        """Execute a command and return structured output."""
+    def _is_local_name(self, name: str) -> bool:
+        """Whether name is an entry of the working directory (an entity for the NL fallback)."""
+        try:
+            return any(entry == name for entry, _ in self._list_directory(self.current_path))
+        except OSError:
+            return False
+    
+    def start_trash_sweep(self):
+        """Finish what earlier processes left in any session's trash, on a background thread.
+        
+        Servers call this once at startup, after offload.warm_pool(): the
+        pool's workers are forked, and must not be forked while a sweep runs.
+        """
+        threading.Thread(target=lambda: self.trash.sweep(resume=True), name='trash-sweep', daemon=True).start()
+    
+    @property
+    def _request(self) -> _RequestContext:
+        """Context of the request running on this thread (a throwaway one outside of requests)."""
+        request = getattr(self._local, 'request', None)
+        return request if request is not None else _RequestContext()
+    
+    def execute_command(self, command: str, natural_language: bool = False, profile=None,
+                        request_id: Optional[str] = None, disconnected=None) -> Dict[str, any]:
+        """Execute a command and return structured output.
+        
+        profile requests cProfile/tracemalloc output for this command ("cpu",
+        "memory" or both); the session setting from the `profile` builtin is
+        used otherwise. It is ignored unless CODEMATE_PROFILING=1.
+        
+        An external command is killed when cancel() is called with its
+        request_id, or when disconnected() (a check on the client connection)
+        turns true; the result then has exit code 130 and "cancelled".
+        """
         if not command.strip():
             return {"output": "", "exit_code": 0, "error": None}
+        if request_id and self._cancel_requested(request_id):
+            return {"output": "^C", "exit_code": 130, "error": None, "cancelled": True}
+        
+        if self.state_store is not None:
+            self._load_shared_state()
+            state_before = self._shared_state()
         
-        # Add to history
-        self.command_history.append(command.strip())
+        modes = parse_profile_modes(profile) or self.profile_modes
+        is_profile_command = command.strip().split()[0].lower() == 'profile'
         
+        start_time = time.perf_counter()
+        request, outer = _RequestContext(request_id, disconnected), getattr(self._local, 'request', None)
+        self._local.request = request
+        try:
+            if PROFILING_ENABLED and modes and not is_profile_command:
+                result, report = profile_call(self._run_command, command, natural_language, modes=modes)
+                self.last_profile = report
+                result["profile"] = report
+            else:
+                result = self._run_command(command, natural_language)
+        finally:
+            self._local.request = outer
+        duration = time.perf_counter() - start_time
+        
+        if request.interrupted:
+            result["cancelled"] = True
+        
+        # Commands that went to the background report their job id
+        if request.job is not None:
+            result["job"] = request.job
+        # ...and `download` hands the browser a URL to fetch
+        if request.download is not None:
+            result["download"] = request.download
+        # Large outputs are cut to their start; the rest is fetched by handle
+        if request.stored_output is not None:
+            result["truncated"] = request.stored_output
+        else:
+            head, stored = self.outputs.put(result["output"])
+            if stored is not None:
+                result["output"] = self._truncation_note(head, stored)
+                result["truncated"] = stored
+        output_bytes = (result["truncated"]["stored_bytes"] if "truncated" in result
+                        else len(result["output"].encode('utf-8', 'ignore')))
+        
+        # Add to history with outcome and timing
+        self.command_history.record(command.strip(), result["exit_code"], duration)
+        
+        if self.state_store is not None and self._shared_state() != state_before:
+            self.state_store.save(self._shared_state())
+        
+        name, kind = self._classify_command(command, natural_language, result)
+        metrics.record_command(name, kind, result["exit_code"], duration,
+                               len(command.encode('utf-8', 'ignore')), output_bytes)
+        return result
+    
+    def execute_batch(self, commands: List[Dict[str, any]], profile=None, disconnected=None) -> List[Dict[str, any]]:
+        """Run commands a client queued while its previous request was running, in order.
+        
+        Each entry is {"command", "request_id"?, "natural_language"?}. Like a
+        shell dropping type-ahead on Ctrl+C, everything after a cancelled
+        command is skipped.
+        """
+        results = []
+        for entry in commands:
+            command = entry.get('command', '')
+            if (results and results[-1].get("cancelled")) or (disconnected and disconnected()):
+                result = {"output": "", "exit_code": 130, "error": None, "cancelled": True}
+            else:
+                result = self.execute_command(command, entry.get('natural_language', False), profile,
+                                              entry.get('request_id'), disconnected)
+            result["command"] = command
+            result["current_path"] = self.current_path
+            results.append(result)
+        return results
+    
+    def cancel(self, request_ids: List[str]) -> List[str]:
+        """Cancel requests by id, whether running (in any worker) or still to arrive."""
+        now = time.time()
+        accepted = [request_id for request_id in request_ids
+                    if isinstance(request_id, str) and request_id.replace('-', '').isalnum()]
+        with self._cancel_lock:
+            for request_id in accepted:
+                self._cancelled[request_id] = now
+            for request_id, cancelled_at in list(self._cancelled.items()):
+                if now - cancelled_at > CANCEL_EXPIRY:
+                    del self._cancelled[request_id]
+        
+        if self._cancel_dir is not None and accepted:
+            os.makedirs(self._cancel_dir, exist_ok=True)
+            for request_id in accepted:
+                open(os.path.join(self._cancel_dir, request_id), 'w').close()
+            for entry in os.scandir(self._cancel_dir):
+                try:
+                    if now - entry.stat().st_mtime > CANCEL_EXPIRY:
+                        os.unlink(entry.path)
+                except OSError:
+                    pass
+        return accepted
+    
+    def _cancel_requested(self, request_id: str) -> bool:
+        with self._cancel_lock:
+            if request_id in self._cancelled:
+                return True
+        return self._cancel_dir is not None and os.path.exists(os.path.join(self._cancel_dir, request_id))
+    
+    def complete(self, text: str, limit: str = '50') -> List[str]:
+        """Completions for the last word of text, as whole input lines.
+        
+        The first word completes to builtin names, later words to entries of
+        the directory they point into (folders end in /).
+        """
+        try:
+            limit = max(1, min(int(limit), 500))
+        except (TypeError, ValueError):
+            limit = 50
+        if self.state_store is not None:
+            self._load_shared_state()
+        
+        head, space, word = text.rpartition(' ')
+        prefix = head + space
+        if not head.strip():
+            return [prefix + name for name in sorted(set(self._get_builtin_commands()))
+                    if name.startswith(word.lower())][:limit]
+        
+        directory, slash, partial = word.rpartition('/')
+        directory += slash
+        try:
+            entries = self._list_directory(self._resolve_path(os.path.expanduser(directory) or '.'))
+        except OSError:
+            return []
+        completions = []
+        for name, is_dir in entries:
+            # Hidden entries only when asked for
+            if name.startswith(partial) and (partial.startswith('.') or not name.startswith('.')):
+                completions.append(f"{prefix}{directory}{name}{'/' if is_dir else ''}")
+                if len(completions) >= limit:
+                    break
+        return completions
+    
+    def _truncation_note(self, head: str, stored: Dict[str, any]) -> str:
+        """head followed by a line saying where the rest of the output is."""
+        total = format_size(stored["stored_bytes"]) + ("" if stored["complete"] else " (cut off)")
+        head = head[:-1] if head.endswith('\n') else head
+        return (f"{head}\n... output truncated: showing {format_size(stored['next_offset'])} of {total}; "
+                f"the rest is at {stored['url']}?offset={stored['next_offset']}")
+    
+    def read_output(self, handle: str, offset: str = '0', limit: Optional[str] = None) -> Dict[str, any]:
+        """One page of a stored output (see outputstore)."""
+        try:
+            offset = int(offset)
+            limit = int(limit) if limit else DEFAULT_PAGE
+        except ValueError:
+            raise OutputError("offset and limit must be integers")
+        return self.outputs.read(handle, offset, limit)
+    
+    def _shared_state(self) -> Dict[str, any]:
+        """Session state that must be consistent across worker processes."""
+        return {"current_path": self.current_path, "profile_modes": sorted(self.profile_modes)}
+    
+    def _load_shared_state(self):
+        """Pick up state changes made by other workers serving this session."""
+        state = self.state_store.load_if_changed()
+        if state:
+            self.current_path = state.get("current_path", self.current_path)
+            self.profile_modes = set(state.get("profile_modes", []))
+    
+    def _classify_command(self, command: str, natural_language: bool, result: Dict[str, any]) -> Tuple[str, str]:
+        """Return the (command name, dispatch path) label pair used for metrics."""
+        if natural_language and not result.get("ai_translation"):
+            return "natural_language", "natural_language"
+        
+        executed = result.get("ai_translation") or command
+        if ' && ' in executed:
+            return "chain", "chain"
+        
+        name = executed.strip().split()[0].lower()
+        if name in self._get_builtin_commands():
+            return name, "builtin"
+        return os.path.basename(name), "external"
+    
+    def _run_command(self, command: str, natural_language: bool = False) -> Dict[str, any]:
+        """Translate, dispatch and run a non-empty command."""
         # Process natural language if requested
         ai_translation = None
+        plan = None
         if natural_language:
-            ai_command = self.process_natural_language(command)
-            if ai_command:
-                ai_translation = ai_command
-                command = ai_command
+            steps = self.plan_natural_language(command)
+            if steps:
+                ai_translation = ' && '.join(step["command"] for step in steps)
+                command = ai_translation
+                if len(steps) > 1:
+                    plan = steps
             else:
                 return {
                     "output": f"Could not understand natural language command: '{command}'",
@@ -342,19 +810,20 @@ class TerminalAPI:
         if ' && ' in command:
             result = self._execute_command_chain(command)
             result["ai_translation"] = ai_translation
+            if plan is not None:
+                result["plan"] = plan
             return result
         
         # Parse command
-        parts = command.strip().split()
+        parts = shellargs.tokenize(command)
         if not parts:
             return {"output": "", "exit_code": 0, "error": None, "ai_translation": ai_translation}
         
         cmd = parts[0].lower()
-        args = parts[1:]
         
         # Handle built-in commands
         if cmd in self._get_builtin_commands():
-            output, exit_code = self._execute_builtin(cmd, args)
+            output, exit_code = self._execute_builtin(cmd, self._expand_args(cmd, parts[1:]))
             return {"output": output, "exit_code": exit_code, "error": None, "ai_translation": ai_translation}
         
         # Execute external command
@@ -368,7 +837,12 @@ class TerminalAPI:
         exit_code = 0
         
         for i, cmd in enumerate(commands):
-            cmd_output, cmd_exit_code = self._execute_single_command(cmd)
+            # Later steps may depend on this one, so nothing goes to the background
+            self._request.in_chain = True
+            try:
+                cmd_output, cmd_exit_code = self._execute_single_command(cmd)
+            finally:
+                self._request.in_chain = False
             
             if cmd_output:
                 output_lines.append(f"Step {i+1}: {cmd_output}")
@@ -386,27 +860,33 @@ class TerminalAPI:
     
     def _execute_single_command(self, command: str) -> Tuple[str, int]:
         """Execute a single command."""
-        parts = command.strip().split()
+        parts = shellargs.tokenize(command)
         if not parts:
             return "", 0
         
         cmd = parts[0].lower()
-        args = parts[1:]
         
         # Handle built-in commands
         if cmd in self._get_builtin_commands():
-            return self._execute_builtin(cmd, args)
+            return self._execute_builtin(cmd, self._expand_args(cmd, parts[1:]))
         
         # Execute external command
         return self._execute_external(command)
     
+    def _expand_args(self, cmd: str, tokens: List[str]) -> List[str]:
+        """Expand wildcards in a builtin's arguments against the current directory."""
+        if cmd in shellargs.NO_GLOB_COMMANDS:
+            return [str(token) for token in tokens]
+        return shellargs.expand(tokens, self.current_path, self._list_directory)
+    
     def _get_builtin_commands(self) -> List[str]:
         """Get list of built-in commands."""
         return [
             'ls', 'pwd', 'cd', 'mkdir', 'rm', 'rmdir', 'touch', 'cat', 'cp', 'mv',
             'ps', 'free', 'df', 'du', 'uptime', 'whoami', 'date', 'find', 'grep',
             'which', 'whereis', 'echo', 'help', 'exit', 'quit', 'clear', 'history', 
-            'system_info', 'cpu', 'codemate', 'ask', 'translate'
+            'system_info', 'cpu', 'codemate', 'ask', 'translate', 'profile', 'jobs', 'trash',
+            'download', 'symbols'
         ]
     
     def _execute_builtin(self, cmd: str, args: List[str]) -> Tuple[str, int]:
@@ -472,44 +952,125 @@ class TerminalAPI:
                 return self._cmd_history(args)
             elif cmd == 'clear':
                 return self._cmd_clear(args)
+            elif cmd == 'profile':
+                return self._cmd_profile(args)
+            elif cmd == 'jobs':
+                return self._cmd_jobs(args)
+            elif cmd == 'trash':
+                return self._cmd_trash(args)
+            elif cmd == 'download':
+                return self._cmd_download(args)
+            elif cmd == 'symbols':
+                return self._cmd_symbols(args)
             else:
                 return f"Unknown command: {cmd}", 1
         except Exception as e:
             return f"Error executing {cmd}: {e}", 1
     
     def _execute_external(self, command: str) -> Tuple[str, int]:
-        """Execute external commands."""
+        """Execute external commands.
+        
+        stdout and stderr go through one pipe into the output store, so a
+        command that prints without end uses neither unbounded memory nor
+        unbounded disk: it is killed once the store's size limit is reached.
+        A watchdog thread kills it on timeout or cancellation; the command
+        runs in its own process group so its children go too.
+        """
         try:
-            result = subprocess.run(
-                command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=30,
-                cwd=self.current_path
-            )
-            return result.stdout + result.stderr, result.returncode
-        except subprocess.TimeoutExpired:
-            return "Command timed out", 1
+            process = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                       cwd=self.current_path, start_new_session=os.name == 'posix')
+        except Exception as e:
+            return f"Error executing command: {e}", 1
+        
+        request = self._request
+        request_id, disconnected = request.request_id, request.disconnected
+        stopped = []
+        def watchdog():
+            deadline = time.monotonic() + EXTERNAL_TIMEOUT
+            while True:
+                try:
+                    process.wait(timeout=CANCEL_POLL_INTERVAL)
+                    return
+                except subprocess.TimeoutExpired:
+                    pass
+                if time.monotonic() > deadline:
+                    stopped.append('timeout')
+                elif (request_id and self._cancel_requested(request_id)) or (disconnected and disconnected()):
+                    stopped.append('cancelled')
+                else:
+                    continue
+                _kill_process_group(process)
+                return
+        watcher = threading.Thread(target=watchdog, daemon=True)
+        watcher.start()
+        handle, out = self.outputs.open()
+        try:
+            complete = self.outputs.copy(out, process.stdout)
+            if not complete:
+                _kill_process_group(process)
+            process.wait()
         except Exception as e:
+            _kill_process_group(process)
+            out.close()
+            self.outputs.discard(handle)
             return f"Error executing command: {e}", 1
+        finally:
+            watcher.join()
+            process.stdout.close()
+        
+        if 'timeout' in stopped:
+            out.close()
+            self.outputs.discard(handle)
+            return "Command timed out", 1
+        exit_code = process.returncode
+        if 'cancelled' in stopped:
+            out.write(b"^C")
+            request.interrupted = True
+            exit_code = 130
+        head, stored = self.outputs.seal(handle, out, truncated=not complete)
+        if stored is None:
+            return head, exit_code
+        self._request.stored_output = stored
+        return self._truncation_note(head, stored), exit_code
     
     # Built-in command implementations
+    @read_only(ttl=1.0, version=lambda self: self.dir_cache.version())
     def _cmd_ls(self, args: List[str]) -> Tuple[str, int]:
-        """List directory contents."""
-        try:
-            path = args[0] if args else self.current_path
-            items = os.listdir(path)
-            output = []
-            for item in sorted(items):
-                item_path = os.path.join(path, item)
-                if os.path.isdir(item_path):
-                    output.append(f"📁 {item}/")
-                else:
-                    output.append(f"📄 {item}")
-            return "\n".join(output), 0
-        except Exception as e:
-            return f"ls: {e}", 1
+        """List directory contents: ls [path...]."""
+        paths = [arg for arg in args if not arg.startswith('-')] or [self.current_path]
+        sections, exit_code = [], 0
+        for path in paths:
+            try:
+                full_path = self._resolve_path(path)
+                if not os.path.isdir(full_path) and os.path.lexists(full_path):
+                    sections.append(f"📄 {path}")
+                    continue
+                output = []
+                for item, is_dir in self._list_directory(full_path):
+                    if is_dir:
+                        output.append(f"📁 {item}/")
+                    else:
+                        output.append(f"📄 {item}")
+                if len(paths) > 1:
+                    output.insert(0, f"{path}:")
+                sections.append("\n".join(output))
+            except Exception as e:
+                sections.append(f"ls: {e}")
+                exit_code = 1
+        return ("\n\n" if len(paths) > 1 else "\n").join(sections), exit_code
+    
+    def _list_directory(self, path: str) -> List[Tuple[str, bool]]:
+        """Return sorted (name, is_dir) pairs for path, cached until the directory changes."""
+        entries = self.dir_cache.get('listing', path)
+        if entries is not None:
+            return entries
+        
+        # Watch before scanning so changes made during the scan are noticed
+        token = self.dir_cache.prepare(path)
+        with os.scandir(path) as it:
+            entries = sorted((entry.name, entry.is_dir()) for entry in it)
+        self.dir_cache.put('listing', path, entries, token)
+        return entries
     
     def _cmd_pwd(self, args: List[str]) -> Tuple[str, int]:
         """Print working directory."""
@@ -532,18 +1093,21 @@ class TerminalAPI:
             return f"cd: {e}", 1
     
     def _cmd_mkdir(self, args: List[str]) -> Tuple[str, int]:
-        """Create directory."""
-        if not args:
+        """Create directories (parents included): mkdir [-p] DIR..."""
+        dir_names = [arg for arg in args if not arg.startswith('-')]
+        if not dir_names:
             return "mkdir: missing operand", 1
         
-        try:
-            # Create directory in current working directory
-            dir_name = args[0]
-            full_path = os.path.join(self.current_path, dir_name)
-            os.makedirs(full_path, exist_ok=True)
-            return f"Created directory: {dir_name} at {full_path}", 0
-        except Exception as e:
-            return f"mkdir: {e}", 1
+        results, exit_code = [], 0
+        for dir_name in dir_names:
+            try:
+                full_path = self._resolve_path(dir_name)
+                os.makedirs(full_path, exist_ok=True)
+                results.append(f"Created directory: {dir_name} at {full_path}")
+            except Exception as e:
+                results.append(f"mkdir: {e}")
+                exit_code = 1
+        return "\n".join(results), exit_code
     
     def _cmd_rm(self, args: List[str]) -> Tuple[str, int]:
         """Remove file or directory."""
@@ -573,11 +1137,9 @@ class TerminalAPI:
                 if not os.path.isabs(item):
                     full_path = os.path.join(self.current_path, item)
                 
-                if os.path.isdir(full_path):
+                if os.path.isdir(full_path) and not os.path.islink(full_path):
                     if recursive:
-                        import shutil
-                        shutil.rmtree(full_path)
-                        results.append(f"Removed directory: {item}")
+                        results.append(self._remove_tree(item, full_path))
                     else:
                         results.append(f"rm: cannot remove '{item}': Is a directory")
                 else:
@@ -592,76 +1154,189 @@ class TerminalAPI:
         
         return "\n".join(results), 0
     
+    def _remove_tree(self, item: str, full_path: str) -> str:
+        """Move a directory to the trash and delete it in the background."""
+        entry_id = self.trash.delete(full_path)
+        if entry_id is None:
+            # Could not be moved (e.g. a mount point): delete it in place
+            trash.remove_tree(full_path)
+            return f"Removed directory: {item}"
+        
+        if self.trash.retention:
+            return f"Removed directory: {item} (restore with 'trash restore {entry_id}')"
+        return f"Removed directory: {item}"
+    
     def _cmd_touch(self, args: List[str]) -> Tuple[str, int]:
-        """Create empty file."""
-        if not args:
+        """Create empty files or update their timestamps: touch FILE..."""
+        file_names = [arg for arg in args if not arg.startswith('-')]
+        if not file_names:
             return "touch: missing operand", 1
         
-        try:
-            # Create file in current working directory
-            file_name = args[0]
-            full_path = os.path.join(self.current_path, file_name)
-            with open(full_path, 'a'):
-                pass
-            return f"Created file: {file_name} at {full_path}", 0
-        except Exception as e:
-            return f"touch: {e}", 1
+        results, exit_code = [], 0
+        for file_name in file_names:
+            try:
+                full_path = self._resolve_path(file_name)
+                with open(full_path, 'a'):
+                    pass
+                os.utime(full_path)
+                results.append(f"Created file: {file_name} at {full_path}")
+            except Exception as e:
+                results.append(f"touch: {e}")
+                exit_code = 1
+        return "\n".join(results), exit_code
     
     def _cmd_cat(self, args: List[str]) -> Tuple[str, int]:
-        """Display file contents."""
+        """Display (concatenate) file contents: cat FILE..."""
         if not args:
             return "cat: missing operand", 1
         
+        paths = [self._resolve_path(file_path) for file_path in args]
+        if sum(os.path.getsize(path) for path in paths if os.path.isfile(path)) > self.outputs.inline_bytes:
+            return self._cat_to_store(paths)
+        
+        contents, exit_code = [], 0
+        for file_path in args:
+            try:
+                with open(self._resolve_path(file_path), 'r') as f:
+                    contents.append(f.read())
+            except Exception as e:
+                contents.append(f"cat: {e}\n" if len(args) > 1 else f"cat: {e}")
+                exit_code = 1
+        return "".join(contents), exit_code
+    
+    def _cat_to_store(self, paths: List[str]) -> Tuple[str, int]:
+        """cat for large files: copy them into the output store instead of memory."""
+        handle, out = self.outputs.open()
+        exit_code, complete = 0, True
+        for path in paths:
+            try:
+                with open(path, 'rb') as f:
+                    complete = self.outputs.copy(out, f)
+            except OSError as e:
+                out.write(f"cat: {e}\n".encode('utf-8', 'replace'))
+                exit_code = 1
+            if not complete:
+                break
+        head, stored = self.outputs.seal(handle, out, truncated=not complete)
+        if stored is None:
+            return head, exit_code
+        self._request.stored_output = stored
+        return self._truncation_note(head, stored), exit_code
+    
+    def _resolve_path(self, path: str) -> str:
+        """Resolve a path argument relative to the current directory."""
+        return os.path.normpath(path if os.path.isabs(path) else os.path.join(self.current_path, path))
+    
+    def resolve_request_path(self, path: str) -> str:
+        """Resolve a path sent with an API request against the session's current directory."""
+        if self.state_store is not None:
+            self._load_shared_state()
+        return self._resolve_path(path or '.')
+    
+    def start_upload(self, data: Dict[str, any]) -> Dict[str, any]:
+        """Begin (or resume) an upload of data["name"] into data["path"] or the current directory."""
+        name = os.path.basename(str(data.get('name', '')))
+        target = self.resolve_request_path(str(data.get('path') or name))
+        if os.path.isdir(target):
+            if not name:
+                raise transfer.UploadError("name is required when uploading into a directory")
+            target = os.path.join(target, name)
         try:
-            # Handle relative paths from current directory
-            file_path = args[0]
-            if not os.path.isabs(file_path):
-                file_path = os.path.join(self.current_path, file_path)
-            
-            with open(file_path, 'r') as f:
-                return f.read(), 0
-        except Exception as e:
-            return f"cat: {e}", 1
+            size = int(data['size'])
+        except (KeyError, TypeError, ValueError):
+            raise transfer.UploadError("size is required")
+        return self.uploads.start(target, size, data.get('chunk_size'))
+    
+    def _run_file_job(self, command: str, plan: 'fileops.CopyPlan', work) -> Tuple[str, int]:
+        """Run work(job) -> (output, exit_code) now, or as a background job if the plan is large."""
+        if not plan.is_large or self._request.in_chain:
+            return work(None)
+        
+        def setup(job):
+            job.bytes_total = plan.total_bytes
+            job.items_total = plan.total_files
+        
+        sources = ", ".join(os.path.basename(source) for source, _ in plan.copied[:3])
+        job = self.jobs.start(command, f"{command} {sources}{'...' if len(plan.copied) > 3 else ''}", work, setup)
+        self._request.job = job.id
+        output = (f"{command}: {plan.total_files} files ({plan.total_bytes / (1024 * 1024):.1f} MB) "
+                  f"continuing in the background as job {job.id}\n"
+                  f"Run 'jobs {job.id}' to follow progress")
+        return "\n".join(plan.errors + [output]), 0
     
     def _cmd_cp(self, args: List[str]) -> Tuple[str, int]:
-        """Copy file or directory."""
-        if len(args) < 2:
+        """Copy files or directories: cp [-r] SOURCE... DEST."""
+        recursive = any(arg in ('-r', '-R', '-a', '--recursive') for arg in args)
+        paths = [arg for arg in args if not arg.startswith('-')]
+        if len(paths) < 2:
             return "cp: missing operand", 1
         
         try:
-            import shutil
-            # Handle relative paths from current directory
-            source = args[0]
-            dest = args[1]
+            names = {self._resolve_path(path): path for path in paths[:-1]}
+            plan = fileops.plan_copy(list(names), self._resolve_path(paths[-1]), recursive,
+                                     dest_must_be_dir=paths[-1].endswith(('/', os.sep)))
+            if not plan.copied:
+                return "\n".join(plan.errors), 1
             
-            if not os.path.isabs(source):
-                source = os.path.join(self.current_path, source)
-            if not os.path.isabs(dest):
-                dest = os.path.join(self.current_path, dest)
+            def work(job):
+                errors = fileops.execute_copy(plan, job)
+                lines = plan.errors + errors
+                if not errors:
+                    lines += [f"Copied {names[source]} to {paths[-1]}" for source, _ in plan.copied]
+                return "\n".join(lines), 1 if plan.errors or errors else 0
             
-            shutil.copy2(source, dest)
-            return f"Copied {args[0]} to {args[1]}", 0
+            return self._run_file_job('cp', plan, work)
         except Exception as e:
             return f"cp: {e}", 1
     
     def _cmd_mv(self, args: List[str]) -> Tuple[str, int]:
-        """Move/rename file or directory."""
-        if len(args) < 2:
+        """Move/rename files or directories: mv SOURCE... DEST."""
+        paths = [arg for arg in args if not arg.startswith('-')]
+        if len(paths) < 2:
             return "mv: missing operand", 1
         
         try:
-            import shutil
-            # Handle relative paths from current directory
-            source = args[0]
-            dest = args[1]
+            dest = self._resolve_path(paths[-1])
+            dest_is_dir = os.path.isdir(dest)
+            if len(paths) > 2 and not dest_is_dir:
+                return f"mv: target '{paths[-1]}' is not a directory", 1
+            
+            # Same-filesystem moves are a rename; only cross-device ones copy data
+            lines, errors, cross_device = [], [], {}
+            for path in paths[:-1]:
+                source = self._resolve_path(path)
+                if not os.path.lexists(source):
+                    errors.append(f"mv: cannot stat '{path}': No such file or directory")
+                    continue
+                try:
+                    target = fileops.resolve_target(source, dest, dest_is_dir, paths[-1].endswith(('/', os.sep)))
+                except OSError as e:
+                    errors.append(f"mv: cannot move '{path}' to '{paths[-1]}': {e.strerror}")
+                    continue
+                try:
+                    if fileops.try_rename(source, target):
+                        lines.append(f"Moved {path} to {paths[-1]}")
+                    else:
+                        cross_device[source] = path
+                except OSError as e:
+                    errors.append(f"mv: cannot move '{path}': {e.strerror}")
             
-            if not os.path.isabs(source):
-                source = os.path.join(self.current_path, source)
-            if not os.path.isabs(dest):
-                dest = os.path.join(self.current_path, dest)
+            if not cross_device:
+                return "\n".join(errors + lines), 1 if errors else 0
             
-            shutil.move(source, dest)
-            return f"Moved {args[0]} to {args[1]}", 0
+            plan = fileops.plan_copy(list(cross_device), dest, recursive=True, command='mv')
+            
+            def work(job):
+                copy_errors = fileops.execute_copy(plan, job, command='mv')
+                moved = []
+                if not copy_errors:
+                    for source, _ in plan.copied:
+                        fileops.remove_path(source)
+                        moved.append(f"Moved {cross_device[source]} to {paths[-1]}")
+                failed = errors + plan.errors + copy_errors
+                return "\n".join(failed + lines + moved), 1 if failed else 0
+            
+            return self._run_file_job('mv', plan, work)
         except Exception as e:
             return f"mv: {e}", 1
     
@@ -679,6 +1354,7 @@ class TerminalAPI:
         except Exception as e:
             return f"ps: {e}", 1
     
+    @read_only(ttl=2.0)
     def _cmd_free(self, args: List[str]) -> Tuple[str, int]:
         """Show memory usage."""
         try:
@@ -691,6 +1367,7 @@ Free: {memory.free // (1024**3)} GB""", 0
         except Exception as e:
             return f"free: {e}", 1
     
+    @read_only(ttl=5.0)
     def _cmd_df(self, args: List[str]) -> Tuple[str, int]:
         """Show disk usage."""
         try:
@@ -703,6 +1380,7 @@ Usage: {(disk.used / disk.total) * 100:.1f}%""", 0
         except Exception as e:
             return f"df: {e}", 1
     
+    @read_only(ttl=30.0)
     def _cmd_uptime(self, args: List[str]) -> Tuple[str, int]:
         """Show system uptime."""
         try:
@@ -715,14 +1393,17 @@ Usage: {(disk.used / disk.total) * 100:.1f}%""", 0
         except Exception as e:
             return f"uptime: {e}", 1
     
+    @read_only(ttl=300.0)
     def _cmd_whoami(self, args: List[str]) -> Tuple[str, int]:
         """Show current user."""
         return os.getenv('USER', 'unknown'), 0
     
+    @read_only(ttl=0.5)
     def _cmd_date(self, args: List[str]) -> Tuple[str, int]:
         """Show current date/time."""
         return datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 0
     
+    @read_only(ttl=60.0)
     def _cmd_system_info(self, args: List[str]) -> Tuple[str, int]:
         """Show system information."""
         try:
@@ -738,9 +1419,10 @@ Memory: {psutil.virtual_memory().total // (1024**3)} GB"""
         except Exception as e:
             return f"system_info: {e}", 1
     
+    @read_only(ttl=2.0)
     def _cmd_cpu(self, args: List[str]) -> Tuple[str, int]:
         """Show CPU usage."""
-        if not PSUTIL_AVAILABLE:
+        if not psutil.available():
             return "CPU info not available (psutil not installed)", 1
         
         try:
@@ -759,57 +1441,67 @@ Max Frequency: {cpu_freq.max:.0f} MHz"""
             return f"cpu: {e}", 1
     
     def _cmd_du(self, args: List[str]) -> Tuple[str, int]:
-        """Show directory size."""
-        path = args[0] if args else self.current_path
+        """Show directory size: du [path...]."""
+        paths = [arg for arg in args if not arg.startswith('-')] or [self.current_path]
         
         try:
-            if not PSUTIL_AVAILABLE:
+            if not psutil.available():
                 return "Directory size info not available (psutil not installed)", 1
             
-            # Get directory size
-            total_size = 0
-            for dirpath, dirnames, filenames in os.walk(path):
-                for filename in filenames:
-                    filepath = os.path.join(dirpath, filename)
-                    try:
-                        total_size += os.path.getsize(filepath)
-                    except (OSError, IOError):
-                        pass
-            
-            size_mb = total_size / (1024 * 1024)
-            return f"Directory size: {size_mb:.2f} MB", 0
+            lines = []
+            for path in paths:
+                total_size = self._directory_size(self._resolve_path(path))
+                size_mb = total_size / (1024 * 1024)
+                lines.append(f"Directory size: {size_mb:.2f} MB" + (f"  {path}" if len(paths) > 1 else ""))
+            return "\n".join(lines), 0
         except Exception as e:
             return f"du: {e}", 1
     
+    def _directory_size(self, path: str) -> int:
+        """Total file size under path, one top-level subtree per pool worker, cached."""
+        total_size = self.dir_cache.get('size', path)
+        if total_size is None:
+            token = self.dir_cache.prepare(path, recursive=True)
+            total_size = sum(offload.run_chunks(offload.size_chunk, offload.split_tree(path)))
+            self.dir_cache.put('size', path, total_size, token, recursive=True)
+        return total_size
+    
     def _cmd_rmdir(self, args: List[str]) -> Tuple[str, int]:
-        """Remove empty directory."""
+        """Remove empty directories: rmdir DIR..."""
         if not args:
             return "rmdir: missing operand", 1
         
-        try:
-            os.rmdir(args[0])
-            return f"Removed directory: {args[0]}", 0
-        except OSError as e:
-            return f"rmdir: {e}", 1
-        except Exception as e:
-            return f"rmdir: {e}", 1
+        results, exit_code = [], 0
+        for dir_name in args:
+            try:
+                os.rmdir(self._resolve_path(dir_name))
+                results.append(f"Removed directory: {dir_name}")
+            except OSError as e:
+                results.append(f"rmdir: {e}")
+                exit_code = 1
+        return "\n".join(results), exit_code
     
     def _cmd_find(self, args: List[str]) -> Tuple[str, int]:
-        """Find files."""
+        """Find files: find TEXT (names containing TEXT) or find [PATH] -name GLOB."""
         if not args:
             return "find: missing search pattern", 1
         
         try:
-            pattern = args[0]
-            results = []
-            
-            for root, dirs, files in os.walk(self.current_path):
-                for file in files:
-                    if pattern in file:
-                        results.append(os.path.join(root, file))
+            if '-name' in args:
+                index = args.index('-name')
+                if index + 1 >= len(args):
+                    return "find: missing argument to `-name'", 1
+                pattern, glob = args[index + 1], True
+                root = self._resolve_path(args[0]) if index > 0 else self.current_path
+                if not os.path.isdir(root):
+                    return f"find: '{args[0]}': No such file or directory", 1
+            else:
+                pattern, glob, root = args[0], False, self.current_path
+            partials = offload.run_chunks(offload.find_chunk, offload.split_tree(root), pattern, 20, glob)
+            results = offload.merge_limited(partials, 20)
             
             if results:
-                return "\n".join(results[:20]), 0  # Limit to 20 results
+                return "\n".join(results), 0  # Limit to 20 results
             else:
                 return f"No files found matching '{pattern}'", 0
         except Exception as e:
@@ -824,26 +1516,19 @@ Max Frequency: {cpu_freq.max:.0f} MHz"""
             pattern = args[0]
             file_pattern = args[1] if len(args) > 1 else "*"
             
-            results = []
-            for root, dirs, files in os.walk(self.current_path):
-                for file in files:
-                    if file_pattern == "*" or file.endswith(file_pattern.replace("*", "")):
-                        filepath = os.path.join(root, file)
-                        try:
-                            with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-                                for line_num, line in enumerate(f, 1):
-                                    if pattern in line:
-                                        results.append(f"{filepath}:{line_num}: {line.strip()}")
-                        except (OSError, IOError, UnicodeDecodeError):
-                            continue
+            suffix = "" if file_pattern == "*" else file_pattern.replace("*", "")
+            
+            partials = offload.run_chunks(offload.grep_chunk, offload.split_tree(self.current_path), pattern, suffix, 20)
+            results = offload.merge_limited(partials, 20)
             
             if results:
-                return "\n".join(results[:20]), 0  # Limit to 20 results
+                return "\n".join(results), 0  # Limit to 20 results
             else:
                 return f"No matches found for '{pattern}'", 0
         except Exception as e:
             return f"grep: {e}", 1
     
+    @read_only(ttl=60.0, version=lambda self: os.environ.get('PATH', ''))
     def _cmd_which(self, args: List[str]) -> Tuple[str, int]:
         """Find command location."""
         if not args:
@@ -882,13 +1567,10 @@ Max Frequency: {cpu_freq.max:.0f} MHz"""
             
             # Find man pages
             man_dirs = ['/usr/share/man', '/usr/local/man', '/opt/homebrew/share/man']
-            for man_dir in man_dirs:
-                if os.path.exists(man_dir):
-                    for root, dirs, files in os.walk(man_dir):
-                        for file in files:
-                            if file.startswith(command + '.'):
-                                results.append(f"man: {os.path.join(root, file)}")
-                                break
+            chunks = [chunk for man_dir in man_dirs if os.path.exists(man_dir)
+                      for chunk in offload.split_tree(man_dir)]
+            for partial in offload.run_chunks(offload.man_pages_chunk, chunks, command):
+                results.extend(f"man: {page}" for page in partial)
             
             if results:
                 return "\n".join(results), 0
@@ -907,11 +1589,11 @@ Max Frequency: {cpu_freq.max:.0f} MHz"""
         if not args:
             help_text = """CodeMate Integration Commands:
 
-codemate debug <file>     - Debug code using CodeMate AI
-codemate review <file>    - Review code with CodeMate
-codemate optimize <file>  - Optimize code with CodeMate
-codemate test <file>      - Generate test cases with CodeMate
-codemate docs <file>      - Generate documentation with CodeMate
+codemate debug <path>     - Find likely bugs in a Python file or directory
+codemate review <path>    - Review complexity, unused imports and variables
+codemate optimize <path>  - Find performance smells (nested loops, ...)
+codemate test <file>      - Generate pytest stubs (--run: run existing tests)
+codemate docs <file>      - Outline classes, functions and signatures
 codemate chat <question>  - Chat with CodeMate AI
 codemate status          - Check CodeMate integration status"""
             return help_text, 0
@@ -929,24 +1611,21 @@ codemate status          - Check CodeMate integration status"""
 Ready for CodeMate.ai hackathon!"""
             return status_text, 0
         
-        elif subcmd in ['debug', 'review', 'optimize', 'test', 'docs']:
+        elif subcmd in analyzer.CATEGORIES:
             if len(args) < 2:
-                return f"Usage: codemate {subcmd} <file>", 1
-            
-            filename = args[1]
-            if not os.path.exists(filename):
-                return f"File not found: {filename}", 1
-            
-            result_text = f"""CodeMate {subcmd.title()} Analysis for: {filename}
-
-This would integrate with CodeMate.ai API to:
-• Analyze the code file
-• Provide {subcmd} suggestions
-• Generate professional recommendations
-• Integrate with CodeMate's AI engine
-
-[Note: This is a demo integration for the hackathon]"""
-            return result_text, 0
+                return f"Usage: codemate {subcmd} <file|directory>", 1
+            return self._codemate_analyze(subcmd, args[1])
+        
+        elif subcmd == 'docs':
+            if len(args) < 2:
+                return "Usage: codemate docs <file>", 1
+            return self._codemate_docs(args[1])
+        
+        elif subcmd == 'test':
+            files = [arg for arg in args[1:] if arg != '--run']
+            if len(files) != 1:
+                return "Usage: codemate test <file> [--run]", 1
+            return self._codemate_test(files[0], '--run' in args)
         
         elif subcmd == 'chat':
             if len(args) < 2:
@@ -969,43 +1648,119 @@ This would integrate with CodeMate.ai chat API to provide:
         else:
             return f"Unknown CodeMate command: {subcmd}", 1
     
+    def _codemate_analyze(self, subcmd: str, target: str) -> Tuple[str, int]:
+        """Run the local analyzer over a Python file or every Python file under a directory."""
+        path = self._resolve_path(target)
+        if os.path.isdir(path):
+            files = analyzer.python_files(path)
+            if not files:
+                return f"No Python files found in {target}", 0
+        elif os.path.isfile(path):
+            if not path.endswith('.py'):
+                return f"codemate {subcmd}: only Python files can be analysed locally", 1
+            files = [path]
+        else:
+            return f"File not found: {target}", 1
+        
+        start_time = time.perf_counter()
+        results, cached = self.analysis_cache.analyze(files, offload.run_chunks)
+        elapsed = time.perf_counter() - start_time
+        # A file that does not parse was not analysed, whatever the category
+        exit_code = 1 if analyzer.parse_failures(results) else 0
+        return analyzer.format_report(subcmd, results, path, cached, elapsed), exit_code
+    
+    def _codemate_docs(self, target: str) -> Tuple[str, int]:
+        """Outline a Python module from its (cached) syntax tree."""
+        path = self._resolve_path(target)
+        if not os.path.isfile(path):
+            return f"File not found: {target}", 1
+        if not path.endswith('.py'):
+            return "codemate docs: only Python files can be outlined", 1
+        
+        try:
+            _, tree = self.analysis_cache.parse(path)
+        except SyntaxError as e:
+            return symbols.format_outline(path, {"error": str(e)}), 1
+        return symbols.format_outline(path, symbols.symbols_from_tree(tree)), 0
+    
+    def _codemate_test(self, target: str, run: bool) -> Tuple[str, int]:
+        """Print pytest skeletons for a module's untested public API, or run its existing tests."""
+        path = self._resolve_path(target)
+        if not os.path.isfile(path):
+            return f"File not found: {target}", 1
+        if not path.endswith('.py'):
+            return "codemate test: only Python files are supported", 1
+        
+        test_file = testgen.find_test_file(path)
+        existing = None
+        try:
+            if test_file is not None:
+                _, existing = self.analysis_cache.parse(test_file)
+            if run:
+                if existing is None:
+                    return f"codemate test: no test file found for {target} (looked for test_*.py and *_test.py)", 1
+                ids = testgen.collect_tests(existing)
+                if not ids:
+                    return f"codemate test: {test_file} defines no tests", 0
+                start_time = time.perf_counter()
+                results, processes = testgen.run_tests(test_file, ids, max(1, offload.default_pool_size()),
+                                                        testgen.import_root(path))
+                return testgen.format_run(test_file, ids, results, processes, time.perf_counter() - start_time)
+            _, tree = self.analysis_cache.parse(path)
+        except SyntaxError as e:
+            return f"codemate test: cannot parse {e.filename}: {e.msg} (line {e.lineno})", 1
+        
+        source, count = testgen.generate_tests(path, tree, existing)
+        if not count:
+            covered = f" (all covered by {test_file})" if test_file else ""
+            return f"codemate test: nothing to generate for {target}{covered}", 0
+        note = f"# {count} test stubs for {os.path.basename(path)}"
+        if test_file:
+            note += f"; tests already in {test_file} are left out"
+        return f"{note}\n{source}", 0
+    
+    def _cmd_symbols(self, args: List[str]) -> Tuple[str, int]:
+        """Look up definitions in the project's symbol index."""
+        root = symbols.find_project_root(self.current_path)
+        if root is None:
+            return "symbols: cd into a project directory first", 1
+        state_dir = self.state_store.state_dir if self.state_store else get_state_dir()
+        index = symbols.get_index(root, state_dir, self.dir_cache.watcher, offload.run_chunks)
+        
+        if not args:
+            index.refresh()
+            info = index.stats()
+            mode = "inotify" if info["watching"] else "periodic rescans"
+            return (f"Symbol index of {info['root']}: {info['symbols']} symbols "
+                    f"in {info['files']} files (kept current by {mode})\nUsage: symbols <name>"), 0
+        
+        start_time = time.perf_counter()
+        matches = index.lookup(args[0])
+        elapsed = (time.perf_counter() - start_time) * 1000
+        if not matches:
+            return f"symbols: no definition of '{args[0]}' under {root}", 1
+        
+        lines = [symbols.format_symbol(rel, symbol) for rel, symbol in matches]
+        lines.append(f"\n{len(matches)} match{'es' if len(matches) != 1 else ''} in {elapsed:.1f} ms")
+        return "\n".join(lines), 0
+    
     def _cmd_ask(self, args: List[str]) -> Tuple[str, int]:
         """Ask AI questions."""
         if not args:
             return "ask: missing question", 1
         
         question = ' '.join(args)
-        question_lower = question.lower()
-        
-        # Enhanced AI responses
-        responses = {
-            'how to create a folder': 'Use: mkdir <folder_name>',
-            'how to create a file': 'Use: touch <file_name>',
-            'how to debug code': 'Use: codemate debug <file> for AI-powered debugging',
-            'how to review code': 'Use: codemate review <file> for professional code review',
-            'how to optimize code': 'Use: codemate optimize <file> for performance optimization',
-            'how to generate tests': 'Use: codemate test <file> for AI-generated test cases',
-            'what commands are available': 'Type "help" to see all available commands',
-            'what is codemate': 'CodeMate is an AI-powered coding assistant. Use "codemate" commands for integration',
-            'how to use codemate': 'Use "codemate" command to access CodeMate.ai features',
-            'how to find files': 'Use: find <pattern> or "find files called <name>"',
-            'how to search text': 'Use: grep <pattern> <file> or "search for <text> in <files>"',
-            'how to check system': 'Use: system_info, ps, free, df, or cpu commands',
-            'how to navigate': 'Use: cd <directory> or "go to <directory>"',
-            'how to copy files': 'Use: cp <source> <destination> or "copy <file> to <location>"',
-            'how to move files': 'Use: mv <source> <destination> or "move <file> to <location>"'
-        }
-        
-        response = None
-        for key, answer in responses.items():
-            if key in question_lower:
-                response = answer
-                break
-        
-        if not response:
+        matches = self.qa_index.search(question)
+        if not matches:
             response = f"I don't understand the question: '{question}'. Try asking about commands, files, or CodeMate features."
+            return f"CodeMate AI: {response}", 0
         
-        return f"CodeMate AI: {response}", 0
+        (best_score, best), others = matches[0], matches[1:]
+        lines = [f"CodeMate AI: {best['answer']}  (score {best_score:.2f})"]
+        if others:
+            lines.append("Related:")
+            lines.extend(f"  {entry['answer']}  (score {score:.2f})" for score, entry in others)
+        return "\n".join(lines), 0
     
     def _cmd_translate(self, args: List[str]) -> Tuple[str, int]:
         """Convert natural language to commands."""
@@ -1013,31 +1768,38 @@ This would integrate with CodeMate.ai chat API to provide:
             return "translate: missing text", 1
         
         text = ' '.join(args)
-        translated = self.process_natural_language(text)
+        steps = self.plan_natural_language(text)
         
-        if translated:
-            return f"AI Translation: {translated}", 0
-        else:
+        if not steps:
             return f"Could not translate: '{text}'", 1
+        
+        translated = ' && '.join(step["command"] for step in steps)
+        if len(steps) == 1:
+            return f"AI Translation: {translated}", 0
+        plan = [f"  {i}. {step['text']}  ->  {step['command']}" for i, step in enumerate(steps, 1)]
+        return "\n".join([f"AI Translation: {translated}", "Plan:"] + plan), 0
     
+    @read_only(ttl=None)
     def _cmd_help(self, args: List[str]) -> Tuple[str, int]:
         """Show help information."""
         help_text = """CodeMate Terminal Commands:
 
 File Operations:
-  ls [path]              List directory contents
+  ls [path...]           List directory contents
   pwd                    Print working directory
   cd [path]              Change directory
-  mkdir <dir>            Create directory
-  rm <file/dir>          Remove file or directory
-  rmdir <dir>            Remove empty directory
-  touch <file>           Create empty file
-  cat <file>             Display file contents
-  cp <src> <dest>        Copy file or directory
-  mv <src> <dest>        Move/rename file or directory
+  mkdir <dir>...         Create directories
+  rm [-r] <file/dir>...  Remove files or directories (trees are deleted in the background)
+  rmdir <dir>...         Remove empty directories
+  touch <file>...        Create empty files
+  cat <file>...          Display file contents
+  cp [-r] <src>... <dest> Copy files or directory trees
+  mv <src>... <dest>     Move/rename files or directories
+  (paths may be quoted and use *, ? and [...] wildcards)
 
 Search & Navigation:
   find <pattern>         Find files by name
+  find [dir] -name <glob> Find files whose name matches a wildcard
   grep <pattern> [file]  Search for text in files
   which <command>        Find command location
   whereis <command>      Find command and documentation
@@ -1046,7 +1808,7 @@ System Information:
   ps                     Show running processes
   free                   Show memory usage
   df                     Show disk usage
-  du [path]              Show directory size
+  du [path...]           Show directory size
   uptime                 Show system uptime
   whoami                 Show current user
   date                   Show current date/time
@@ -1054,11 +1816,12 @@ System Information:
   cpu                    Show CPU usage
 
 CodeMate Integration:
-  codemate debug <file>     Debug code with CodeMate AI
-  codemate review <file>    Review code with CodeMate
-  codemate optimize <file>  Optimize code with CodeMate
-  codemate test <file>      Generate test cases with CodeMate
-  codemate docs <file>      Generate documentation with CodeMate
+  codemate debug <path>     Find likely bugs (local analysis of a file or directory)
+  codemate review <path>    Review complexity and unused code
+  codemate optimize <path>  Find performance smells
+  codemate test <file> [--run]
+                            Generate pytest stubs, or run the file's tests with timings
+  codemate docs <file>      Outline classes, functions and signatures
   codemate chat <question>  Chat with CodeMate AI
   codemate status          Check CodeMate integration status
 
@@ -1076,35 +1839,216 @@ AI Features:
 Utilities:
   echo <text>            Print text
   help                   Show this help message
-  history                Show command history
+  history [n]            Show command history
+  history grep <text>    Search command history (newest first)
   clear                  Clear screen
+  profile [on|off|cpu|memory|last]
+                         Profile commands (requires CODEMATE_PROFILING=1)
+  download <path> [--format tar.gz|tar|zip]
+                         Download a file, or a directory as an archive
+  jobs [id|cancel <id>]  Show progress of background cp/mv/rm jobs
+  trash [restore <id>|empty]
+                         List, restore or purge trees removed by rm -r
+  symbols <name>         Find where a function, class or Class.method is defined
   exit/quit              Exit terminal"""
         return help_text, 0
     
     def _cmd_history(self, args: List[str]) -> Tuple[str, int]:
-        """Show command history."""
+        """Show or search command history."""
+        if args and args[0] == 'grep':
+            if len(args) < 2:
+                return "Usage: history grep <text>", 1
+            
+            text = ' '.join(args[1:])
+            matches = self.command_history.search(text)
+            if not matches:
+                return f"No history entries matching '{text}'", 0
+            
+            output = []
+            for entry in matches:
+                output.append(f"{entry['timestamp'][:19]}  [{entry['exit_code']}] {entry['duration_ms']:8.1f}ms  {entry['command']}")
+            return "\n".join(output), 0
+        
+        limit = 20
+        if args:
+            try:
+                limit = int(args[0])
+            except ValueError:
+                return "Usage: history [count] | history grep <text>", 1
+        
         if not self.command_history:
             return "No commands in history", 0
         
         output = []
-        for i, cmd in enumerate(self.command_history[-20:], 1):
-            output.append(f"{i:4d}  {cmd}")
+        for i, entry in enumerate(self.command_history.recent(limit), 1):
+            output.append(f"{i:4d}  {entry['command']}")
         
         return "\n".join(output), 0
     
     def _cmd_clear(self, args: List[str]) -> Tuple[str, int]:
         """Clear screen."""
         return "CLEAR_SCREEN", 0
+    
+    def _cmd_download(self, args: List[str]) -> Tuple[str, int]:
+        """Download a file, or a directory as an archive: download PATH [--format tar.gz|tar|zip]."""
+        archive_format = None
+        paths = []
+        remaining = list(args)
+        while remaining:
+            arg = remaining.pop(0)
+            if arg == '--format' and remaining:
+                archive_format = remaining.pop(0)
+            elif arg.startswith('--format='):
+                archive_format = arg.split('=', 1)[1]
+            elif not arg.startswith('-'):
+                paths.append(arg)
+        if len(paths) != 1:
+            return "Usage: download <path> [--format tar.gz|tar|zip]", 1
+        if archive_format is not None and archive_format not in transfer.ARCHIVE_FORMATS:
+            return f"download: unsupported format '{archive_format}' (use {', '.join(transfer.ARCHIVE_FORMATS)})", 1
+        
+        full_path = self._resolve_path(paths[0])
+        if not os.path.exists(full_path):
+            return f"download: cannot access '{paths[0]}': No such file or directory", 1
+        
+        url = f"/api/download?path={quote(full_path)}"
+        if os.path.isdir(full_path):
+            archive_format = archive_format or 'tar.gz'
+            url += f"&format={archive_format}"
+            description = f"{paths[0]} as {archive_format}"
+        else:
+            description = f"{paths[0]} ({os.path.getsize(full_path) / (1024 * 1024):.1f} MB)"
+        self._request.download = url
+        return f"Downloading {description}", 0
+    
+    def _cmd_jobs(self, args: List[str]) -> Tuple[str, int]:
+        """List background jobs, show one (jobs ID) or cancel one (jobs cancel ID)."""
+        if len(args) >= 2 and args[0] == 'cancel':
+            if self.jobs.cancel(args[1]):
+                return f"Cancelling job {args[1]}", 0
+            return f"jobs: no running job {args[1]}", 1
+        
+        if args:
+            job = self.jobs.get(args[0])
+            if job is None:
+                return f"jobs: {args[0]}: no such job", 1
+            output = format_job(job)
+            if job["status"] != 'running' and job["output"]:
+                output += "\n" + job["output"]
+            return output, 0
+        
+        jobs = self.jobs.list()
+        if not jobs:
+            return "No background jobs", 0
+        return "\n".join(format_job(job) for job in jobs), 0
+    
+    def _cmd_trash(self, args: List[str]) -> Tuple[str, int]:
+        """List trashed trees, restore one (trash restore ID) or delete them now (trash empty)."""
+        if len(args) >= 2 and args[0] in ('restore', 'undo'):
+            try:
+                return f"Restored {self.trash.restore(args[1])}", 0
+            except KeyError:
+                return f"trash: {args[1]}: no such entry", 1
+            except OSError as e:
+                return f"trash: cannot restore {args[1]}: {e.strerror or e}", 1
+        
+        if args and args[0] == 'empty':
+            job_ids = self.trash.purge_expired(force=True)
+            if not job_ids:
+                return "Trash is empty", 0
+            return f"Deleting {len(job_ids)} trashed trees: jobs {', '.join(job_ids)}", 0
+        
+        entries = self.trash.entries()
+        if not entries:
+            if self.trash.retention:
+                return "Trash is empty", 0
+            return "Trash is empty (set CODEMATE_TRASH_RETENTION to keep deleted trees for undo)", 0
+        now = time.time()
+        lines = []
+        for entry in entries:
+            remaining = max(0, int(entry["expires_at"] - now))
+            lines.append(f"[{entry['id']}] {entry['original_path']}  (deleted {int(now - entry['deleted_at'])}s ago, "
+                         f"purged in {remaining}s)")
+        return "\n".join(lines), 0
+    
+    def _cmd_profile(self, args: List[str]) -> Tuple[str, int]:
+        """Toggle per-session profiling or show the last profile."""
+        if not PROFILING_ENABLED:
+            return "profile: profiling is disabled on this server (set CODEMATE_PROFILING=1)", 1
+        
+        subcmd = args[0].lower() if args else 'status'
+        
+        if subcmd == 'status':
+            if self.profile_modes:
+                return f"Profiling enabled for this session: {', '.join(sorted(self.profile_modes))}", 0
+            return "Profiling disabled for this session", 0
+        elif subcmd == 'off':
+            self.profile_modes = set()
+            return "Profiling disabled for this session", 0
+        elif subcmd == 'last':
+            if not self.last_profile:
+                return "No profile recorded yet", 0
+            return format_profile_report(self.last_profile), 0
+        
+        modes = parse_profile_modes(','.join(args))
+        if not modes:
+            return "Usage: profile [on|off|cpu|memory|status|last]", 1
+        
+        self.profile_modes = modes
+        return f"Profiling enabled for this session: {', '.join(sorted(modes))}", 0
+
+
+def send_json_with_etag(request_handler: BaseHTTPRequestHandler, body: bytes, etag: str):
+    """Send a JSON body with an ETag, or 304 Not Modified if the client has it."""
+    if etag in request_handler.headers.get('If-None-Match', ''):
+        request_handler.send_response(304)
+        request_handler.send_header('ETag', etag)
+        request_handler.send_header('Access-Control-Allow-Origin', '*')
+        request_handler.end_headers()
+        return
+    
+    request_handler.send_response(200)
+    request_handler.send_header('Content-type', 'application/json')
+    request_handler.send_header('Content-Length', str(len(body)))
+    request_handler.send_header('ETag', etag)
+    # Always revalidate; the ETag makes that a cheap 304
+    request_handler.send_header('Cache-Control', 'no-cache')
+    request_handler.send_header('Access-Control-Allow-Origin', '*')
+    request_handler.end_headers()
+    request_handler.wfile.write(body)
+
+
+def client_disconnected(request_handler: BaseHTTPRequestHandler) -> bool:
+    """Whether the client has closed the connection, e.g. an aborted fetch(), while its request runs."""
+    try:
+        readable, _, _ = select.select([request_handler.connection], [], [], 0)
+        return bool(readable) and request_handler.connection.recv(1, socket.MSG_PEEK) == b''
+    except (OSError, ValueError):
+        return True
 
+# Shared terminal instance, created on first request rather than at import
+_terminal_api = None
+_terminal_api_lock = threading.Lock()
 
-# Global terminal instance
-terminal_api = TerminalAPI()
 
+def get_terminal_api() -> TerminalAPI:
+    """Return the process-wide TerminalAPI instance, creating it on first use."""
+    global _terminal_api
+    if _terminal_api is None:
+        with _terminal_api_lock:
+            if _terminal_api is None:
+                _terminal_api = TerminalAPI()
+    return _terminal_api
 
-class handler(BaseHTTPRequestHandler):
+
+class handler(RequestMetricsMixin, BaseHTTPRequestHandler):
     def do_GET(self):
         """Handle GET requests."""
-        if self.path == '/api/terminal':
+        terminal_api = get_terminal_api()
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        
+        if parsed.path == '/api/terminal':
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
@@ -1118,7 +2062,7 @@ class handler(BaseHTTPRequestHandler):
             }
             self.wfile.write(json.dumps(response).encode())
         
-        elif self.path == '/api/help':
+        elif parsed.path == '/api/help':
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
@@ -1132,16 +2076,121 @@ class handler(BaseHTTPRequestHandler):
             }
             self.wfile.write(json.dumps(response).encode())
         
-        elif self.path == '/api/welcome':
+        elif parsed.path == '/api/welcome':
+            body, etag = terminal_api.get_welcome_json(wrapped=True)
+            send_json_with_etag(self, body, etag)
+        
+        elif parsed.path == '/api/stats':
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            
+            response = {
+                "status": "success",
+                "stats": metrics.snapshot()
+            }
+            self.wfile.write(json.dumps(response).encode())
+        
+        elif parsed.path == '/api/metrics/prom':
+            self.send_response(200)
+            self.send_header('Content-type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(metrics.to_prometheus().encode())
+        
+        elif parsed.path == '/api/fs/changes':
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
             
-            welcome_info = terminal_api.get_welcome_info()
             response = {
                 "status": "success",
-                "welcome": welcome_info
+                **terminal_api.fs_changes(query.get('since', ['0'])[0])
+            }
+            self.wfile.write(json.dumps(response).encode())
+        
+        elif parsed.path == '/api/jobs' or parsed.path.startswith('/api/jobs/'):
+            job_id = parsed.path[len('/api/jobs/'):]
+            job = terminal_api.jobs.get(job_id) if job_id else None
+            
+            self.send_response(404 if job_id and job is None else 200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            
+            if not job_id:
+                response = {"status": "success", "jobs": terminal_api.jobs.list()}
+            elif job is None:
+                response = {"status": "error", "message": f"Unknown job: {job_id}"}
+            else:
+                response = {"status": "success", "job": job}
+            self.wfile.write(json.dumps(response).encode())
+        
+        elif parsed.path == '/api/download':
+            path = terminal_api.resolve_request_path(query.get('path', [''])[0])
+            transfer.send_download(self, path, query.get('format', [None])[0])
+        
+        elif parsed.path.startswith('/api/upload/'):
+            try:
+                status, response = 200, {"status": "success", **terminal_api.uploads.status(parsed.path[len('/api/upload/'):])}
+            except transfer.UploadError as e:
+                status, response = e.status, {"status": "error", "message": str(e)}
+            
+            self.send_response(status)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(json.dumps(response).encode())
+        
+        elif parsed.path.startswith('/api/output/'):
+            try:
+                status, response = 200, {"status": "success", **terminal_api.read_output(
+                    parsed.path[len('/api/output/'):], query.get('offset', ['0'])[0], query.get('limit', [None])[0])}
+            except OutputError as e:
+                status, response = e.status, {"status": "error", "message": str(e)}
+            
+            self.send_response(status)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(json.dumps(response).encode())
+        
+        elif parsed.path == '/api/complete':
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            
+            response = {
+                "status": "success",
+                "completions": terminal_api.complete(query.get('text', [''])[0], query.get('limit', ['50'])[0])
+            }
+            self.wfile.write(json.dumps(response).encode())
+        
+        elif parsed.path == '/api/trash':
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            
+            response = {
+                "status": "success",
+                "retention_s": terminal_api.trash.retention,
+                "entries": terminal_api.trash.entries()
+            }
+            self.wfile.write(json.dumps(response).encode())
+        
+        elif parsed.path == '/api/history':
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            
+            response = {
+                "status": "success",
+                "entries": terminal_api.search_history(query.get('q', [''])[0], query.get('limit', ['20'])[0])
             }
             self.wfile.write(json.dumps(response).encode())
         
@@ -1154,33 +2203,35 @@ class handler(BaseHTTPRequestHandler):
     
     def do_POST(self):
         """Handle POST requests."""
-        if self.path == '/api/execute':
+        terminal_api = get_terminal_api()
+        if urlparse(self.path).path == '/api/execute':
             content_length = int(self.headers['Content-Length'])
             post_data = self.rfile.read(content_length)
             
             try:
                 data = json.loads(post_data.decode('utf-8'))
-                command = data.get('command', '')
-                
-                # Store original command for AI translation display
-                original_command = command
-                
-                # Execute command (AI processing happens inside execute_command)
-                result = terminal_api.execute_command(command, data.get('natural_language', False))
                 
-                # Get AI translation from result
-                ai_translation = result.get('ai_translation')
+                # Opt-in profiling via header, query string or request body
+                profile = (self.headers.get('X-CodeMate-Profile')
+                           or parse_qs(urlparse(self.path).query).get('profile', [None])[0]
+                           or data.get('profile'))
+                disconnected = lambda: client_disconnected(self)
                 
-                response = {
-                    "status": "success",
-                    "command": original_command,
-                    "ai_translation": ai_translation,
-                    "output": result["output"],
-                    "exit_code": result["exit_code"],
-                    "error": result["error"],
-                    "current_path": terminal_api.current_path,
-                    "timestamp": datetime.now().isoformat()
-                }
+                if 'commands' in data:
+                    # Commands the UI queued while its previous request was running
+                    results = terminal_api.execute_batch(data['commands'], profile, disconnected)
+                    response = {
+                        "status": "success",
+                        "results": [self._execute_response(result["command"], result, result["current_path"])
+                                    for result in results],
+                        "timestamp": datetime.now().isoformat()
+                    }
+                else:
+                    command = data.get('command', '')
+                    # Execute command (AI processing happens inside execute_command)
+                    result = terminal_api.execute_command(command, data.get('natural_language', False), profile,
+                                                          data.get('request_id'), disconnected)
+                    response = self._execute_response(command, result, terminal_api.current_path)
                 
                 self.send_response(200)
                 self.send_header('Content-type', 'application/json')
@@ -1200,7 +2251,41 @@ class handler(BaseHTTPRequestHandler):
                 }
                 self.wfile.write(json.dumps(response).encode())
         
-        elif self.path == '/api/translate':
+        elif urlparse(self.path).path == '/api/cancel':
+            content_length = int(self.headers['Content-Length'])
+            post_data = self.rfile.read(content_length)
+            
+            try:
+                data = json.loads(post_data.decode('utf-8'))
+                request_ids = data.get('request_ids') or [data.get('request_id')]
+                status, response = 200, {"status": "success", "cancelled": terminal_api.cancel(request_ids)}
+            except (AttributeError, ValueError) as e:
+                status, response = 400, {"status": "error", "message": str(e)}
+            
+            self.send_response(status)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(json.dumps(response).encode())
+        
+        elif urlparse(self.path).path == '/api/upload':
+            content_length = int(self.headers['Content-Length'])
+            post_data = self.rfile.read(content_length)
+            
+            try:
+                status, response = 200, {"status": "success", **terminal_api.start_upload(json.loads(post_data.decode('utf-8')))}
+            except transfer.UploadError as e:
+                status, response = e.status, {"status": "error", "message": str(e)}
+            except (OSError, ValueError) as e:
+                status, response = 500, {"status": "error", "message": str(e)}
+            
+            self.send_response(status)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(json.dumps(response).encode())
+        
+        elif urlparse(self.path).path == '/api/translate':
             content_length = int(self.headers['Content-Length'])
             post_data = self.rfile.read(content_length)
             
@@ -1208,12 +2293,13 @@ class handler(BaseHTTPRequestHandler):
                 data = json.loads(post_data.decode('utf-8'))
                 text = data.get('text', '')
                 
-                translated = terminal_api.process_natural_language(text)
+                steps = terminal_api.plan_natural_language(text)
                 
                 response = {
                     "status": "success",
                     "original": text,
-                    "translated": translated,
+                    "translated": ' && '.join(step["command"] for step in steps) if steps else None,
+                    "plan": steps,
                     "timestamp": datetime.now().isoformat()
                 }
                 
@@ -1242,17 +2328,45 @@ class handler(BaseHTTPRequestHandler):
             response = {"status": "error", "message": "Not found"}
             self.wfile.write(json.dumps(response).encode())
     
+    def _execute_response(self, command: str, result: Dict[str, any], current_path: str) -> Dict[str, any]:
+        """The /api/execute response for one command's result."""
+        response = {
+            "status": "success",
+            "command": command,
+            "ai_translation": result.get('ai_translation'),
+            "output": result["output"],
+            "exit_code": result["exit_code"],
+            "error": result["error"],
+            "current_path": current_path,
+            "timestamp": datetime.now().isoformat()
+        }
+        for key in ("profile", "job", "download", "plan", "truncated", "cancelled"):
+            if key in result:
+                response[key] = result[key]
+        return response
+    
+    def do_PUT(self):
+        """Handle PUT requests (upload chunks)."""
+        terminal_api = get_terminal_api()
+        parsed = urlparse(self.path)
+        if parsed.path.startswith('/api/upload/'):
+            offset = parse_qs(parsed.query).get('offset', [''])[0]
+            transfer.receive_chunk(self, terminal_api.uploads, parsed.path[len('/api/upload/'):], offset)
+        else:
+            self.send_response(404)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            response = {"status": "error", "message": "Not found"}
+            self.wfile.write(json.dumps(response).encode())
+    
     def do_OPTIONS(self):
         """Handle OPTIONS requests for CORS."""
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, X-CodeMate-Profile, X-Chunk-SHA256')
         self.end_headers()
 
-# Global terminal API instance
-terminal_api = TerminalAPI()
-
 if __name__ == '__main__':
     from http.server import HTTPServer
     
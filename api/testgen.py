@@ -0,0 +1,262 @@
+"""
+`codemate test`: pytest skeletons from a module's syntax tree, and a
+parallel runner for the tests that already exist.
+
+Skeletons cover every public top-level function and class (one test class
+per class, one test per public method); names an existing test file already
+tests are left out, so the output is what is still missing. Trees come from
+AnalysisCache, so repeating the command on an unchanged large module does not
+parse it again.
+
+The runner collects test ids from the test file's tree, splits them into one
+batch per worker and runs each batch in its own pytest process. Per-test
+durations and outcomes are read back from pytest's JUnit XML report.
+"""
+
+import ast
+import os
+import subprocess
+import sys
+import tempfile
+import xml.etree.ElementTree as ElementTree
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+# Seconds one batch of tests may run before its pytest process is killed
+TEST_TIMEOUT = 300
+# Directories searched for an existing test file, relative to the module's directory
+TEST_DIRS = ('.', 'tests', 'test', os.path.join('..', 'tests'), os.path.join('..', 'test'))
+
+
+def _is_public(name: str) -> bool:
+    return not name.startswith('_')
+
+
+def public_definitions(tree: ast.Module) -> List[Tuple[ast.AST, List[ast.AST]]]:
+    """(node, public methods) for each public top-level function and class."""
+    definitions = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and _is_public(node.name):
+            definitions.append((node, []))
+        elif isinstance(node, ast.ClassDef) and _is_public(node.name):
+            methods = [item for item in node.body if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef))
+                       and (_is_public(item.name) or item.name == '__init__')]
+            definitions.append((node, methods))
+    return definitions
+
+
+def module_name(path: str) -> str:
+    """Dotted import name of path, climbing through packages (directories with __init__.py)."""
+    directory, filename = os.path.split(os.path.abspath(path))
+    parts = [os.path.splitext(filename)[0]]
+    while os.path.isfile(os.path.join(directory, '__init__.py')):
+        directory, package = os.path.split(directory)
+        parts.insert(0, package)
+    if parts[-1] == '__init__':
+        parts.pop()
+    return '.'.join(parts)
+
+
+def import_root(path: str) -> str:
+    """Directory that must be on sys.path for module_name(path) to import."""
+    directory = os.path.dirname(os.path.abspath(path))
+    while os.path.isfile(os.path.join(directory, '__init__.py')):
+        directory = os.path.dirname(directory)
+    return directory
+
+
+def find_test_file(path: str) -> Optional[str]:
+    """The existing test module for path (test_<name>.py or <name>_test.py nearby), if any."""
+    directory, filename = os.path.split(os.path.abspath(path))
+    stem = os.path.splitext(filename)[0]
+    if stem.startswith('test_') or stem.endswith('_test'):
+        return os.path.abspath(path)
+    for sub in TEST_DIRS:
+        for candidate in (f"test_{stem}.py", f"{stem}_test.py"):
+            candidate_path = os.path.normpath(os.path.join(directory, sub, candidate))
+            if os.path.isfile(candidate_path):
+                return candidate_path
+    return None
+
+
+def collect_tests(tree: ast.Module) -> List[str]:
+    """pytest node ids (without the file part) of the tests defined in a test module."""
+    ids = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith('test'):
+            ids.append(node.name)
+        elif isinstance(node, ast.ClassDef) and node.name.startswith('Test'):
+            ids.extend(f"{node.name}::{item.name}" for item in node.body
+                       if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) and item.name.startswith('test'))
+    return ids
+
+
+def _call_example(node: ast.AST, bound: bool = False) -> str:
+    """A call with one placeholder per required argument, e.g. `parse(text=..., strict=...)`."""
+    args = node.args
+    positional = args.posonlyargs + args.args
+    static = any(isinstance(d, ast.Name) and d.id == 'staticmethod' for d in node.decorator_list)
+    if bound and positional and not static:
+        positional = positional[1:]
+    required = positional[:len(positional) - len(args.defaults)] if args.defaults else positional
+    parts = [f"{arg.arg}=..." if arg not in args.posonlyargs else "..." for arg in required]
+    parts += [f"{arg.arg}=..." for arg, default in zip(args.kwonlyargs, args.kw_defaults) if default is None]
+    return f"{node.name}({', '.join(parts)})"
+
+
+def _test_body(node: ast.AST, target: str, indent: str) -> List[str]:
+    doc = ast.get_docstring(node)
+    lines = []
+    if doc:
+        lines.append(f'{indent}"""{doc.strip().splitlines()[0]}"""')
+    call = f"{target}{_call_example(node, bound=bool(target))}"
+    if isinstance(node, ast.AsyncFunctionDef):
+        call = f"asyncio.run({call})"
+    lines += [
+        f'{indent}pytest.skip("TODO: write this test")',
+        f"{indent}result = {call}",
+        f"{indent}assert result == ...",
+    ]
+    return lines
+
+
+def generate_tests(path: str, tree: ast.Module, existing: Optional[ast.Module] = None) -> Tuple[str, int]:
+    """Return (pytest source, number of tests) for the public API of the module at path.
+
+    Tests already present in existing (the parsed test module) are skipped.
+    """
+    existing_ids = set(collect_tests(existing)) if existing is not None else set()
+    definitions = public_definitions(tree)
+    blocks = []
+    names = []
+    count = 0
+    uses_asyncio = False
+
+    for node, methods in definitions:
+        if isinstance(node, ast.ClassDef):
+            class_name = f"Test{node.name}"
+            tests = []
+            for method in methods:
+                test_name = f"test_{method.name.strip('_') or 'call'}"
+                if f"{class_name}::{test_name}" in existing_ids:
+                    continue
+                instance = f"{_call_example(method, bound=True).replace(method.name, node.name, 1)}"
+                if method.name == '__init__':
+                    body = [f"{' ' * 8}pytest.skip(\"TODO: write this test\")",
+                            f"{' ' * 8}instance = {instance}",
+                            f"{' ' * 8}assert isinstance(instance, {node.name})"]
+                else:
+                    body = _test_body(method, f"{node.name}(...).", ' ' * 8)
+                uses_asyncio |= isinstance(method, ast.AsyncFunctionDef)
+                tests.append("\n".join([f"    def {test_name}(self):"] + body))
+            if not methods and f"{class_name}::test_create" not in existing_ids:
+                tests.append("\n".join([
+                    "    def test_create(self):",
+                    '        pytest.skip("TODO: write this test")',
+                    f"        assert isinstance({node.name}(...), {node.name})",
+                ]))
+            if tests:
+                names.append(node.name)
+                count += len(tests)
+                blocks.append(f"class {class_name}:\n" + "\n\n".join(tests))
+        else:
+            test_name = f"test_{node.name}"
+            if test_name in existing_ids:
+                continue
+            names.append(node.name)
+            count += 1
+            uses_asyncio |= isinstance(node, ast.AsyncFunctionDef)
+            blocks.append("\n".join([f"def {test_name}():"] + _test_body(node, '', ' ' * 4)))
+
+    if not blocks:
+        return "", 0
+    header = []
+    if uses_asyncio:
+        header.append("import asyncio")
+    header.append("import pytest")
+    header.append("")
+    header.append(f"from {module_name(path)} import {', '.join(names)}")
+    return "\n".join(header) + "\n\n\n" + "\n\n\n".join(blocks) + "\n", count
+
+
+def _run_batch(test_file: str, ids: List[str], cwd: str) -> Dict[str, Dict[str, any]]:
+    """Run some tests of one file in a fresh pytest process; return results by id."""
+    fd, report = tempfile.mkstemp(prefix='codemate-junit-', suffix='.xml')
+    os.close(fd)
+    command = [sys.executable, '-m', 'pytest', '-q', '-p', 'no:cacheprovider', f'--junitxml={report}']
+    command += [f"{test_file}::{test_id}" for test_id in ids]
+    results = {}
+    try:
+        try:
+            completed = subprocess.run(command, cwd=cwd, capture_output=True, text=True, timeout=TEST_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            return {test_id: {"outcome": "timeout", "time": float(TEST_TIMEOUT), "message": ""} for test_id in ids}
+        try:
+            root = ElementTree.parse(report).getroot()
+        except (OSError, ElementTree.ParseError):
+            output = (completed.stdout + completed.stderr).strip().splitlines()
+            message = output[-1] if output else f"pytest exited with {completed.returncode}"
+            return {test_id: {"outcome": "error", "time": 0.0, "message": message} for test_id in ids}
+        for case in root.iter('testcase'):
+            # classname is the dotted module (plus class); keep just the class part
+            module_part = os.path.splitext(os.path.basename(test_file))[0]
+            classname = case.get('classname', '')
+            class_part = classname.split(module_part + '.', 1)[1] if module_part + '.' in classname else ''
+            test_id = f"{class_part}::{case.get('name')}" if class_part else case.get('name')
+            outcome, message = "passed", ""
+            for tag in ('failure', 'error', 'skipped'):
+                element = case.find(tag)
+                if element is not None:
+                    outcome = {"failure": "failed", "error": "error", "skipped": "skipped"}[tag]
+                    message = (element.get('message') or '').strip().splitlines()[0:1]
+                    message = message[0] if message else ''
+                    break
+            results[test_id] = {"outcome": outcome, "time": float(case.get('time') or 0), "message": message}
+    finally:
+        try:
+            os.unlink(report)
+        except OSError:
+            pass
+    return results
+
+
+def run_tests(test_file: str, ids: List[str], workers: int, cwd: str) -> Tuple[Dict[str, Dict[str, any]], int]:
+    """Run ids from test_file split over up to workers pytest processes; return (results, processes).
+
+    cwd should be the module's import_root(): `python -m pytest` puts it on
+    sys.path, so the test file can import the module under test.
+    """
+    workers = max(1, min(workers, len(ids)))
+    # Round-robin keeps neighbouring (often similarly slow) tests apart
+    batches = [ids[i::workers] for i in range(workers)]
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for batch_results in pool.map(lambda batch: _run_batch(test_file, batch, cwd), batches):
+            results.update(batch_results)
+    return results, workers
+
+
+def format_run(test_file: str, ids: List[str], results: Dict[str, Dict[str, any]],
+               processes: int, elapsed: float) -> Tuple[str, int]:
+    labels = {"passed": "PASS", "failed": "FAIL", "error": "ERROR", "skipped": "SKIP", "timeout": "TIMEOUT"}
+    results = dict(results)
+    # Parametrized tests are reported once per case, as test_id[params]
+    for test_id in ids:
+        if test_id not in results and not any(key.startswith(test_id + '[') for key in results):
+            results[test_id] = {"outcome": "error", "time": 0.0, "message": "not reported by pytest"}
+    counts: Dict[str, int] = {}
+    rows = []
+    for test_id, result in results.items():
+        counts[result["outcome"]] = counts.get(result["outcome"], 0) + 1
+        rows.append((result["time"], test_id, result))
+    rows.sort(key=lambda row: -row[0])
+
+    lines = [f"Ran {len(rows)} tests from {test_file} in {elapsed:.2f}s ({processes} processes), slowest first:", ""]
+    for duration, test_id, result in rows:
+        lines.append(f"  {labels[result['outcome']]:<7} {duration:8.3f}s  {test_id}")
+        if result["message"] and result["outcome"] != "passed":
+            lines.append(f"  {'':<7} {'':>9}  {result['message'][:200]}")
+    lines.append("")
+    lines.append(", ".join(f"{count} {outcome}" for outcome, count in sorted(counts.items())))
+    failed = counts.get("failed", 0) + counts.get("error", 0) + counts.get("timeout", 0)
+    return "\n".join(lines), 1 if failed else 0
@@ -0,0 +1,445 @@
+"""
+File transfer between the browser and the session's filesystem.
+
+`GET /api/download?path=...` streams a file as raw bytes, honouring a single
+`Range: bytes=...` request so interrupted downloads can resume, or streams a
+directory as a tar.gz, tar or zip archive generated on the fly. Files go out
+with `socket.sendfile` (zero-copy where the OS supports it) and archives are
+written through a small buffer straight to the socket, so memory use stays
+constant whatever the size of the tree.
+
+Uploads go the other way in fixed-size chunks: `POST /api/upload` registers
+a target path and size, the file is preallocated next to its destination,
+and each `PUT /api/upload/<id>?offset=N` streams one chunk from the socket to
+disk, checked against the `X-Chunk-SHA256` header before the committed offset
+moves on. Upload manifests live in the state directory, so an interrupted
+upload resumes from its last committed offset, on any worker, even after a
+server restart. The finished file is renamed into place.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import tarfile
+import threading
+import time
+import uuid
+import zipfile
+from typing import Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+from urllib.parse import quote
+
+# Archive data is pushed to the socket in pieces of this size
+STREAM_CHUNK = 256 * 1024
+# Archives are built per request, so favour throughput over ratio
+ARCHIVE_COMPRESSLEVEL = 1
+ARCHIVE_FORMATS = {
+    'tar.gz': 'application/gzip',
+    'tgz': 'application/gzip',
+    'tar': 'application/x-tar',
+    'zip': 'application/zip'
+}
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+MIN_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+# Request bodies are copied to disk in pieces of this size
+RECEIVE_BUFFER = 1024 * 1024
+# Unfinished uploads older than this are discarded
+UPLOAD_EXPIRY = 24 * 60 * 60
+
+
+class _StreamWriter:
+    """Write-only file object that batches archive output into STREAM_CHUNK writes.
+
+    It deliberately has no tell()/seek(), which makes zipfile use its
+    streaming layout (sizes in data descriptors after each member).
+    """
+
+    def __init__(self, wfile):
+        self._wfile = wfile
+        self._buffer = bytearray()
+        self.bytes_written = 0
+
+    def write(self, data) -> int:
+        self._buffer += data
+        if len(self._buffer) >= STREAM_CHUNK:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if self._buffer:
+            self._wfile.write(self._buffer)
+            self.bytes_written += len(self._buffer)
+            self._buffer = bytearray()
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Return the inclusive (start, end) of a single-range header, None for the whole file.
+
+    Raises ValueError if the range cannot be satisfied.
+    """
+    if not header:
+        return None
+    match = _RANGE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        # Multiple or malformed ranges: serve the whole file, as RFC 9110 allows
+        return None
+    first, last = match.groups()
+    if first == '':
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _content_disposition(name: str) -> str:
+    ascii_name = name.encode('ascii', 'replace').decode().replace('"', '_')
+    return f"attachment; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(name)}"
+
+
+def _send_error(request_handler, status: int, message: str):
+    body = json.dumps({"status": "error", "message": message}).encode()
+    request_handler.send_response(status)
+    request_handler.send_header('Content-type', 'application/json')
+    request_handler.send_header('Content-Length', str(len(body)))
+    request_handler.send_header('Access-Control-Allow-Origin', '*')
+    request_handler.end_headers()
+    request_handler.wfile.write(body)
+
+
+def _count_bytes(request_handler, nbytes: int):
+    # Bytes sent with sendfile bypass wfile; keep the request metrics honest
+    if hasattr(request_handler.wfile, 'bytes_written'):
+        request_handler.wfile.bytes_written += nbytes
+
+
+def send_download(request_handler, path: str, archive_format: Optional[str] = None):
+    """Answer a download request for path (already resolved against the session directory)."""
+    if not os.path.exists(path):
+        _send_error(request_handler, 404, f"No such file or directory: {path}")
+        return
+    if os.path.isdir(path):
+        _send_archive(request_handler, path, archive_format or 'tar.gz')
+        return
+
+    size = os.path.getsize(path)
+    try:
+        byte_range = parse_range(request_handler.headers.get('Range'), size)
+    except ValueError:
+        request_handler.send_response(416)
+        request_handler.send_header('Content-Range', f"bytes */{size}")
+        request_handler.send_header('Content-Length', '0')
+        request_handler.send_header('Access-Control-Allow-Origin', '*')
+        request_handler.end_headers()
+        return
+
+    start, end = byte_range if byte_range else (0, size - 1)
+    length = max(0, end - start + 1)
+    stat = os.stat(path)
+    with open(path, 'rb') as f:
+        request_handler.send_response(206 if byte_range else 200)
+        request_handler.send_header('Content-type', 'application/octet-stream')
+        request_handler.send_header('Content-Length', str(length))
+        request_handler.send_header('Accept-Ranges', 'bytes')
+        request_handler.send_header('Last-Modified', request_handler.date_time_string(int(stat.st_mtime)))
+        request_handler.send_header('ETag', f'"{stat.st_ino:x}-{stat.st_size:x}-{int(stat.st_mtime_ns):x}"')
+        if byte_range:
+            request_handler.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+        request_handler.send_header('Content-Disposition', _content_disposition(os.path.basename(path)))
+        request_handler.send_header('Access-Control-Allow-Origin', '*')
+        request_handler.end_headers()
+        if length == 0:
+            return
+        request_handler.wfile.flush()
+        sent = request_handler.connection.sendfile(f, offset=start, count=length)
+        _count_bytes(request_handler, sent)
+
+
+def _send_archive(request_handler, path: str, archive_format: str):
+    """Stream a directory as an archive; its size is unknown up front, so the connection closes at the end."""
+    if archive_format not in ARCHIVE_FORMATS:
+        _send_error(request_handler, 400, f"Unsupported archive format: {archive_format} "
+                                          f"(use {', '.join(ARCHIVE_FORMATS)})")
+        return
+
+    root_name = os.path.basename(os.path.normpath(path)) or 'root'
+    extension = 'tar.gz' if archive_format == 'tgz' else archive_format
+    request_handler.send_response(200)
+    request_handler.send_header('Content-type', ARCHIVE_FORMATS[archive_format])
+    request_handler.send_header('Content-Disposition', _content_disposition(f"{root_name}.{extension}"))
+    request_handler.send_header('Access-Control-Allow-Origin', '*')
+    request_handler.send_header('Connection', 'close')
+    request_handler.end_headers()
+    request_handler.close_connection = True
+
+    writer = _StreamWriter(request_handler.wfile)
+    compressor = None
+    if archive_format == 'zip':
+        archive = zipfile.ZipFile(writer, 'w', zipfile.ZIP_DEFLATED, compresslevel=ARCHIVE_COMPRESSLEVEL)
+        add = archive.write
+    else:
+        # tarfile's own 'w|gz' always compresses at level 9, so gzip separately
+        if archive_format != 'tar':
+            compressor = gzip.GzipFile(filename='', mode='wb', fileobj=writer,
+                                       compresslevel=ARCHIVE_COMPRESSLEVEL, mtime=0)
+        archive = tarfile.open(fileobj=compressor if compressor is not None else writer, mode='w|', bufsize=STREAM_CHUNK)
+
+        def add(filepath, arcname):
+            archive.add(filepath, arcname, recursive=False)
+
+    with archive:
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            arcdir = os.path.normpath(os.path.join(root_name, os.path.relpath(dirpath, path)))
+            add(dirpath, arcdir)
+            for name in sorted(filenames) + [d for d in dirnames if os.path.islink(os.path.join(dirpath, d))]:
+                try:
+                    # Unreadable files fail before anything is written, so skipping them is safe
+                    add(os.path.join(dirpath, name), os.path.join(arcdir, name))
+                except OSError:
+                    continue
+    if compressor is not None:
+        compressor.close()
+    writer.flush()
+
+
+class UploadError(Exception):
+    """An upload request that cannot be honoured; status is the HTTP status to answer with."""
+
+    def __init__(self, message: str, status: int = 400, offset: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+class UploadManager:
+    """Resumable chunked uploads, tracked by JSON manifests in state_dir."""
+
+    def __init__(self, state_dir: str):
+        self.state_dir = state_dir
+        self._lock = threading.Lock()
+
+    def _manifest_path(self, upload_id: str) -> str:
+        if not upload_id.isalnum():
+            raise UploadError(f"Unknown upload: {upload_id}", 404)
+        return os.path.join(self.state_dir, f"{upload_id}.json")
+
+    def _load(self, upload_id: str) -> Dict[str, any]:
+        try:
+            with open(self._manifest_path(upload_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            raise UploadError(f"Unknown upload: {upload_id}", 404)
+
+    def _save(self, manifest: Dict[str, any]):
+        os.makedirs(self.state_dir, exist_ok=True)
+        tmp_path = os.path.join(self.state_dir, f".{manifest['id']}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self._manifest_path(manifest['id']))
+
+    def _manifests(self):
+        try:
+            names = os.listdir(self.state_dir)
+        except OSError:
+            return
+        for name in names:
+            if name.endswith('.json') and not name.startswith('.'):
+                try:
+                    yield self._load(name[:-5])
+                except UploadError:
+                    continue
+
+    def _expire(self):
+        cutoff = time.time() - UPLOAD_EXPIRY
+        for manifest in self._manifests():
+            if manifest['updated'] < cutoff:
+                for path in (manifest['temp_path'], self._manifest_path(manifest['id'])):
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+
+    def start(self, target: str, size: int, chunk_size: Optional[int] = None) -> Dict[str, any]:
+        """Register (or find the unfinished upload of) target and return its status."""
+        if size < 0:
+            raise UploadError("size must not be negative")
+        if os.path.isdir(target):
+            raise UploadError(f"'{target}' is a directory")
+        if not os.path.isdir(os.path.dirname(target)):
+            raise UploadError(f"No such directory: {os.path.dirname(target)}", 404)
+
+        with self._lock:
+            self._expire()
+            # Starting the same upload again resumes it
+            for manifest in self._manifests():
+                if manifest['path'] == target and manifest['size'] == size and not manifest['complete']:
+                    if os.path.exists(manifest['temp_path']):
+                        return self.status(manifest['id'])
+                    # Its partial file is gone; start over
+                    os.unlink(self._manifest_path(manifest['id']))
+
+            chunk_size = min(max(int(chunk_size or DEFAULT_CHUNK_SIZE), MIN_CHUNK_SIZE), MAX_CHUNK_SIZE)
+            upload_id = uuid.uuid4().hex[:12]
+            temp_path = os.path.join(os.path.dirname(target), f".{os.path.basename(target)}.codemate-upload-{upload_id}")
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+            try:
+                # Reserve the space up front: no ENOSPC half way, less fragmentation
+                if size and hasattr(os, 'posix_fallocate'):
+                    try:
+                        os.posix_fallocate(fd, 0, size)
+                    except OSError:
+                        os.ftruncate(fd, size)
+                else:
+                    os.ftruncate(fd, size)
+            except OSError:
+                os.close(fd)
+                os.unlink(temp_path)
+                raise
+            os.close(fd)
+
+            manifest = {
+                "id": upload_id,
+                "path": target,
+                "temp_path": temp_path,
+                "size": size,
+                "chunk_size": chunk_size,
+                "offset": 0,
+                "chunks": [],
+                "complete": False,
+                "updated": time.time()
+            }
+            if size == 0:
+                self._finish(manifest)
+            self._save(manifest)
+        return self.status(upload_id)
+
+    def status(self, upload_id: str) -> Dict[str, any]:
+        manifest = self._load(upload_id)
+        return {
+            "upload_id": manifest['id'],
+            "path": manifest['path'],
+            "size": manifest['size'],
+            "chunk_size": manifest['chunk_size'],
+            "offset": manifest['offset'],
+            "complete": manifest['complete']
+        }
+
+    def write_chunk(self, upload_id: str, offset: int, length: int, stream, sha256: Optional[str]) -> Dict[str, any]:
+        """Copy length bytes from stream into the upload at offset and commit them.
+
+        The chunk must start at the committed offset and be a full chunk
+        (or the remainder of the file); its SHA-256 must match before the
+        offset advances. Concurrent writers, even in other processes, are
+        serialized with a lock on the partial file.
+        """
+        fd = None
+        try:
+            if not sha256:
+                raise UploadError("Missing X-Chunk-SHA256 header")
+            manifest = self._load(upload_id)
+            if manifest['complete']:
+                raise UploadError("Upload already complete", 409, manifest['size'])
+            fd = os.open(manifest['temp_path'], os.O_WRONLY)
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            # Re-read under the lock: another worker may have committed since
+            manifest = self._load(upload_id)
+            expected = min(manifest['chunk_size'], manifest['size'] - manifest['offset'])
+            if offset != manifest['offset']:
+                raise UploadError(f"Expected offset {manifest['offset']}", 409, manifest['offset'])
+            if length != expected:
+                raise UploadError(f"Chunk at offset {offset} must be {expected} bytes", 400, manifest['offset'])
+        except (UploadError, OSError):
+            if fd is not None:
+                os.close(fd)
+            # Consume the rejected body so the client can read the answer
+            _discard(stream, length)
+            raise
+
+        try:
+            digest = hashlib.sha256()
+            buffer = bytearray(min(RECEIVE_BUFFER, max(length, 1)))
+            view = memoryview(buffer)
+            position = offset
+            remaining = length
+            while remaining:
+                n = stream.readinto(view[:min(remaining, len(buffer))])
+                if not n:
+                    raise UploadError("Connection closed mid-chunk", 400, manifest['offset'])
+                digest.update(view[:n])
+                os.pwrite(fd, view[:n], position)
+                position += n
+                remaining -= n
+            if digest.hexdigest() != sha256.lower():
+                raise UploadError("Chunk hash mismatch", 400, manifest['offset'])
+
+            manifest['offset'] += length
+            manifest['chunks'].append(digest.hexdigest())
+            manifest['updated'] = time.time()
+            if manifest['offset'] == manifest['size']:
+                os.fsync(fd)
+                self._finish(manifest)
+            self._save(manifest)
+        finally:
+            os.close(fd)
+        return self.status(upload_id)
+
+    def _finish(self, manifest: Dict[str, any]):
+        os.replace(manifest['temp_path'], manifest['path'])
+        manifest['complete'] = True
+
+
+def _discard(stream, length: int):
+    """Read and drop up to length bytes of a request body, if it is a sensible size."""
+    if length > MAX_CHUNK_SIZE:
+        raise UploadError(f"Chunks are limited to {MAX_CHUNK_SIZE} bytes", 413)
+    while length > 0:
+        data = stream.read(min(length, RECEIVE_BUFFER))
+        if not data:
+            return
+        length -= len(data)
+
+
+def receive_chunk(request_handler, uploads: UploadManager, upload_id: str, offset: str):
+    """Answer a `PUT /api/upload/<id>?offset=N` chunk request, streaming the body to disk."""
+    try:
+        try:
+            length = int(request_handler.headers.get('Content-Length', ''))
+            offset = int(offset)
+        except ValueError:
+            raise UploadError("Content-Length and offset are required")
+        status, response = 200, uploads.write_chunk(upload_id, offset, length, request_handler.rfile,
+                                                    request_handler.headers.get('X-Chunk-SHA256'))
+        response["status"] = "success"
+    except UploadError as e:
+        status, response = e.status, {"status": "error", "message": str(e)}
+        if e.offset is not None:
+            response["offset"] = e.offset
+        # The body may be partly unread; don't try to parse it as the next request
+        request_handler.close_connection = True
+    except OSError as e:
+        status, response = 500, {"status": "error", "message": str(e)}
+        request_handler.close_connection = True
+
+    body = json.dumps(response).encode()
+    request_handler.send_response(status)
+    request_handler.send_header('Content-type', 'application/json')
+    request_handler.send_header('Content-Length', str(len(body)))
+    request_handler.send_header('Access-Control-Allow-Origin', '*')
+    request_handler.end_headers()
+    request_handler.wfile.write(body)
@@ -0,0 +1,405 @@
+"""
+Deferred, parallel deletion for `rm -r`.
+
+Deleting a large tree (a `node_modules` with hundreds of thousands of files)
+takes minutes, so `rm -r` instead renames the target into a per-session trash
+directory on the same filesystem, which is atomic and instant, and returns.
+The tree is then removed on a background job by a parallel scandir walker.
+
+With a retention period (CODEMATE_TRASH_RETENTION, seconds) trashed trees
+are kept that long first, so `trash restore <id>` can undo the delete. Each
+entry records when it expires, under the retention in force when it was
+deleted. Entries live on disk, so every server worker of a session sees the
+same trash.
+
+The trash lives in the main trash directory. Only a tree on another
+filesystem, which cannot be renamed there, goes to a `.codemate-trash`
+directory on its own filesystem; those directories are listed in an index
+file in the main trash directory. A sweep at startup purges what expired in
+any session's trash (including purges a previous process left half done),
+so nothing is left behind when the session id changes.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+
+DELETE_THREADS = 8
+TRASH_DIR_NAME = '.codemate-trash'
+# Trash directories outside the main one, one per line, in the main one
+ROOTS_INDEX = 'roots.list'
+PURGE_PREFIX = '.purge-'
+
+
+def get_trash_dir() -> str:
+    """Return the preferred trash directory, from CODEMATE_TRASH_DIR or under the home directory."""
+    configured = os.getenv('CODEMATE_TRASH_DIR')
+    if configured:
+        return configured
+    home_dir = os.path.join(os.path.expanduser('~'), '.codemate', 'trash')
+    if os.access(os.path.dirname(os.path.dirname(home_dir)), os.W_OK):
+        return home_dir
+    return os.path.join(tempfile.gettempdir(), 'codemate', 'trash')
+
+
+def get_retention() -> float:
+    try:
+        return max(0.0, float(os.getenv('CODEMATE_TRASH_RETENTION', '0')))
+    except ValueError:
+        return 0.0
+
+
+def _mount_point(path: str) -> str:
+    """Return the mount point of the filesystem holding path."""
+    path = os.path.abspath(path)
+    device = os.lstat(path).st_dev
+    while True:
+        parent = os.path.dirname(path)
+        if parent == path:
+            return path
+        try:
+            if os.lstat(parent).st_dev != device:
+                return path
+        except OSError:
+            return path
+        path = parent
+
+
+def _existing_device(path: str) -> int:
+    """st_dev of path, or of its nearest existing ancestor if it does not exist yet."""
+    while True:
+        try:
+            return os.stat(path).st_dev
+        except FileNotFoundError:
+            parent = os.path.dirname(path)
+            if parent == path:
+                raise
+            path = parent
+
+
+def _clear_directory(path: str, job=None) -> List[str]:
+    """Unlink every non-directory entry of path; return its subdirectories."""
+    subdirs = []
+    removed = 0
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    else:
+                        os.unlink(entry.path)
+                        removed += 1
+                except FileNotFoundError:
+                    continue
+    except FileNotFoundError:
+        pass
+    if job is not None and removed:
+        job.add_progress(items=removed)
+    return subdirs
+
+
+def remove_tree(path: str, job=None, threads: int = DELETE_THREADS):
+    """Delete a directory tree, emptying directories on a thread pool.
+
+    Directories are discovered breadth first while their files are unlinked
+    in parallel (unlink releases the GIL), then removed deepest first.
+    """
+    if not os.path.lexists(path):
+        return
+    if not os.path.isdir(path) or os.path.islink(path):
+        os.unlink(path)
+        return
+
+    discovered = [path]
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        pending = {pool.submit(_clear_directory, path, job)}
+        while pending:
+            if job is not None and job.cancelled.is_set():
+                for future in pending:
+                    future.cancel()
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for subdir in future.result():
+                    discovered.append(subdir)
+                    pending.add(pool.submit(_clear_directory, subdir, job))
+
+    # Children are always discovered after their parent
+    for directory in reversed(discovered):
+        try:
+            os.rmdir(directory)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            # Something was created while we were deleting; finish it the slow way
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+class Trash:
+    """Per-session trash: instant moves out of the way, deletion in the background."""
+
+    def __init__(self, session_id: str, jobs, trash_dir: Optional[str] = None,
+                 retention: Optional[float] = None):
+        self.session_id = session_id
+        self.jobs = jobs
+        self._trash_dir = trash_dir
+        self.retention = get_retention() if retention is None else retention
+        # Trash directories (not session roots) known to be in the index
+        self._bases = set()
+        self._lock = threading.Lock()
+        self._timer = None
+
+    @property
+    def trash_dir(self) -> str:
+        if self._trash_dir is None:
+            self._trash_dir = get_trash_dir()
+        return self._trash_dir
+
+    def _staging_root(self, path: str) -> Optional[str]:
+        """Pick a session trash directory on the same filesystem as path.
+
+        That is the main trash directory unless it is on another filesystem;
+        only then is a .codemate-trash directory created next to the data.
+        """
+        device = os.lstat(path).st_dev
+        parent = os.path.dirname(os.path.abspath(path))
+        try:
+            # Nothing is created on a filesystem the tree cannot be renamed to
+            same_device = _existing_device(self.trash_dir) == device
+        except OSError:
+            same_device = False
+        if same_device:
+            candidates = [self.trash_dir]
+        else:
+            candidates = [
+                os.path.join(_mount_point(parent), TRASH_DIR_NAME),
+                # Always the same filesystem, unless path is itself a mount point
+                os.path.join(parent, TRASH_DIR_NAME),
+            ]
+        for base in candidates:
+            root = os.path.join(base, self.session_id)
+            if root == path or root.startswith(os.path.abspath(path) + os.sep):
+                continue
+            try:
+                if _existing_device(root) != device:
+                    continue
+                os.makedirs(root, exist_ok=True)
+            except OSError:
+                continue
+            if base != self.trash_dir:
+                self._remember_base(base)
+            return root
+        return None
+
+    def _remember_base(self, base: str):
+        """Add a trash directory to the index so later processes sweep it too."""
+        with self._lock:
+            if base in self._bases:
+                return
+            if base not in self._indexed_bases():
+                try:
+                    os.makedirs(self.trash_dir, exist_ok=True)
+                    # One short append per line, so workers appending at once don't interleave
+                    with open(os.path.join(self.trash_dir, ROOTS_INDEX), 'a', encoding='utf-8') as f:
+                        f.write(base + '\n')
+                except OSError:
+                    pass
+            self._bases.add(base)
+
+    def _indexed_bases(self) -> List[str]:
+        try:
+            with open(os.path.join(self.trash_dir, ROOTS_INDEX), 'r', encoding='utf-8') as f:
+                return [line.rstrip('\n') for line in f if line.strip()]
+        except OSError:
+            return []
+
+    def _all_bases(self) -> List[str]:
+        with self._lock:
+            bases = set(self._bases)
+        bases.update(self._indexed_bases())
+        bases.add(self.trash_dir)
+        return sorted(bases)
+
+    def _session_roots(self, all_sessions: bool = False) -> List[str]:
+        """Existing trash roots of this session, or of every session."""
+        roots = []
+        for base in self._all_bases():
+            if not all_sessions:
+                roots.append(os.path.join(base, self.session_id))
+                continue
+            try:
+                with os.scandir(base) as entries:
+                    roots.extend(entry.path for entry in entries if entry.is_dir(follow_symlinks=False))
+            except OSError:
+                continue
+        return [root for root in roots if os.path.isdir(root)]
+
+    def delete(self, path: str) -> Optional[str]:
+        """Move path into the trash and schedule its removal; return the entry id.
+
+        Returns None if path could not be moved (e.g. it is a mount point); the
+        caller should then delete it in place.
+        """
+        path = os.path.abspath(path)
+        root = self._staging_root(path)
+        if root is None:
+            return None
+
+        entry_id = uuid.uuid4().hex[:8]
+        entry_dir = os.path.join(root, entry_id)
+        # makedirs: a sweep may have just removed the (empty) root
+        os.makedirs(entry_dir)
+        deleted_at = time.time()
+        info = {"id": entry_id, "original_path": path, "deleted_at": deleted_at,
+                "expires_at": deleted_at + self.retention}
+        with open(os.path.join(entry_dir, 'info.json'), 'w', encoding='utf-8') as f:
+            json.dump(info, f)
+        try:
+            os.rename(path, os.path.join(entry_dir, 'payload'))
+        except OSError:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return None
+
+        self.purge_expired()
+        return entry_id
+
+    def entries(self, all_sessions: bool = False) -> List[Dict[str, any]]:
+        """Trash entries of this session (or of every session), oldest first."""
+        entries = []
+        for root in self._session_roots(all_sessions):
+            own = os.path.basename(root) == self.session_id
+            try:
+                names = os.listdir(root)
+            except OSError:
+                continue
+            for name in names:
+                # Hidden names are entries already claimed for deletion
+                if name.startswith('.'):
+                    continue
+                try:
+                    with open(os.path.join(root, name, 'info.json'), 'r', encoding='utf-8') as f:
+                        info = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                info["location"] = os.path.join(root, name)
+                if "expires_at" not in info:
+                    # Written before expiry times were recorded: only this
+                    # session's retention is known to apply
+                    info["expires_at"] = info["deleted_at"] + self.retention if own else None
+                entries.append(info)
+        entries.sort(key=lambda info: info["deleted_at"])
+        return entries
+
+    def restore(self, entry_id: str) -> str:
+        """Move a trashed tree back to where it was; return that path."""
+        for info in self.entries():
+            if info["id"] != entry_id:
+                continue
+            if os.path.lexists(info["original_path"]):
+                raise FileExistsError(f"'{info['original_path']}' already exists")
+            os.rename(os.path.join(info["location"], 'payload'), info["original_path"])
+            shutil.rmtree(info["location"], ignore_errors=True)
+            self._prune(os.path.dirname(info["location"]))
+            return info["original_path"]
+        raise KeyError(entry_id)
+
+    def purge_expired(self, force: bool = False) -> List[str]:
+        """Start background deletion of entries past their retention; return job ids."""
+        now = time.time()
+        job_ids = []
+        next_expiry = None
+        for info in self.entries():
+            if force or info["expires_at"] <= now:
+                job_id = self._purge(info)
+                if job_id:
+                    job_ids.append(job_id)
+            elif next_expiry is None or info["expires_at"] < next_expiry:
+                next_expiry = info["expires_at"]
+        if next_expiry is not None:
+            self._schedule(next_expiry - now)
+        return job_ids
+
+    def sweep(self, resume: bool = False) -> int:
+        """Delete entries of any session whose recorded expiry has passed; return how many.
+
+        Entries are deleted right here rather than on jobs. Each keeps the
+        retention it was deleted under, whatever this process is set to.
+        resume also finishes purges that a previous process claimed but did
+        not complete. Wakes up again when the next entry expires.
+        """
+        now = time.time()
+        removed = 0
+        next_expiry = None
+        for root in self._session_roots(all_sessions=True):
+            if resume:
+                try:
+                    claimed = [entry.path for entry in os.scandir(root) if entry.name.startswith(PURGE_PREFIX)]
+                except OSError:
+                    claimed = []
+                for path in claimed:
+                    remove_tree(path)
+                    removed += 1
+            self._prune(root)
+        for info in self.entries(all_sessions=True):
+            if info["expires_at"] is None:
+                continue
+            if info["expires_at"] <= now:
+                claimed = self._claim(info)
+                if claimed is not None:
+                    remove_tree(claimed)
+                    self._prune(os.path.dirname(claimed))
+                    removed += 1
+            elif next_expiry is None or info["expires_at"] < next_expiry:
+                next_expiry = info["expires_at"]
+        if next_expiry is not None:
+            self._schedule(next_expiry - now)
+        return removed
+
+    def _claim(self, info: Dict[str, any]) -> Optional[str]:
+        # Claim the entry with a rename so two workers never delete it twice
+        claimed = os.path.join(os.path.dirname(info["location"]), PURGE_PREFIX + info["id"])
+        try:
+            os.rename(info["location"], claimed)
+        except OSError:
+            return None
+        return claimed
+
+    def _purge(self, info: Dict[str, any]) -> Optional[str]:
+        claimed = self._claim(info)
+        if claimed is None:
+            return None
+
+        def work(job):
+            remove_tree(claimed, job)
+            if job.cancelled.is_set():
+                return f"rm: deleting {info['original_path']} was cancelled", 1
+            self._prune(os.path.dirname(claimed))
+            return f"Deleted {info['original_path']} ({job.items_done} files)", 0
+
+        return self.jobs.start('rm', f"rm -r {info['original_path']}", work).id
+
+    def _prune(self, root: str):
+        """Remove a session root once it is empty, and its .codemate-trash directory too."""
+        try:
+            os.rmdir(root)
+            base = os.path.dirname(root)
+            if os.path.basename(base) == TRASH_DIR_NAME:
+                os.rmdir(base)
+        except OSError:
+            pass
+
+    def _schedule(self, delay: float):
+        """Wake up to sweep when the next entry's retention runs out."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(max(delay, 0.0) + 0.1, self.sweep)
+            self._timer.daemon = True
+            self._timer.start()
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for CodeMate Terminal hot paths
+
+Exercises cold start (import and first request), natural language
+translation, builtin dispatch, the filesystem builtins over a generated
+directory tree, external command execution and the HTTP layer under
+concurrent load. Reports ops/sec and p50/p99 latency, and can
+write JSON results so runs can be diffed across versions.
+
+Usage:
+    python bench_terminal.py
+    python bench_terminal.py --files 20000 --json bench.json
+    python bench_terminal.py --only ls,grep --compare bench.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import shutil
+import socketserver
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT_DIR)
+
+NL_HITS = [
+    "create a folder called test",
+    "show me my files",
+    "what is my memory usage",
+    "create a new folder called demo and move file1.txt into it",
+    "find files called readme",
+    "tell me about my system",
+]
+
+NL_MISSES = [
+    "creat a foldr called x",
+    "show my fils please",
+    "what time does the bakery open",
+]
+
+WORDS = ["alpha", "beta", "gamma", "delta", "needle", "omega", "sigma", "lambda"]
+
+
+def generate_tree(root, files, fanout=8, lines_per_file=40):
+    """Create a directory tree with `files` text files spread over nested dirs."""
+    dirs = [root]
+    created = 0
+    level = 0
+    while created < files:
+        parent = dirs[level % len(dirs)]
+        for d in range(fanout):
+            path = os.path.join(parent, f"dir{level}_{d}")
+            os.makedirs(path, exist_ok=True)
+            dirs.append(path)
+        level += 1
+        for i in range(fanout * 4):
+            if created >= files:
+                break
+            ext = (".py", ".txt", ".md", ".log")[created % 4]
+            with open(os.path.join(parent, f"file{created}{ext}"), "w") as f:
+                for line in range(lines_per_file):
+                    f.write(f"{WORDS[(created + line) % len(WORDS)]} line {line} of file {created}\n")
+            created += 1
+    return root
+
+
+def percentile(samples, percent):
+    """Nearest-rank percentile of a sorted list."""
+    if not samples:
+        return 0.0
+    index = max(0, min(len(samples) - 1, int(round(percent / 100.0 * len(samples) + 0.5)) - 1))
+    return samples[index]
+
+
+def summarize(name, latencies, wall_time, ops=None, extra=None):
+    """Summarize per-operation latencies (seconds) into a result dict."""
+    latencies = sorted(latencies)
+    ops = ops if ops is not None else len(latencies)
+    result = {
+        "name": name,
+        "ops": ops,
+        "ops_per_sec": round(ops / wall_time, 2) if wall_time else 0.0,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 4) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 4),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 4),
+        "max_ms": round(latencies[-1] * 1000, 4) if latencies else 0.0,
+    }
+    if extra:
+        result.update(extra)
+    return result
+
+
+def run_timed(name, func, inputs, min_time, max_ops, warmup=3):
+    """Call func over inputs round-robin until min_time elapses or max_ops runs."""
+    for i in range(warmup):
+        func(inputs[i % len(inputs)])
+
+    latencies = []
+    start = time.perf_counter()
+    i = 0
+    while i < max_ops:
+        t0 = time.perf_counter()
+        func(inputs[i % len(inputs)])
+        latencies.append(time.perf_counter() - t0)
+        i += 1
+        if time.perf_counter() - start >= min_time:
+            break
+    return summarize(name, latencies, time.perf_counter() - start)
+
+
+def bench_api(api, tree_root, args):
+    """Benchmarks that call TerminalAPI directly."""
+    api.current_path = tree_root
+    quick = dict(min_time=args.min_time, max_ops=args.max_ops)
+    # Tree walks are much slower; cap iterations so large trees stay practical
+    walk = dict(min_time=args.min_time, max_ops=max(5, args.max_ops // 100))
+
+    def builtin(cmd):
+        return api._execute_builtin(cmd[0], cmd[1:])
+
+    cases = {
+        "nl_hit": lambda: run_timed("nl_hit", api.process_natural_language, NL_HITS, **quick),
+        "nl_miss": lambda: run_timed("nl_miss", api.process_natural_language, NL_MISSES, **quick),
+        "dispatch": lambda: run_timed("dispatch", api.execute_command, ["echo hello", "pwd", "whoami", "date"], **quick),
+        # Per-request cost of /api/welcome: building and serializing a dict
+        # (the previous behaviour) vs. splicing into the pre-serialized payload
+        "welcome_dict": lambda: run_timed("welcome_dict", lambda _: json.dumps(api.get_welcome_info()).encode(), [None], **quick),
+        "welcome_cached": lambda: run_timed("welcome_cached", lambda _: api.get_welcome_json(), [None], **quick),
+        "ls": lambda: run_timed("ls", builtin, [["ls", tree_root]], **quick),
+        "find": lambda: run_timed("find", builtin, [["find", "file1"]], **walk),
+        "grep": lambda: run_timed("grep", builtin, [["grep", "needle", "*.py"]], **walk),
+        "du": lambda: run_timed("du", builtin, [["du", tree_root]], **walk),
+        "external": lambda: run_timed("external", api._execute_external, ["echo hello"], **walk),
+    }
+
+    results = []
+    for name, case in cases.items():
+        if args.only and name not in args.only:
+            continue
+        result = case()
+        print_result(result)
+        results.append(result)
+    return results
+
+
+def bench_http(tree_root, args):
+    """Drive /api/execute on a local server from concurrent client threads."""
+    import run_local_server
+
+    run_local_server.api_instance.current_path = tree_root
+    run_local_server.CustomHandler.log_message = lambda *a, **k: None
+
+    server = socketserver.TCPServer(("127.0.0.1", 0), run_local_server.CustomHandler)
+    port = server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    body = json.dumps({"command": "echo hello"})
+    headers = {"Content-Type": "application/json"}
+    deadline = time.perf_counter() + args.min_time
+    per_client = max(1, args.max_ops // args.concurrency)
+
+    def client(_):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        latencies, errors = [], 0
+        for _ in range(per_client):
+            t0 = time.perf_counter()
+            try:
+                conn.request("POST", "/api/execute", body, headers)
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    errors += 1
+            except (OSError, http.client.HTTPException):
+                errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            latencies.append(time.perf_counter() - t0)
+            if time.perf_counter() >= deadline:
+                break
+        conn.close()
+        return latencies, errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        outcomes = list(pool.map(client, range(args.concurrency)))
+    wall_time = time.perf_counter() - start
+
+    server.shutdown()
+    server.server_close()
+
+    latencies = [lat for lats, _ in outcomes for lat in lats]
+    errors = sum(err for _, err in outcomes)
+    result = summarize("http_execute", latencies, wall_time,
+                       extra={"concurrency": args.concurrency, "errors": errors})
+    print_result(result)
+    return [result]
+
+
+STARTUP_SCRIPT = """
+import time
+t0 = time.perf_counter()
+import api.terminal as terminal
+t1 = time.perf_counter()
+# Older trees created a module-level instance at import time
+api = getattr(terminal, 'get_terminal_api', lambda: terminal.terminal_api)()
+api.get_welcome_info()
+api.execute_command('pwd')
+print(t1 - t0, time.perf_counter() - t1)
+"""
+
+
+def bench_startup(args):
+    """Measure cold import time and first-request latency in fresh interpreters."""
+    env = dict(os.environ)
+    import_times, first_request_times = [], []
+    start = time.perf_counter()
+    for _ in range(args.startup_runs):
+        out = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=ROOT_DIR, env=env,
+                             capture_output=True, text=True, check=True).stdout.split()
+        import_times.append(float(out[0]))
+        first_request_times.append(float(out[1]))
+    wall_time = time.perf_counter() - start
+
+    # One -X importtime run to show which imports dominate
+    importtime = subprocess.run([sys.executable, "-X", "importtime", "-c", "import api.terminal"],
+                                cwd=ROOT_DIR, env=env, capture_output=True, text=True).stderr
+    modules = []
+    for line in importtime.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[0].split(":")[-1].strip().isdigit():
+            modules.append((int(parts[0].split(":")[-1]), int(parts[1]), parts[2].strip()))
+    total_us = next((cumulative for _, cumulative, name in modules if name == "api.terminal"), 0)
+    top_imports = [{"module": name, "self_us": self_us}
+                   for self_us, _, name in sorted(modules, reverse=True)[:5]]
+
+    results = [
+        summarize("startup_import", import_times, wall_time,
+                  extra={"importtime_total_us": total_us, "top_imports": top_imports}),
+        summarize("first_request", first_request_times, wall_time),
+    ]
+    for result in results:
+        print_result(result)
+    return results
+
+
+def print_result(result):
+    print(f"  {result['name']:<14} {result['ops_per_sec']:>12,.1f} ops/s"
+          f"  p50 {result['p50_ms']:>9.3f} ms  p99 {result['p99_ms']:>9.3f} ms  ({result['ops']} ops)")
+
+
+def compare(results, baseline_path):
+    """Print the ops/sec ratio of this run against a previous JSON run."""
+    with open(baseline_path) as f:
+        baseline = {r["name"]: r for r in json.load(f)["results"]}
+
+    print(f"\n📊 Comparison with {baseline_path}")
+    for result in results:
+        old = baseline.get(result["name"])
+        if not old or not old["ops_per_sec"]:
+            continue
+        ratio = result["ops_per_sec"] / old["ops_per_sec"]
+        print(f"  {result['name']:<14} {old['ops_per_sec']:>12,.1f} -> {result['ops_per_sec']:>12,.1f} ops/s  ({ratio:.2f}x)"
+              f"  p99 {old['p99_ms']:.3f} -> {result['p99_ms']:.3f} ms")
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CodeMate Terminal hot paths")
+    parser.add_argument("--files", type=int, default=2000, help="files in the generated tree (default: 2000)")
+    parser.add_argument("--fanout", type=int, default=8, help="subdirectories per generated directory")
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds to run each benchmark")
+    parser.add_argument("--max-ops", type=int, default=20000, help="maximum operations per benchmark")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent HTTP clients")
+    parser.add_argument("--only", type=lambda s: set(s.split(",")), default=None,
+                        help="comma-separated benchmarks to run (startup,nl_hit,nl_miss,dispatch,welcome_dict,welcome_cached,ls,find,grep,du,external,http)")
+    parser.add_argument("--startup-runs", type=int, default=10, help="fresh interpreters for the startup benchmark")
+    parser.add_argument("--json", dest="json_path", help="write results to this JSON file")
+    parser.add_argument("--compare", help="compare against a previous JSON results file")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="codemate_bench_")
+    # Keep benchmark history out of the user's real history directory
+    os.environ["CODEMATE_HISTORY_DIR"] = os.path.join(work_dir, "history")
+
+    from api.terminal import TerminalAPI
+
+    print("⏱️  CodeMate Terminal Benchmarks")
+    print("=" * 60)
+    try:
+        tree_root = os.path.join(work_dir, "tree")
+        os.makedirs(tree_root)
+        t0 = time.perf_counter()
+        generate_tree(tree_root, args.files, args.fanout)
+        print(f"Generated {args.files} files in {time.perf_counter() - t0:.2f}s under {tree_root}\n")
+
+        results = []
+        if not args.only or "startup" in args.only:
+            results += bench_startup(args)
+        results += bench_api(TerminalAPI(), tree_root, args)
+        if not args.only or "http" in args.only:
+            results += bench_http(tree_root, args)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": f"{platform.system()} {platform.release()}",
+        "cpu_count": os.cpu_count(),
+        "params": {"files": args.files, "fanout": args.fanout, "min_time": args.min_time,
+                   "max_ops": args.max_ops, "concurrency": args.concurrency},
+        "results": results,
+    }
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Results written to {args.json_path}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+HTTP load generator for CodeMate Terminal Web Edition
+
+Replays a weighted mix of /api/execute, /api/translate, /api/welcome and
+static requests from many concurrent virtual users, ramping through several
+concurrency stages, and reports throughput, error rate and latency
+percentiles per stage. Standard library only (asyncio).
+
+Usage:
+    python load_test.py --start-server
+    python load_test.py --url http://localhost:3000 --users 50,100,250,500 --stage-duration 15
+    python load_test.py --start-server --mix execute=80,static=20 --json load.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_MIX = "execute=60,translate=15,welcome=10,static=15"
+
+EXECUTE_COMMANDS = ["pwd", "echo hello", "whoami", "date", "ls", "help", "history 5"]
+TRANSLATE_TEXTS = [
+    "create a folder called test",
+    "show me my files",
+    "what is my memory usage",
+    "find files called readme",
+    "tell me about my system",
+]
+
+
+def build_request(kind, host):
+    """Return (label, raw HTTP request bytes) for one request of the given kind."""
+    if kind == "execute":
+        method, path = "POST", "/api/execute"
+        body = json.dumps({"command": random.choice(EXECUTE_COMMANDS)}).encode()
+    elif kind == "translate":
+        method, path = "POST", "/api/translate"
+        body = json.dumps({"text": random.choice(TRANSLATE_TEXTS)}).encode()
+    elif kind == "welcome":
+        method, path, body = "GET", "/api/welcome", b""
+    elif kind == "static":
+        method, path, body = "GET", "/index.html", b""
+    else:
+        raise ValueError(f"Unknown request kind: {kind}")
+
+    head = f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n"
+    if body:
+        head += f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+    return kind, (head + "\r\n").encode() + body
+
+
+async def read_response(reader):
+    """Read one HTTP response; return (status, keep_alive)."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed")
+    version, status = status_line.split(b" ", 2)[:2]
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip().lower()
+
+    connection = headers.get("connection", "")
+    keep_alive = (version == b"HTTP/1.1" and connection != "close") or connection == "keep-alive"
+
+    if "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    elif headers.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        # Body is delimited by connection close (HTTP/1.0 servers)
+        await reader.read()
+        keep_alive = False
+
+    return int(status), keep_alive
+
+
+class Stats:
+    """Latency samples and error counts for one stage."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.statuses = {}
+
+    def record(self, kind, latency, status=None, error=None):
+        self.latencies.setdefault(kind, []).append(latency)
+        if error or (status and status >= 400):
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+        key = str(status) if status else type(error).__name__
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+
+
+async def virtual_user(host, port, kinds, weights, stats, stop_at, think_time, timeout):
+    """Issue requests back to back until stop_at, reusing the connection when allowed."""
+    reader = writer = None
+    while time.perf_counter() < stop_at:
+        kind, payload = build_request(random.choices(kinds, weights)[0], host)
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+            writer.write(payload)
+            await writer.drain()
+            status, keep_alive = await asyncio.wait_for(read_response(reader), timeout)
+            stats.record(kind, time.perf_counter() - start, status=status)
+            if not keep_alive:
+                writer.close()
+                reader = writer = None
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError) as e:
+            stats.record(kind, time.perf_counter() - start, error=e)
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+        if think_time:
+            await asyncio.sleep(random.uniform(0, 2 * think_time))
+    if writer is not None:
+        writer.close()
+
+
+def percentile(samples, percent):
+    if not samples:
+        return 0.0
+    index = max(0, min(len(samples) - 1, int(round(percent / 100.0 * len(samples) + 0.5)) - 1))
+    return samples[index]
+
+
+def summarize(users, duration, stats):
+    """Turn a stage's raw samples into a report dict."""
+    all_latencies = sorted(lat for lats in stats.latencies.values() for lat in lats)
+    total = len(all_latencies)
+    errors = sum(stats.errors.values())
+
+    def latency_summary(samples):
+        samples = sorted(samples)
+        return {
+            "p50_ms": round(percentile(samples, 50) * 1000, 2),
+            "p90_ms": round(percentile(samples, 90) * 1000, 2),
+            "p99_ms": round(percentile(samples, 99) * 1000, 2),
+            "max_ms": round(samples[-1] * 1000, 2) if samples else 0.0,
+        }
+
+    return {
+        "users": users,
+        "duration_s": round(duration, 2),
+        "requests": total,
+        "throughput_rps": round(total / duration, 2) if duration else 0.0,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "statuses": stats.statuses,
+        **latency_summary(all_latencies),
+        "endpoints": {
+            kind: {"requests": len(lats), "errors": stats.errors.get(kind, 0), **latency_summary(lats)}
+            for kind, lats in sorted(stats.latencies.items())
+        },
+    }
+
+
+async def run_stage(host, port, users, duration, mix, think_time, timeout):
+    kinds, weights = zip(*mix.items())
+    stats = Stats()
+    start = time.perf_counter()
+    stop_at = start + duration
+    await asyncio.gather(*(
+        virtual_user(host, port, kinds, weights, stats, stop_at, think_time, timeout)
+        for _ in range(users)
+    ))
+    return summarize(users, time.perf_counter() - start, stats)
+
+
+def parse_mix(value):
+    mix = {}
+    for item in value.split(","):
+        kind, _, weight = item.partition("=")
+        mix[kind.strip()] = float(weight or 1)
+    unknown = set(mix) - {"execute", "translate", "welcome", "static"}
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown request kinds: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, server_args):
+    """Launch run_local_server.py and wait until it accepts connections."""
+    # Keep load-test commands out of the user's real command history
+    env = dict(os.environ, CODEMATE_HISTORY_DIR=os.path.join(tempfile.gettempdir(), "codemate_load_history"))
+    process = subprocess.Popen(
+        [sys.executable, "run_local_server.py", "--port", str(port), "--no-browser", *server_args],
+        cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("server did not start within 15 seconds")
+
+
+def print_stage(report):
+    print(f"  {report['users']:>5} users  {report['throughput_rps']:>9.1f} req/s  "
+          f"errors {report['error_rate'] * 100:5.2f}%  p50 {report['p50_ms']:8.2f} ms  "
+          f"p90 {report['p90_ms']:8.2f} ms  p99 {report['p99_ms']:8.2f} ms  ({report['requests']} requests)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the CodeMate Terminal HTTP server")
+    parser.add_argument("--url", default="http://127.0.0.1:3000", help="server to target (default: http://127.0.0.1:3000)")
+    parser.add_argument("--start-server", action="store_true", help="start run_local_server.py on a free port for the run")
+    parser.add_argument("--server-args", default="", help="extra arguments passed to run_local_server.py")
+    parser.add_argument("--users", default="50,100,250,500", help="comma-separated concurrency stages")
+    parser.add_argument("--stage-duration", type=float, default=10.0, help="seconds per stage")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"request mix (default: {DEFAULT_MIX})")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause between a user's requests in seconds")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout in seconds")
+    parser.add_argument("--json", dest="json_path", help="write the report to this JSON file")
+    args = parser.parse_args()
+
+    server = None
+    if args.start_server:
+        port = free_port()
+        host = "127.0.0.1"
+        server = start_server(port, args.server_args.split())
+    else:
+        target = urlparse(args.url)
+        host, port = target.hostname, target.port or 80
+
+    stages = [int(users) for users in args.users.split(",")]
+    print("🔥 CodeMate Terminal Load Test")
+    print("=" * 60)
+    print(f"Target: http://{host}:{port}  mix: {args.mix}  stage: {args.stage_duration}s\n")
+
+    reports = []
+    try:
+        for users in stages:
+            report = asyncio.run(run_stage(host, port, users, args.stage_duration,
+                                           args.mix, args.think_time, args.timeout))
+            print_stage(report)
+            reports.append(report)
+    except KeyboardInterrupt:
+        print("\n🛑 Load test interrupted")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({
+                "timestamp": datetime.now().isoformat(),
+                "target": f"http://{host}:{port}",
+                "server_args": args.server_args,
+                "mix": args.mix,
+                "stage_duration_s": args.stage_duration,
+                "stages": reports,
+            }, f, indent=2)
+        print(f"\n💾 Report written to {args.json_path}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
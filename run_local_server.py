@@ -4,24 +4,37 @@ Simple local server for CodeMate Terminal Web Edition
 Runs the web terminal locally without requiring Vercel CLI
 """
 
+import argparse
+import errno
 import http.server
+import signal
+import socket
 import socketserver
+import subprocess
 import os
 import sys
+import threading
+import time
 import webbrowser
 import json
 from pathlib import Path
+from urllib.parse import urlparse, parse_qs
 
 # Add the current directory to Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 # Import the terminal API
-from api.terminal import TerminalAPI
+from api.terminal import TerminalAPI, client_disconnected, send_json_with_etag
+from transfer import UploadError, receive_chunk, send_download
+from outputstore import OutputError
+from metrics import metrics, RequestMetricsMixin
+from session_store import SessionStateStore
+import offload
 
 # Create a global API instance
 api_instance = TerminalAPI()
 
-class CustomHandler(http.server.SimpleHTTPRequestHandler):
+class CustomHandler(RequestMetricsMixin, http.server.SimpleHTTPRequestHandler):
     """Custom handler that serves static files and API endpoints."""
     
     def __init__(self, *args, **kwargs):
@@ -32,23 +45,71 @@ class CustomHandler(http.server.SimpleHTTPRequestHandler):
         if self.path.startswith('/api/'):
             # Handle API requests
             try:
-                if self.path == '/api/terminal':
+                parsed = urlparse(self.path)
+                query = parse_qs(parsed.query)
+                
+                if parsed.path == '/api/welcome':
+                    body, etag = api_instance.get_welcome_json()
+                    send_json_with_etag(self, body, etag)
+                    return
+                
+                if parsed.path == '/api/metrics/prom':
+                    body = metrics.to_prometheus().encode()
+                    self.send_response(200)
+                    self.send_header('Content-type', 'text/plain; version=0.0.4; charset=utf-8')
+                    self.send_header('Access-Control-Allow-Origin', '*')
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                
+                if parsed.path == '/api/download':
+                    path = api_instance.resolve_request_path(query.get('path', [''])[0])
+                    send_download(self, path, query.get('format', [None])[0])
+                    return
+                
+                if parsed.path == '/api/terminal':
                     response = {"status": "running", "version": "2.0", "type": "web"}
-                elif self.path == '/api/welcome':
-                    response = api_instance.get_welcome_info()
-                elif self.path == '/api/help':
+                elif parsed.path == '/api/help':
                     response = {"help": "Use /api/execute with POST to run commands"}
+                elif parsed.path == '/api/stats':
+                    response = metrics.snapshot()
+                elif parsed.path == '/api/fs/changes':
+                    response = api_instance.fs_changes(query.get('since', ['0'])[0])
+                elif parsed.path == '/api/jobs':
+                    response = {"jobs": api_instance.jobs.list()}
+                elif parsed.path.startswith('/api/jobs/'):
+                    response = api_instance.jobs.get(parsed.path[len('/api/jobs/'):]) or {"error": "Unknown job"}
+                elif parsed.path.startswith('/api/upload/'):
+                    try:
+                        response = api_instance.uploads.status(parsed.path[len('/api/upload/'):])
+                    except UploadError as e:
+                        response = {"error": str(e)}
+                elif parsed.path.startswith('/api/output/'):
+                    try:
+                        response = api_instance.read_output(parsed.path[len('/api/output/'):], query.get('offset', ['0'])[0],
+                                                            query.get('limit', [None])[0])
+                    except OutputError as e:
+                        response = {"error": str(e)}
+                elif parsed.path == '/api/complete':
+                    response = {"completions": api_instance.complete(query.get('text', [''])[0],
+                                                                     query.get('limit', ['50'])[0])}
+                elif parsed.path == '/api/trash':
+                    response = {"retention_s": api_instance.trash.retention, "entries": api_instance.trash.entries()}
+                elif parsed.path == '/api/history':
+                    response = {"entries": api_instance.search_history(query.get('q', [''])[0], query.get('limit', ['20'])[0])}
                 else:
                     response = {"error": "Unknown endpoint"}
                 
+                body = json.dumps(response).encode()
                 self.send_response(200)
                 self.send_header('Content-type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
                 self.send_header('Access-Control-Allow-Origin', '*')
                 self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-                self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+                self.send_header('Access-Control-Allow-Headers', 'Content-Type, X-CodeMate-Profile')
                 self.end_headers()
                 
-                self.wfile.write(json.dumps(response).encode())
+                self.wfile.write(body)
                 
             except Exception as e:
                 self.send_error(500, f"API Error: {e}")
@@ -66,37 +127,250 @@ class CustomHandler(http.server.SimpleHTTPRequestHandler):
                 content_length = int(self.headers.get('Content-Length', 0))
                 post_data = self.rfile.read(content_length)
                 
-                if self.path == '/api/execute':
+                parsed = urlparse(self.path)
+                
+                if parsed.path == '/api/execute':
                     data = json.loads(post_data.decode())
-                    response = api_instance.execute_command(data.get('command', ''))
+                    # Opt-in profiling via header, query string or request body
+                    profile = (self.headers.get('X-CodeMate-Profile')
+                               or parse_qs(parsed.query).get('profile', [None])[0]
+                               or data.get('profile'))
+                    disconnected = lambda: client_disconnected(self)
+                    if 'commands' in data:
+                        # Commands the UI queued while its previous request was running
+                        response = {"results": api_instance.execute_batch(data['commands'], profile, disconnected)}
+                    else:
+                        response = api_instance.execute_command(data.get('command', ''), data.get('natural_language', False),
+                                                                profile, data.get('request_id'), disconnected)
+                        response["current_path"] = api_instance.current_path
+                elif parsed.path == '/api/cancel':
+                    data = json.loads(post_data.decode())
+                    response = {"cancelled": api_instance.cancel(data.get('request_ids') or [data.get('request_id')])}
+                elif parsed.path == '/api/upload':
+                    try:
+                        response = api_instance.start_upload(json.loads(post_data.decode()))
+                    except UploadError as e:
+                        response = {"error": str(e)}
+                elif parsed.path == '/api/translate':
+                    data = json.loads(post_data.decode())
+                    text = data.get('text', '')
+                    steps = api_instance.plan_natural_language(text)
+                    response = {"original": text, "plan": steps,
+                                "translated": ' && '.join(step["command"] for step in steps) if steps else None}
                 else:
                     response = {"error": "Unknown endpoint"}
                 
+                body = json.dumps(response).encode()
                 self.send_response(200)
                 self.send_header('Content-type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
                 self.send_header('Access-Control-Allow-Origin', '*')
                 self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-                self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+                self.send_header('Access-Control-Allow-Headers', 'Content-Type, X-CodeMate-Profile')
                 self.end_headers()
                 
-                self.wfile.write(json.dumps(response).encode())
+                self.wfile.write(body)
                 
             except Exception as e:
                 self.send_error(500, f"API Error: {e}")
         else:
             self.send_error(404, "Not Found")
     
+    def do_PUT(self):
+        """Handle PUT requests (upload chunks, streamed to disk)."""
+        parsed = urlparse(self.path)
+        if parsed.path.startswith('/api/upload/'):
+            offset = parse_qs(parsed.query).get('offset', [''])[0]
+            receive_chunk(self, api_instance.uploads, parsed.path[len('/api/upload/'):], offset)
+        else:
+            self.send_error(404, "Not Found")
+    
     def do_OPTIONS(self):
         """Handle OPTIONS requests for CORS."""
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, X-CodeMate-Profile, X-Chunk-SHA256')
+        self.send_header('Content-Length', '0')
         self.end_headers()
 
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="CodeMate Terminal Web Edition - Local Server")
+    parser.add_argument('--host', default='', help="interface to bind (default: all)")
+    parser.add_argument('--port', type=int, default=3000, help="port to listen on (default: 3000)")
+    parser.add_argument('--no-browser', action='store_true', help="do not open a browser window")
+    parser.add_argument('--threads', action='store_true', help="handle each request in its own thread")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="pre-fork N worker processes sharing one listening socket (POSIX only)")
+    # Internal: set by the pre-fork master when it launches a worker
+    parser.add_argument('--worker-fd', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--session-id', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+class ThreadingServer(socketserver.ThreadingTCPServer):
+    """One thread per connection; idle keep-alive connections do not block shutdown."""
+    daemon_threads = True
+
+def enable_keep_alive():
+    """Serve HTTP/1.1 so the UI's requests reuse one connection.
+    
+    Only with --threads: a single-threaded server would sit on an idle
+    keep-alive connection while the browser's other connections wait.
+    """
+    CustomHandler.protocol_version = 'HTTP/1.1'
+    # Idle connections are closed after this many seconds
+    CustomHandler.timeout = 30
+
+class PreforkMaster:
+    """Supervises worker processes that accept() on one inherited listening socket.
+    
+    Workers are fresh interpreters (so a reload picks up code changes) and
+    share session state through SessionStateStore. SIGHUP starts a new
+    generation of workers and gracefully retires the old one; workers that
+    crash are restarted with backoff; SIGTERM/SIGINT stop everything.
+    """
+    
+    MIN_UPTIME = 2.0       # workers dying sooner than this count as crash-looping
+    SHUTDOWN_GRACE = 30.0  # seconds retiring workers get to finish in-flight requests
+    
+    def __init__(self, args, listen_socket: socket.socket, session_id: str):
+        self.args = args
+        self.listen_socket = listen_socket
+        self.session_id = session_id
+        self.workers = []   # (process, started_at)
+        self.retiring = []  # (process, deadline)
+        self.stopping = False
+        self.reload_requested = False
+        self.backoff = 0.5
+    
+    def spawn(self) -> subprocess.Popen:
+        fd = self.listen_socket.fileno()
+        command = [sys.executable, os.path.abspath(__file__),
+                   '--worker-fd', str(fd), '--session-id', self.session_id]
+        if self.args.threads:
+            command.append('--threads')
+        # Split the CPUs between the workers' grep/find/du process pools
+        env = dict(os.environ)
+        env.setdefault('CODEMATE_OFFLOAD_WORKERS', str(max(1, (os.cpu_count() or 1) // self.args.workers)))
+        return subprocess.Popen(command, pass_fds=(fd,), env=env)
+    
+    def retire(self, process: subprocess.Popen):
+        if process.poll() is None:
+            process.terminate()
+            self.retiring.append((process, time.time() + self.SHUTDOWN_GRACE))
+    
+    def reload(self):
+        print("🔄 Reloading workers...")
+        old_workers = self.workers
+        self.workers = [(self.spawn(), time.time()) for _ in range(self.args.workers)]
+        for process, _ in old_workers:
+            self.retire(process)
+    
+    def supervise(self):
+        """Restart crashed workers and reap retired ones."""
+        for index, (process, started_at) in enumerate(self.workers):
+            if process.poll() is None:
+                continue
+            print(f"⚠️  Worker {process.pid} exited with code {process.returncode}, restarting")
+            if time.time() - started_at < self.MIN_UPTIME:
+                time.sleep(self.backoff)
+                self.backoff = min(self.backoff * 2, 30.0)
+            else:
+                self.backoff = 0.5
+            self.workers[index] = (self.spawn(), time.time())
+        
+        still_retiring = []
+        for process, deadline in self.retiring:
+            if process.poll() is None:
+                if time.time() > deadline:
+                    process.kill()
+                still_retiring.append((process, deadline))
+        self.retiring = still_retiring
+    
+    def run(self):
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, 'reload_requested', True))
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, 'stopping', True))
+        signal.signal(signal.SIGINT, lambda *_: setattr(self, 'stopping', True))
+        
+        self.workers = [(self.spawn(), time.time()) for _ in range(self.args.workers)]
+        print(f"👷 Started {self.args.workers} workers (pids: {', '.join(str(p.pid) for p, _ in self.workers)})")
+        print(f"   Send SIGHUP to {os.getpid()} for a graceful reload")
+        
+        while not self.stopping:
+            if self.reload_requested:
+                self.reload_requested = False
+                self.reload()
+            self.supervise()
+            time.sleep(0.2)
+        
+        for process, _ in self.workers:
+            self.retire(process)
+        self.workers = []
+        while self.retiring:
+            self.supervise()
+            time.sleep(0.1)
+        self.listen_socket.close()
+
+def run_worker(args):
+    """Serve requests on a listening socket inherited from the pre-fork master."""
+    global api_instance
+    api_instance = TerminalAPI(session_id=args.session_id,
+                               state_store=SessionStateStore(args.session_id))
+    
+    listen_socket = socket.socket(fileno=args.worker_fd)
+    server_class = ThreadingServer if args.threads else socketserver.TCPServer
+    if args.threads:
+        enable_keep_alive()
+    httpd = server_class(listen_socket.getsockname(), CustomHandler, bind_and_activate=False)
+    httpd.socket.close()
+    httpd.socket = listen_socket
+    
+    # shutdown() blocks until serve_forever() returns, so call it off-thread;
+    # the in-flight request finishes before the worker exits
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=httpd.shutdown, daemon=True).start())
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    
+    offload.warm_pool()
+    try:
+        httpd.serve_forever()
+    finally:
+        httpd.server_close()
+        offload.shutdown_pool()
+    return 0
+
+def print_startup_info(args):
+    """Print the startup banner and optionally open the browser."""
+    PORT = args.port
+    print(f"✅ Server running at http://localhost:{PORT}")
+    
+    # Open browser automatically
+    if not args.no_browser:
+        print("🌐 Opening browser...")
+        try:
+            webbrowser.open(f'http://localhost:{PORT}')
+        except:
+            print("⚠️  Could not open browser automatically")
+            print(f"   Please open http://localhost:{PORT} manually")
+    
+    print("\n📋 Features available:")
+    print("  ✅ Permission request screen")
+    print("  ✅ CodeMate ASCII banner")
+    print("  ✅ System information display")
+    print("  ✅ AI natural language processing")
+    print("  ✅ Full terminal emulation")
+    print("  ✅ Command shortcuts and status bar")
+    
+    print("\n🛑 Press Ctrl+C to stop the server")
+    print("=" * 60)
+
 def main():
     """Start the local server."""
-    PORT = 3000
+    args = parse_args()
+    if args.worker_fd is not None:
+        return run_worker(args)
+    
+    PORT = args.port
     
     print("🚀 CodeMate Terminal Web Edition - Local Server")
     print("=" * 60)
@@ -111,45 +385,56 @@ def main():
         print("❌ Error: public/index.html not found")
         return 1
     
+    if args.workers > 1 and os.name != 'posix':
+        print("⚠️  Pre-fork mode needs a POSIX system; falling back to a single process")
+        args.workers = 1
+    
     try:
-        with socketserver.TCPServer(("", PORT), CustomHandler) as httpd:
-            print(f"✅ Server running at http://localhost:{PORT}")
-            print("🌐 Opening browser...")
-            
-            # Open browser automatically
-            try:
-                webbrowser.open(f'http://localhost:{PORT}')
-            except:
-                print("⚠️  Could not open browser automatically")
-                print(f"   Please open http://localhost:{PORT} manually")
-            
-            print("\n📋 Features available:")
-            print("  ✅ Permission request screen")
-            print("  ✅ CodeMate ASCII banner")
-            print("  ✅ System information display")
-            print("  ✅ AI natural language processing")
-            print("  ✅ Full terminal emulation")
-            print("  ✅ Command shortcuts and status bar")
-            
-            print("\n🛑 Press Ctrl+C to stop the server")
-            print("=" * 60)
+        if args.workers > 1:
+            listen_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            listen_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            listen_socket.bind((args.host, PORT))
+            listen_socket.listen(1024)
+            listen_socket.set_inheritable(True)
             
+            print_startup_info(args)
+            # The master sweeps for all workers; it forks none of its own
+            api_instance.start_trash_sweep()
+            session_id = f"session_{int(time.time())}"
+            PreforkMaster(args, listen_socket, session_id).run()
+            print("\n🛑 Server stopped")
+            return 0
+        
+        # Stop cleanly on SIGTERM too, so the offload pool is shut down
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        
+        server_class = ThreadingServer if args.threads else socketserver.TCPServer
+        if args.threads:
+            enable_keep_alive()
+        with server_class((args.host, PORT), CustomHandler) as httpd:
+            print_startup_info(args)
+            pool_size = offload.warm_pool()
+            if pool_size:
+                print(f"⚙️  grep/find/du/whereis offloaded to {pool_size} worker processes")
+            api_instance.start_trash_sweep()
             httpd.serve_forever()
             
     except KeyboardInterrupt:
         print("\n🛑 Server stopped by user")
         return 0
     except OSError as e:
-        if e.errno == 10048:  # Port already in use
+        if e.errno in (errno.EADDRINUSE, 10048):  # Port already in use
             print(f"❌ Error: Port {PORT} is already in use")
             print("   Please close other applications using this port")
-            print("   Or run: netstat -ano | findstr :3000")
+            print(f"   Or run: netstat -ano | findstr :{PORT}")
         else:
             print(f"❌ Error starting server: {e}")
         return 1
     except Exception as e:
         print(f"❌ Unexpected error: {e}")
         return 1
+    finally:
+        offload.shutdown_pool()
 
 if __name__ == "__main__":
-    sys.exit(main())
\ No newline at end of file
+    sys.exit(main())
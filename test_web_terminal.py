@@ -188,6 +188,25 @@ def test_web_terminal():
     except Exception as e:
         print(f"   ❌ Connection error: {e}")
     
+    # Test 11: Instrumentation endpoints
+    print("\n11. Testing stats and metrics endpoints...")
+    try:
+        response = requests.get(f"{base_url}/api/stats")
+        if response.status_code == 200:
+            data = response.json()
+            stats = data.get('stats', data)
+            print(f"   ✅ Stats loaded: {len(stats['requests'])} endpoints, {len(stats['commands'])} commands")
+        else:
+            print(f"   ❌ Error: {response.status_code}")
+        
+        response = requests.get(f"{base_url}/api/metrics/prom")
+        if response.status_code == 200 and "codemate_request_duration_seconds" in response.text:
+            print("   ✅ Prometheus metrics exposed")
+        else:
+            print(f"   ❌ Error: {response.status_code}")
+    except Exception as e:
+        print(f"   ❌ Connection error: {e}")
+    
     print("\n" + "=" * 60)
     print("🎉 Web terminal testing completed!")
 
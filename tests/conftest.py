@@ -0,0 +1,48 @@
+"""
+Unit tests for the modules in api/, run without a server:
+
+    python -m pytest tests
+
+(test_connection.py and test_web_terminal.py at the top level are smoke
+checks against a running server.)
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+
+
+@pytest.fixture(scope='session', autouse=True)
+def isolated_state():
+    """Keep history, session state and trash of the code under test out of the user's."""
+    root = tempfile.mkdtemp(prefix='codemate-tests-')
+    settings = {
+        'CODEMATE_STATE_DIR': os.path.join(root, 'state'),
+        'CODEMATE_HISTORY_DIR': os.path.join(root, 'history'),
+        'CODEMATE_TRASH_DIR': os.path.join(root, 'trash'),
+        # Scans run inline; the process pool has its own benchmarks
+        'CODEMATE_OFFLOAD_WORKERS': '0',
+    }
+    saved = {name: os.environ.get(name) for name in settings}
+    os.environ.update(settings)
+    yield root
+    for name, value in saved.items():
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+    shutil.rmtree(root, ignore_errors=True)
+
+
+@pytest.fixture
+def api(tmp_path):
+    """A TerminalAPI whose working directory is tmp_path."""
+    import terminal
+    terminal_api = terminal.TerminalAPI()
+    terminal_api.current_path = str(tmp_path)
+    return terminal_api
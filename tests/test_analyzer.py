@@ -0,0 +1,127 @@
+import ast
+import textwrap
+
+import pytest
+
+import analyzer
+
+
+def kinds(source, category=None):
+    result = analyzer.analyze_source(textwrap.dedent(source))
+    return [(f["line"], f["kind"]) for f in result["findings"] if category in (None, f["category"])]
+
+
+def test_complexity_counts_decision_points():
+    tree = ast.parse(textwrap.dedent("""
+        def f(x, items):
+            if x and items:
+                return [i for i in items if i]
+            for i in items:
+                while i:
+                    i -= 1
+            return x or 0
+    """))
+    # 1 + if + and + comprehension + its if + for + while + or
+    assert analyzer.cyclomatic_complexity(tree.body[0]) == 8
+
+
+def test_review_findings():
+    assert kinds("""
+        import os
+        import sys
+
+        def f():
+            unused = 1
+            _ignored = 2
+            used = 3
+            return used + len(sys.argv)
+    """, 'review') == [(2, 'unused-import'), (6, 'unused-variable')]
+
+
+def test_debug_findings():
+    assert kinds("""
+        def f(a=[], b=None):
+            try:
+                if a == None or b is 1:
+                    return {'k': 1, 'k': 2}
+                    print("never")
+            except:
+                pass
+    """, 'debug') == [(2, 'mutable-default'), (4, 'is-literal'), (4, 'none-comparison'),
+                      (5, 'duplicate-key'), (6, 'unreachable'), (7, 'bare-except')]
+
+
+def test_optimize_findings():
+    assert kinds("""
+        def f(items, names):
+            text = ''
+            for i in range(len(items)):
+                text += 'x'
+                for a in items:
+                    for b in items:
+                        if b in ['a', 'b', 'c', 'd']:
+                            pass
+            return sorted(names)[0]
+    """, 'optimize') == [(4, 'range-len'), (5, 'string-concat'), (7, 'nested-loops'),
+                         (8, 'list-membership'), (10, 'sorted-index')]
+
+
+def test_clean_code_has_no_findings():
+    assert kinds("""
+        def add(a, b):
+            return a + b
+    """) == []
+
+
+def test_a_syntax_error_is_one_finding():
+    result = analyzer.analyze_source("def broken(:\n    pass\n")
+    assert [(f["category"], f["kind"], f["line"]) for f in result["findings"]] == [('debug', 'syntax-error', 1)]
+
+
+@pytest.fixture
+def project(tmp_path):
+    (tmp_path / 'good.py').write_text("def f(a=[]):\n    return a\n")
+    (tmp_path / 'bad.py').write_text("def broken(:\n")
+    (tmp_path / '.venv').mkdir()
+    (tmp_path / '.venv' / 'skipped.py').write_text("")
+    (tmp_path / 'pkg').mkdir()
+    (tmp_path / 'pkg' / '__init__.py').write_text("from os import path\n")
+    return tmp_path
+
+
+def test_python_files_skip_hidden_and_virtualenv_directories(project):
+    assert analyzer.python_files(str(project)) == [
+        str(project / 'bad.py'), str(project / 'good.py'), str(project / 'pkg' / '__init__.py')]
+
+
+def test_results_are_cached_until_the_file_changes(project):
+    cache = analyzer.AnalysisCache()
+    files = analyzer.python_files(str(project))
+    first, cached = cache.analyze(files)
+    assert cached == 0
+    again, cached = cache.analyze(files)
+    assert cached == 3 and again == first
+
+    (project / 'good.py').write_text("def f(a=None):\n    return a\n\n")
+    results, cached = cache.analyze(files)
+    assert cached == 2
+    assert results[str(project / 'good.py')]["findings"] == []
+
+
+def test_unparseable_files_are_reported_in_every_category(project):
+    cache = analyzer.AnalysisCache()
+    results, _ = cache.analyze(analyzer.python_files(str(project)))
+    assert [path for path, _ in analyzer.parse_failures(results)] == [str(project / 'bad.py')]
+    for category in analyzer.CATEGORIES:
+        report = analyzer.format_report(category, results, str(project), 0, 0.0)
+        assert 'Could not parse:\n  bad.py:1' in report
+        assert '1 files could not be parsed' in report
+    assert 'mutable-default' in analyzer.format_report('debug', results, str(project), 0, 0.0)
+
+
+def test_codemate_debug_fails_when_a_file_does_not_parse(api, project):
+    result = api.execute_command('codemate debug .')
+    assert result["exit_code"] == 1
+    assert 'Could not parse' in result["output"]
+    (project / 'bad.py').unlink()
+    assert api.execute_command('codemate debug .')["exit_code"] == 0
@@ -0,0 +1,45 @@
+"""One TerminalAPI serves every handler thread of the threaded server."""
+
+import threading
+
+
+def run_on_another_thread(api, command):
+    results = []
+    thread = threading.Thread(target=lambda: results.append(api.execute_command(command)))
+    thread.start()
+    thread.join()
+    return results[0]
+
+
+def test_stored_output_belongs_to_the_request_that_made_it(api, tmp_path, monkeypatch):
+    (tmp_path / 'big.txt').write_text('line\n' * 20000)
+    others = []
+    truncation_note = api._truncation_note
+
+    def note_after_another_request(head, stored):
+        # cat has stored its output; a request on another thread runs meanwhile
+        others.append(run_on_another_thread(api, 'pwd'))
+        return truncation_note(head, stored)
+
+    monkeypatch.setattr(api, '_truncation_note', note_after_another_request)
+    result = api.execute_command('cat big.txt')
+    assert "truncated" in result
+    assert others and "truncated" not in others[0]
+
+
+def test_a_cancellation_is_reported_only_by_the_cancelled_request(api, monkeypatch):
+    others = []
+    seal = api.outputs.seal
+
+    def seal_after_another_request(*args, **kwargs):
+        # sleep has been killed; a request on another thread finishes meanwhile
+        others.append(run_on_another_thread(api, 'pwd'))
+        return seal(*args, **kwargs)
+
+    monkeypatch.setattr(api.outputs, 'seal', seal_after_another_request)
+    timer = threading.Timer(0.3, api.cancel, [['req-1']])
+    timer.start()
+    result = api.execute_command('sleep 10', request_id='req-1')
+    timer.join()
+    assert (result["exit_code"], result.get("cancelled")) == (130, True)
+    assert others and "cancelled" not in others[0]
@@ -0,0 +1,81 @@
+"""The destination rules of the cp and mv builtins."""
+
+import os
+
+import pytest
+
+import fileops
+
+
+@pytest.fixture
+def files(tmp_path):
+    (tmp_path / 'file.txt').write_text('data')
+    (tmp_path / 'dir').mkdir()
+    (tmp_path / 'tree' / 'inner').mkdir(parents=True)
+    (tmp_path / 'tree' / 'inner' / 'leaf.txt').write_text('leaf')
+    return tmp_path
+
+
+def run(api, command):
+    result = api.execute_command(command)
+    return result["exit_code"], result["output"]
+
+
+def test_resolve_target():
+    assert fileops.resolve_target('/a/file', '/b', True) == '/b/file'
+    assert fileops.resolve_target('/a/file', '/b/new', False) == '/b/new'
+
+
+@pytest.mark.parametrize('command', ['cp', 'mv'])
+def test_into_an_existing_directory(api, files, command):
+    assert run(api, f'{command} file.txt dir')[0] == 0
+    assert (files / 'dir' / 'file.txt').read_text() == 'data'
+    assert (files / 'file.txt').exists() == (command == 'cp')
+
+
+@pytest.mark.parametrize('command', ['cp', 'mv'])
+def test_to_a_new_name(api, files, command):
+    assert run(api, f'{command} file.txt renamed.txt')[0] == 0
+    assert (files / 'renamed.txt').read_text() == 'data'
+
+
+@pytest.mark.parametrize('command', ['cp', 'mv'])
+def test_a_file_to_a_missing_directory_with_a_slash_fails(api, files, command):
+    exit_code, output = run(api, f'{command} file.txt nodir/')
+    assert exit_code == 1 and 'Not a directory' in output
+    assert not os.path.lexists(files / 'nodir')
+    assert (files / 'file.txt').exists()
+
+
+def test_a_missing_parent_is_reported(api, files):
+    exit_code, output = run(api, 'mv file.txt nodir/sub/')
+    assert exit_code == 1 and 'No such file or directory' in output
+
+
+@pytest.mark.parametrize('command', ['cp -r', 'mv'])
+def test_a_directory_may_become_a_missing_directory_with_a_slash(api, files, command):
+    assert run(api, f'{command} tree newtree/')[0] == 0
+    assert (files / 'newtree' / 'inner' / 'leaf.txt').read_text() == 'leaf'
+
+
+@pytest.mark.parametrize('command', ['cp', 'mv'])
+def test_several_sources_need_a_directory(api, files, command):
+    (files / 'other.txt').write_text('other')
+    exit_code, output = run(api, f'{command} file.txt other.txt file.txt')
+    assert exit_code == 1 and 'is not a directory' in output
+
+
+def test_cp_needs_r_for_directories(api, files):
+    exit_code, output = run(api, 'cp tree copy')
+    assert exit_code == 1 and 'omitting directory' in output
+    assert not (files / 'copy').exists()
+
+
+def test_cp_refuses_to_copy_a_directory_into_itself(api, files):
+    exit_code, output = run(api, 'cp -r tree tree/inner')
+    assert exit_code == 1 and 'into itself' in output
+
+
+def test_cp_refuses_to_copy_a_file_onto_itself(api, files):
+    exit_code, output = run(api, 'cp file.txt .')
+    assert exit_code == 1 and 'are the same file' in output
@@ -0,0 +1,137 @@
+import pytest
+
+from fswatch import BaseWatcher, DirectoryCache, PollingWatcher
+
+
+class ManualWatcher(BaseWatcher):
+    """Reports only the changes a test announces."""
+
+    tracks_file_changes = True
+
+    def _add_root(self, root, recursive):
+        return True
+
+    def _remove_root(self, root, recursive):
+        pass
+
+    def change(self, path):
+        self._notify(path)
+
+
+@pytest.fixture
+def watcher():
+    return ManualWatcher()
+
+
+@pytest.fixture
+def polling():
+    # Polled by flush() only; the background thread sleeps through the test
+    watcher = PollingWatcher(interval=3600)
+    yield watcher
+    watcher.close()
+
+
+def cache_value(cache, kind, path, value, recursive=False):
+    token = cache.prepare(path, recursive)
+    cache.put(kind, path, value, token, recursive)
+    return token
+
+
+def test_a_change_drops_the_entries_of_that_directory(watcher, tmp_path):
+    cache = DirectoryCache(watcher)
+    cache_value(cache, 'ls', str(tmp_path), ['a'])
+    cache_value(cache, 'ls', str(tmp_path / 'sub'), ['b'])
+    assert cache.get('ls', str(tmp_path)) == ['a']
+    watcher.change(str(tmp_path))
+    assert cache.get('ls', str(tmp_path)) is None
+    assert cache.get('ls', str(tmp_path / 'sub')) == ['b']
+
+
+def test_recursive_entries_are_dropped_by_changes_below_them(watcher, tmp_path):
+    cache = DirectoryCache(watcher)
+    cache_value(cache, 'du', str(tmp_path), 1234, recursive=True)
+    cache_value(cache, 'ls', str(tmp_path), ['a'])
+    watcher.change(str(tmp_path / 'deep' / 'er'))
+    assert cache.get('du', str(tmp_path)) is None
+    assert cache.get('ls', str(tmp_path)) == ['a']
+
+
+def test_a_change_during_the_scan_is_not_cached(watcher, tmp_path):
+    cache = DirectoryCache(watcher)
+    token = cache.prepare(str(tmp_path), recursive=True)
+    watcher.change(str(tmp_path / 'sub'))
+    cache.put('du', str(tmp_path), 1, token, recursive=True)
+    assert cache.get('du', str(tmp_path)) is None
+
+
+def test_lost_events_drop_everything(watcher, tmp_path):
+    cache = DirectoryCache(watcher)
+    cache_value(cache, 'ls', str(tmp_path), ['a'])
+    token = cache.prepare(str(tmp_path / 'other'))
+    watcher.change(None)
+    cache.put('ls', str(tmp_path / 'other'), ['b'], token)
+    assert cache.get('ls', str(tmp_path)) is None
+    assert cache.get('ls', str(tmp_path / 'other')) is None
+    assert cache.changes_since(0)["reset"]
+
+
+def test_changes_are_logged_for_polling_clients(watcher, tmp_path):
+    cache = DirectoryCache(watcher, log_size=3)
+    for name in ('a', 'b', 'a'):
+        watcher.change(str(tmp_path / name))
+    assert cache.changes_since(0) == {"seq": 3, "changes": [str(tmp_path / 'a'), str(tmp_path / 'b')],
+                                      "reset": False}
+    assert cache.changes_since(2)["changes"] == [str(tmp_path / 'a')]
+    watcher.change(str(tmp_path / 'c'))
+    watcher.change(str(tmp_path / 'd'))
+    # The log no longer reaches back to the start
+    assert cache.changes_since(0)["reset"]
+    assert cache.version() == 5
+
+
+def test_least_recently_used_entries_are_evicted(watcher, tmp_path):
+    cache = DirectoryCache(watcher, max_entries=2)
+    for name in ('a', 'b', 'c'):
+        cache_value(cache, 'ls', str(tmp_path / name), name)
+    assert cache.get('ls', str(tmp_path / 'a')) is None
+    assert cache.get('ls', str(tmp_path / 'c')) == 'c'
+
+
+def test_polling_watcher_reports_new_and_removed_entries(polling, tmp_path):
+    changed = []
+    polling.subscribe(changed.append)
+    assert polling.watch(str(tmp_path))
+    (tmp_path / 'new.txt').write_text('')
+    polling.flush()
+    assert changed == [str(tmp_path)]
+    polling.flush()
+    assert changed == [str(tmp_path)]
+    (tmp_path / 'new.txt').unlink()
+    polling.flush()
+    assert changed == [str(tmp_path)] * 2
+
+
+def test_polling_watcher_follows_new_subdirectories_of_recursive_roots(polling, tmp_path):
+    changed = []
+    polling.subscribe(changed.append)
+    assert polling.watch(str(tmp_path), recursive=True)
+    (tmp_path / 'sub').mkdir()
+    polling.flush()
+    (tmp_path / 'sub' / 'file.txt').write_text('')
+    polling.flush()
+    assert changed == [str(tmp_path), str(tmp_path / 'sub')]
+
+
+def test_polling_watcher_cannot_watch_a_missing_directory(polling, tmp_path):
+    assert not polling.watch(str(tmp_path / 'missing'))
+
+
+def test_cache_over_the_polling_watcher(polling, tmp_path):
+    cache = DirectoryCache(polling)
+    cache_value(cache, 'ls', str(tmp_path), [])
+    assert cache.get('ls', str(tmp_path)) == []
+    (tmp_path / 'file.txt').write_text('')
+    # get() flushes, so the change is seen within the same request
+    assert cache.get('ls', str(tmp_path)) is None
+    # File writes do not change a directory's mtime, so du totals are not cached
+    assert cache.prepare(str(tmp_path), recursive=True) is None
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from history import CommandHistory
+
+
+def test_a_new_terminal_sees_commands_run_by_an_earlier_one(tmp_path, monkeypatch):
+    import terminal
+    monkeypatch.setenv('CODEMATE_HISTORY_DIR', str(tmp_path / 'history'))
+    before = terminal.TerminalAPI()
+    before.execute_command('echo first')
+    before.execute_command('pwd')
+
+    # As after a restart: a new session, and nothing in memory
+    after = terminal.TerminalAPI(session_id='session_restarted')
+    assert after.command_history.commands() == ['echo first', 'pwd']
+    assert [entry["command"] for entry in after.search_history('first')] == ['echo first']
+    assert 'echo first' in after.execute_command('history')["output"]
+
+
+@pytest.fixture
+def log_dir(tmp_path):
+    return str(tmp_path / 'history')
+
+
+def test_entries_are_appended_as_json_lines(log_dir):
+    history = CommandHistory('test', log_dir)
+    history.record('ls', 0, 0.0123)
+    history.record('cat missing', 1)
+    with open(history.path, encoding='utf-8') as f:
+        entries = [json.loads(line) for line in f]
+    assert [(entry["command"], entry["exit_code"]) for entry in entries] == [('ls', 0), ('cat missing', 1)]
+    assert entries[0]["duration_ms"] == 12.3
+
+
+def test_consecutive_duplicates_collapse_in_memory_but_not_on_disk(log_dir):
+    history = CommandHistory('test', log_dir)
+    for command in ['ls', 'ls', 'pwd', 'ls']:
+        history.record(command)
+    assert history.commands() == ['ls', 'pwd', 'ls']
+    with open(history.path, encoding='utf-8') as f:
+        assert len(f.readlines()) == 4
+    # ...and when the log is read back
+    assert CommandHistory('test', log_dir).commands() == ['ls', 'pwd', 'ls']
+
+
+def test_only_the_tail_is_kept_in_memory(log_dir):
+    history = CommandHistory('test', log_dir, tail_size=3)
+    for i in range(10):
+        history.record(f'echo {i}')
+    assert history.commands() == ['echo 7', 'echo 8', 'echo 9']
+    assert [entry["command"] for entry in history.recent(2)] == ['echo 8', 'echo 9']
+    assert CommandHistory('test', log_dir, tail_size=3).commands() == ['echo 7', 'echo 8', 'echo 9']
+
+
+def test_search_finds_each_command_once_newest_first(log_dir):
+    history = CommandHistory('test', log_dir)
+    for command in ['git status', 'ls', 'GIT log', 'git status']:
+        history.record(command)
+    assert [entry["command"] for entry in history.search('git')] == ['git status', 'GIT log']
+    assert [entry["command"] for entry in history.search('git', limit=1)] == ['git status']
+    assert history.search('nothing') == []
+
+
+def test_search_falls_back_to_the_log_beyond_the_tail(log_dir):
+    history = CommandHistory('test', log_dir, tail_size=3)
+    history.record('make deploy')
+    for i in range(5):
+        history.record(f'echo {i}')
+    assert 'make deploy' not in history.commands()
+    assert [entry["command"] for entry in history.search('deploy')] == ['make deploy']
+
+
+def test_shared_logs_pick_up_other_writers(log_dir):
+    first = CommandHistory('test', log_dir, shared=True)
+    second = CommandHistory('test', log_dir, shared=True)
+    first.record('one')
+    second.record('two')
+    first.record('three')
+    assert first.commands() == second.commands() == ['one', 'two', 'three']
+
+
+def test_a_damaged_line_is_skipped(log_dir):
+    history = CommandHistory('test', log_dir)
+    history.record('before')
+    with open(history.path, 'a', encoding='utf-8') as f:
+        f.write('{"command": "cut off\n')
+    history.record('after')
+    assert CommandHistory('test', log_dir).commands() == ['before', 'after']
+
+
+def test_history_grep(api):
+    api.execute_command('echo needle')
+    api.execute_command('pwd')
+    output = api.execute_command('history grep needle')["output"]
+    assert output.endswith('echo needle') and 'pwd' not in output
+    assert api.execute_command('history grep')["exit_code"] == 1
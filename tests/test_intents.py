@@ -0,0 +1,96 @@
+import pytest
+
+import intents
+
+
+@pytest.fixture(scope='module')
+def classifier():
+    return intents.get_classifier()
+
+
+def local(*names):
+    return lambda name: name in names
+
+
+@pytest.mark.parametrize('word, expected', [
+    ('folder', 'folder'),
+    # A letter missing, one too many, substituted and swapped
+    ('foldr', 'folder'),
+    ('memorry', 'memory'),
+    ('memery', 'memory'),
+    ('fodler', 'folder'),
+    ('flies', 'files'),
+    # Short words are only taken as they are
+    ('fi', None),
+    ('xyzzy', None),
+])
+def test_correct(classifier, word, expected):
+    assert classifier.correct(word) == expected
+
+
+def test_split_separates_entities_from_intent_words(classifier):
+    assert classifier.split('creat a foldr called notes', local()) == (
+        ['create', 'a', 'folder', 'called'], ['notes'])
+    # Paths, local names and unknown words are entities
+    assert classifier.split('move ./a.txt to src', local('src')) == (['move', 'to'], ['./a.txt', 'src'])
+    assert classifier.split('delete files', local('files')) == (['delete'], ['files'])
+    assert classifier.split('search for text TODO in notes', local()) == (
+        ['search', 'for', 'text', 'in'], ['TODO', 'notes'])
+
+
+def test_classify_scores_against_the_closest_phrasing(classifier):
+    intent, similarity = classifier.classify('show my files')
+    assert intent == 'list_files' and similarity == pytest.approx(1.0)
+    assert classifier.classify('') == (None, 0.0)
+
+
+@pytest.mark.parametrize('utterance, names, command', [
+    ('creat a foldr called reports', (), 'mkdir reports'),
+    ('make a new foldr named reports', (), 'mkdir reports'),
+    ('delet notes.txt', (), 'rm notes.txt'),
+    ('move notes.txt to src', ('src',), 'mv notes.txt src'),
+    ('copy notes.txt into backup', (), 'cp notes.txt backup'),
+    ('go into src', ('src',), 'cd src'),
+    ('shwo my flies', (), 'ls'),
+    ('list files in src', ('src',), 'ls src'),
+    ('serch for files named main', (), "find . -name '*main*'"),
+    ('search for text TODO in notes.txt', (), "grep 'TODO' notes.txt"),
+    ('debug notes.txt', (), 'codemate debug notes.txt'),
+    ('how much memry', (), 'free'),
+    ('cpu laod', (), 'cpu'),
+    ('tell me about my sistem', (), 'system_info'),
+])
+def test_translate(classifier, utterance, names, command):
+    assert classifier.translate(utterance, local(*names)) == command
+
+
+@pytest.mark.parametrize('utterance', [
+    # Leftover words mean the request was about something else
+    'what time does the bakery open',
+    # A lone intent word must be close ("dogs" is one edit from "docs")
+    'dogs in x',
+    # Missing entities
+    'delete',
+    'move notes.txt',
+    # Nothing but filler or unknown words
+    'please',
+    'xyzzy plugh',
+])
+def test_unrelated_or_incomplete_requests_are_not_translated(classifier, utterance):
+    assert classifier.translate(utterance) is None
+
+
+def test_the_classifier_is_built_once():
+    assert intents.get_classifier() is intents.get_classifier()
+
+
+def test_custom_intents():
+    classifier = intents.IntentClassifier({'greet': (("say hello",), "echo hello {0}", 1)})
+    assert classifier.translate('say helo bob') == 'echo hello bob'
+    assert classifier.translate('list files') is None
+
+
+def test_terminal_falls_back_to_the_classifier(api, tmp_path):
+    (tmp_path / 'docs').mkdir()
+    assert api.process_natural_language('opne foldr docs') == 'cd docs'
+    assert api.process_natural_language('what time does the bakery open') is None
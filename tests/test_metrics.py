@@ -0,0 +1,81 @@
+import pytest
+
+from metrics import DEFAULT_BUCKETS_MS, Histogram, MetricsRegistry, _endpoint_label
+
+
+def test_observations_land_in_the_bucket_of_their_upper_bound():
+    histogram = Histogram()
+    for value in (0.05, 0.06, 1.0, 1e6):
+        histogram.observe(value)
+    assert histogram.counts[0] == 1  # <= 0.05
+    assert histogram.counts[1] == 1  # <= 0.1
+    assert histogram.counts[DEFAULT_BUCKETS_MS.index(1)] == 1
+    assert histogram.counts[-1] == 1  # +Inf
+    assert (histogram.count, histogram.min, histogram.max) == (4, 0.05, 1e6)
+
+
+def test_percentiles_interpolate_inside_a_bucket():
+    histogram = Histogram(bounds=(10, 20))
+    for value in range(11, 21):
+        histogram.observe(value)
+    # All ten observations fall in (10, 20]
+    assert histogram.percentile(50) == pytest.approx(15)
+    assert histogram.percentile(90) == pytest.approx(19)
+    assert histogram.percentile(100) == 20
+
+
+def test_percentiles_stay_within_the_observed_range():
+    histogram = Histogram()
+    histogram.observe(3.0)
+    assert histogram.percentile(1) == 3.0
+    assert histogram.percentile(99) == 3.0
+    assert Histogram().percentile(50) == 0.0
+
+
+def test_summary():
+    registry = MetricsRegistry()
+    registry.record_command('ls', 'builtin', 0, 0.002, 2, 100)
+    registry.record_command('ls', 'builtin', 1, 0.004, 2, 10)
+    [command] = registry.snapshot()["commands"]
+    assert command["command"] == 'ls' and command["count"] == 2
+    assert command["outcomes"] == {"0": 1, "1": 1}
+    assert (command["bytes_in"], command["bytes_out"]) == (4, 110)
+    assert command["mean_ms"] == pytest.approx(3.0)
+
+
+def test_series_beyond_the_cap_are_folded_into_other():
+    registry = MetricsRegistry(max_series=3)
+    for i in range(10):
+        registry.record_request(f'/api/route{i}', 'GET', 200, 0.001)
+    endpoints = {(entry["endpoint"], entry["count"]) for entry in registry.snapshot()["requests"]}
+    assert endpoints == {('/api/route0', 1), ('/api/route1', 1), ('/api/route2', 1), ('other', 7)}
+
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry(enabled=False)
+    registry.record_request('/api/terminal', 'GET', 200, 0.001)
+    assert registry.snapshot()["requests"] == []
+
+
+@pytest.mark.parametrize('path, label', [
+    ('/api/jobs/3f2a91c0', '/api/jobs/:id'),
+    ('/api/upload/abc123?offset=1048576', '/api/upload/:id'),
+    ('/api/output/9c1e?offset=0&limit=10', '/api/output/:handle'),
+    ('/api/jobs', '/api/jobs'),
+    ('/api/jobs/', '/api/jobs/'),
+    ('/api/execute?profile=cpu', '/api/execute'),
+    ('/index.html', 'static'),
+    ('/', 'static'),
+])
+def test_endpoint_labels(path, label):
+    assert _endpoint_label(path) == label
+
+
+def test_prometheus_output():
+    registry = MetricsRegistry()
+    registry.record_request('/api/execute', 'POST', 200, 0.0002)
+    text = registry.to_prometheus()
+    assert ('codemate_request_duration_seconds_bucket{endpoint="/api/execute",method="POST",le="0.00025"} 1'
+            in text)
+    assert 'codemate_request_duration_seconds_bucket{endpoint="/api/execute",method="POST",le="+Inf"} 1' in text
+    assert 'codemate_requests_total{endpoint="/api/execute",method="POST",status="200"} 1' in text
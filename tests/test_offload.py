@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+import offload
+
+
+@pytest.fixture
+def tree(tmp_path):
+    files = ['top.txt', 'src/a.py', 'src/b.py', 'src/pkg/c.py', 'src/pkg/sub/d.py', 'src/tools/e.py',
+             'docs/index.md', 'docs/api/f.md', 'empty/.keep']
+    for name in files:
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(name)
+    return tmp_path
+
+
+def sequential_find(root, pattern):
+    results = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        results.extend(os.path.join(dirpath, name) for name in sorted(filenames) if pattern in name)
+    return results
+
+
+def test_one_level_is_enough_for_a_small_target(tree):
+    assert offload.split_tree(str(tree), target_chunks=2) == [
+        (str(tree), False),
+        (str(tree / 'docs'), True),
+        (str(tree / 'empty'), True),
+        (str(tree / 'src'), True),
+    ]
+
+
+def test_a_tree_under_a_single_directory_still_fans_out(tmp_path):
+    for i in range(6):
+        (tmp_path / 'src' / f'mod{i}').mkdir(parents=True)
+        (tmp_path / 'src' / f'mod{i}' / 'x.py').write_text('')
+    chunks = offload.split_tree(str(tmp_path), target_chunks=4)
+    assert chunks == ([(str(tmp_path), False), (str(tmp_path / 'src'), False)]
+                      + [(str(tmp_path / 'src' / f'mod{i}'), True) for i in range(6)])
+
+
+def test_splitting_stops_when_the_tree_runs_out_of_directories(tree):
+    chunks = offload.split_tree(str(tree), target_chunks=1000)
+    assert chunks == [(str(tree / path), False) for path in
+                      ['', 'docs', 'docs/api', 'empty', 'src', 'src/pkg', 'src/pkg/sub', 'src/tools']]
+
+
+@pytest.mark.parametrize('target', [1, 2, 5, 1000])
+def test_chunk_results_concatenate_to_a_sequential_walk(tree, target):
+    chunks = offload.split_tree(str(tree), target_chunks=target)
+    found = offload.merge_limited(offload.run_chunks(offload.find_chunk, chunks, '.', 100), None)
+    assert found == sequential_find(str(tree), '.')
+    sizes = offload.run_chunks(offload.size_chunk, chunks)
+    assert sum(sizes) == sum(len(str(path.relative_to(tree))) for path in tree.rglob('*') if path.is_file())
+
+
+def test_find_chunk_glob_and_limit(tree):
+    assert offload.find_chunk(str(tree), True, '*.md', 10, glob=True) == [
+        str(tree / 'docs' / 'index.md'), str(tree / 'docs' / 'api' / 'f.md')]
+    assert offload.find_chunk(str(tree), False, '*.md', 10, glob=True) == []
+    assert len(offload.find_chunk(str(tree), True, '.py', 2)) == 2
+
+
+def test_merge_limited():
+    assert offload.merge_limited([['a', 'b'], [], ['c', 'd']], 3) == ['a', 'b', 'c']
+    assert offload.merge_limited([['a'], ['b']], None) == ['a', 'b']
+
+
+def test_the_process_pool_returns_results_in_chunk_order(tree, monkeypatch):
+    monkeypatch.setenv('CODEMATE_OFFLOAD_WORKERS', '2')
+    monkeypatch.setattr(offload, '_pool_disabled', False)
+    offload.shutdown_pool()
+    try:
+        if offload.get_executor() is None:
+            pytest.skip("process pool unavailable here")
+        chunks = offload.split_tree(str(tree), target_chunks=5)
+        found = offload.merge_limited(offload.run_chunks(offload.find_chunk, chunks, '.', 100), None)
+        assert found == sequential_find(str(tree), '.')
+    finally:
+        offload.shutdown_pool()
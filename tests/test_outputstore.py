@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+from outputstore import OutputError, OutputStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return OutputStore(str(tmp_path / 'outputs'), inline_bytes=64, max_bytes=64 * 1024)
+
+
+def read_all(store, info, limit):
+    """Every page after the inline head, as decoded strings."""
+    pages, offset = [], info["next_offset"]
+    while True:
+        page = store.read(info["handle"], offset, limit)
+        pages.append(page["data"])
+        if page["eof"]:
+            return pages
+        assert page["next_offset"] > offset
+        offset = page["next_offset"]
+
+
+def test_short_output_is_not_stored(store, tmp_path):
+    assert store.put("hello\n") == ("hello\n", None)
+    assert not os.path.exists(tmp_path / 'outputs')
+
+
+def test_pages_never_split_a_character(store):
+    # Two-, three- and four-byte characters, no line breaks to cut at
+    text = "ü€😀" * 200
+    head, info = store.put(text)
+    assert info is not None and info["complete"]
+    assert info["stored_bytes"] == len(text.encode('utf-8'))
+    pages = read_all(store, info, limit=7)
+    assert all('�' not in page for page in [head] + pages)
+    assert head + ''.join(pages) == text
+
+
+def test_pages_end_after_a_line_break(store):
+    text = "".join(f"line {i:04d}\n" for i in range(500))
+    head, info = store.put(text)
+    pages = read_all(store, info, limit=100)
+    assert head.endswith('\n')
+    assert all(page.endswith('\n') for page in pages)
+    assert head + ''.join(pages) == text
+
+
+def test_output_beyond_the_store_limit_is_cut_off(tmp_path):
+    store = OutputStore(str(tmp_path), inline_bytes=64, max_bytes=1000)
+    _, info = store.put("x" * 5000)
+    assert (info["stored_bytes"], info["complete"]) == (1000, False)
+
+
+def test_oldest_outputs_are_evicted_to_stay_within_the_limit(tmp_path):
+    store = OutputStore(str(tmp_path), inline_bytes=64, max_bytes=500)
+    infos = [store.put(str(i) * 200)[1] for i in range(4)]
+    with pytest.raises(OutputError) as error:
+        store.read(infos[0]["handle"])
+    assert error.value.status == 404
+    assert store.read(infos[-1]["handle"])["data"] == "3" * 200
+    total = sum(entry.stat().st_size for entry in os.scandir(tmp_path))
+    assert total <= 500
+
+
+def test_bad_handles_and_offsets_are_rejected(store):
+    _, info = store.put("y" * 1000)
+    with pytest.raises(OutputError) as error:
+        store.read("../../etc/passwd")
+    assert error.value.status == 404
+    with pytest.raises(OutputError) as error:
+        store.read(info["handle"], 1001)
+    assert error.value.status == 400
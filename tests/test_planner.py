@@ -0,0 +1,36 @@
+"""Multi-step natural-language requests, run end to end through execute_command."""
+
+import pytest
+
+
+@pytest.fixture
+def project(tmp_path):
+    (tmp_path / 'src').mkdir()
+    (tmp_path / 'src' / 'main.py').write_text('print("hi")\n')
+    (tmp_path / 'src' / 'util.py').write_text('')
+    (tmp_path / 'readme.md').write_text('')
+    return tmp_path
+
+
+def test_list_then_go_to_src_and_find_main(api, project):
+    result = api.execute_command('list files then go to src and find main', natural_language=True)
+    assert [step["command"].split()[0] for step in result["plan"]] == ['ls', 'cd', 'find']
+    assert result["exit_code"] == 0, result["output"]
+    assert 'Step 1:' in result["output"] and 'readme.md' in result["output"]
+    assert str(project / 'src' / 'main.py') in result["output"]
+    assert 'util.py' not in result["output"]
+    assert api.current_path == str(project / 'src')
+
+
+def test_a_failing_step_stops_the_plan(api, project):
+    result = api.execute_command('go to nowhere then find main', natural_language=True)
+    assert result["exit_code"] != 0
+    assert 'main.py' not in result["output"]
+    assert api.current_path == str(project)
+
+
+def test_find_files_intent_runs(api, project):
+    result = api.execute_command('serch for files named main', natural_language=True)
+    assert result["ai_translation"] == "find . -name '*main*'"
+    assert result["exit_code"] == 0
+    assert str(project / 'src' / 'main.py') in result["output"]
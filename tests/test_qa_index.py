@@ -0,0 +1,38 @@
+import pytest
+
+from qa_index import QAIndex, load_entries
+
+
+@pytest.fixture(scope='module')
+def index():
+    return QAIndex(load_entries())
+
+
+def questions(matches):
+    return [entry["question"] for _, entry in matches]
+
+
+def test_on_topic_questions_are_answered(index):
+    assert questions(index.search('how do I create a folder'))[0] == 'how to create a folder'
+    assert 'how to see memory usage' in questions(index.search('how much memory is used'))
+
+
+def test_misspelled_words_are_corrected(index):
+    assert questions(index.search('creat a foldr'))[0] == 'how to create a folder'
+
+
+@pytest.mark.parametrize('question', ['what is python', 'how do i cook pasta', 'what is the weather today'])
+def test_off_topic_questions_get_no_answer(index, question):
+    assert index.search(question) == []
+
+
+def test_related_answers_stay_on_topic(index):
+    found = questions(index.search('how do i list files'))
+    assert found[0] == 'how to list files'
+    assert 'how to list running processes' not in found
+
+
+def test_ask_reports_when_nothing_matches(api):
+    result = api.execute_command('ask what is python')
+    assert "I don't understand the question" in result["output"]
+    assert 'codemate docs' not in result["output"]
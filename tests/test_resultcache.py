@@ -0,0 +1,115 @@
+import threading
+import time
+
+import pytest
+
+from resultcache import ResultCache, read_only
+
+
+def test_concurrent_requests_share_one_computation():
+    cache = ResultCache()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return "result"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('key', 10, compute)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while cache.stats()["coalesced"] < 7 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ["result"] * 8
+    assert cache.stats() == {"entries": 1, "hits": 0, "misses": 1, "coalesced": 7}
+
+
+def test_entries_expire_after_their_ttl():
+    cache = ResultCache()
+    values = iter(range(10))
+    assert cache.get_or_compute('key', 60, lambda: next(values)) == 0
+    assert cache.get_or_compute('key', 60, lambda: next(values)) == 0
+    assert cache.get_or_compute('other', 0, lambda: next(values)) == 1
+    assert cache.get_or_compute('other', 0, lambda: next(values)) == 2
+
+
+def test_errors_are_not_cached():
+    cache = ResultCache()
+
+    def fail():
+        raise OSError("flaky")
+
+    with pytest.raises(OSError):
+        cache.get_or_compute('key', 60, fail)
+    assert cache.get_or_compute('key', 60, lambda: "ok") == "ok"
+
+
+def test_failed_results_are_not_cached(monkeypatch):
+    monkeypatch.setattr('resultcache.results', ResultCache())
+
+    class Builtins:
+        current_path = '/'
+        present = False
+
+        @read_only(ttl=60)
+        def _cmd_lookup_for_tests(self, args):
+            return ("found", 0) if self.present else ("missing", 1)
+
+    builtins = Builtins()
+    assert builtins._cmd_lookup_for_tests(['x']) == ("missing", 1)
+    builtins.present = True
+    assert builtins._cmd_lookup_for_tests(['x']) == ("found", 0)
+    builtins.present = False
+    assert builtins._cmd_lookup_for_tests(['x']) == ("found", 0)
+
+
+def test_a_missing_path_listed_by_ls_shows_up_once_created(api, tmp_path):
+    assert api.execute_command('ls later')["exit_code"] != 0
+    (tmp_path / 'later').mkdir()
+    (tmp_path / 'later' / 'file.txt').write_text('')
+    result = api.execute_command('ls later')
+    assert result["exit_code"] == 0 and 'file.txt' in result["output"]
+
+
+def test_least_recently_used_entries_are_dropped():
+    cache = ResultCache(max_entries=2)
+    cache.get_or_compute('a', None, lambda: 1)
+    cache.get_or_compute('b', None, lambda: 2)
+    cache.get_or_compute('a', None, lambda: 0)
+    cache.get_or_compute('c', None, lambda: 3)
+    assert cache.get_or_compute('a', None, lambda: 0) == 1
+    assert cache.get_or_compute('b', None, lambda: 0) == 0
+
+
+def test_read_only_keys_include_the_version():
+    class Builtins:
+        current_path = '/'
+        version = 1
+        calls = 0
+
+        @read_only(ttl=60, version=lambda self: self.version)
+        def _cmd_listing_for_tests(self, args):
+            self.calls += 1
+            return f"v{self.version}", 0
+
+    builtins = Builtins()
+    assert builtins._cmd_listing_for_tests([]) == ("v1", 0)
+    # Another instance at the same version has counted different changes
+    other = Builtins()
+    other.version = 1
+    other.calls = 0
+    assert other._cmd_listing_for_tests([]) == ("v1", 0)
+    assert other.calls == 1
+    assert builtins._cmd_listing_for_tests([]) == ("v1", 0)
+    builtins.version = 2
+    assert builtins._cmd_listing_for_tests([]) == ("v2", 0)
+    assert builtins.calls == 2
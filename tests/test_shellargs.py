@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+from shellargs import expand, tokenize
+
+
+def list_dir(path):
+    return sorted((entry.name, entry.is_dir()) for entry in os.scandir(path))
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for name in ('a.py', 'b.py', 'c d.py', '.hidden.py', 'notes.txt', 'sub/x.py', 'sub/y.txt'):
+        path = tmp_path / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(name)
+    return tmp_path
+
+
+def args(command, cwd):
+    return expand(tokenize(command), str(cwd), list_dir, start=1)
+
+
+def test_wildcards_expand_sorted_without_dotfiles(tree):
+    assert args('rm *.py', tree) == ['rm', 'a.py', 'b.py', 'c d.py']
+    assert args('rm .*.py', tree) == ['rm', '.hidden.py']
+    assert args('ls ?.py', tree) == ['ls', 'a.py', 'b.py']
+    assert args('ls [ab].py', tree) == ['ls', 'a.py', 'b.py']
+
+
+def test_quoted_or_escaped_wildcards_are_literal(tree):
+    assert args('rm "*.py"', tree) == ['rm', '*.py']
+    assert args("rm '*.py'", tree) == ['rm', '*.py']
+    assert args(r'rm \*.py', tree) == ['rm', '*.py']
+    assert args('rm "c d".py *.txt', tree) == ['rm', 'c d.py', 'notes.txt']
+
+
+def test_quotes_keep_spaces_in_one_argument(tree):
+    assert args('cat "c d.py" a.py', tree) == ['cat', 'c d.py', 'a.py']
+    assert args("cat 'c d.py'", tree) == ['cat', 'c d.py']
+
+
+def test_patterns_across_directories(tree):
+    assert args('cat sub/*.py', tree) == ['cat', 'sub/x.py']
+    assert args('ls */', tree) == ['ls', 'sub/']
+    assert args('cat */*.txt', tree) == ['cat', 'sub/y.txt']
+    assert args(f'cat {tree}/sub/*.txt', tree) == ['cat', f'{tree}/sub/y.txt']
+
+
+def test_unmatched_patterns_are_kept(tree):
+    assert args('rm *.zip', tree) == ['rm', '*.zip']
+    assert args('rm nosuchdir/*', tree) == ['rm', 'nosuchdir/*']
+
+
+def test_unbalanced_quotes_fall_back_to_whitespace_splitting():
+    assert tokenize('echo "unterminated here') == ['echo', '"unterminated', 'here']
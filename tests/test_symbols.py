@@ -0,0 +1,210 @@
+import ast
+import os
+import textwrap
+
+import pytest
+
+import symbols
+from fswatch import BaseWatcher
+
+MODULE = '''
+    """Shapes and their areas."""
+
+    import math
+    from .units import metres
+
+    SCALE = 2
+    default_name = 'shape'
+
+
+    class Shape:
+        """Base of all shapes."""
+
+        def area(self):
+            return 0
+
+        class Meta:
+            def describe(cls, verbose=False):
+                pass
+
+
+    class Circle(Shape):
+        def area(self):
+            """Area of the circle."""
+            import functools
+            return math.pi * self.r ** 2
+
+
+    async def load(path, *, strict=True):
+        return path
+'''
+
+
+class ManualWatcher(BaseWatcher):
+    """Reports only the changes a test announces."""
+
+    tracks_file_changes = True
+
+    def _add_root(self, root, recursive):
+        return True
+
+    def _remove_root(self, root, recursive):
+        pass
+
+    def change(self, path):
+        self._notify(path)
+
+
+@pytest.fixture
+def project(tmp_path):
+    root = tmp_path / 'project'
+    (root / 'pkg').mkdir(parents=True)
+    (root / 'pyproject.toml').write_text('')
+    (root / 'pkg' / 'shapes.py').write_text(textwrap.dedent(MODULE))
+    (root / 'main.py').write_text('def main():\n    pass\n')
+    # Skipped directories are not indexed
+    (root / '.venv').mkdir()
+    (root / '.venv' / 'shapes.py').write_text('class Circle:\n    pass\n')
+    return root
+
+
+def edit(path, text):
+    """Rewrite a file and make sure its mtime moves even on coarse clocks."""
+    mtime_ns = path.stat().st_mtime_ns
+    path.write_text(text)
+    os.utime(path, ns=(mtime_ns + 10**9, mtime_ns + 10**9))
+
+
+def test_symbols_from_tree_lists_definitions_in_source_order():
+    entry = symbols.symbols_from_tree(ast.parse(textwrap.dedent(MODULE)))
+    assert entry["doc"] == "Shapes and their areas."
+    assert entry["imports"] == ['.units', 'functools', 'math']
+    assert [(s["parent"], s["name"], s["kind"], s["line"]) for s in entry["symbols"]] == [
+        ('', 'SCALE', 'constant', 7),
+        ('', 'Shape', 'class', 11),
+        ('Shape', 'area', 'method', 14),
+        ('Shape', 'Meta', 'class', 17),
+        ('Shape.Meta', 'describe', 'method', 18),
+        ('', 'Circle', 'class', 22),
+        ('Circle', 'area', 'method', 23),
+        ('', 'load', 'async function', 29),
+    ]
+    by_line = {s["line"]: s for s in entry["symbols"]}
+    assert by_line[11]["doc"] == "Base of all shapes."
+    assert by_line[22]["signature"] == "(Shape)"
+    assert by_line[18]["signature"] == "(cls, verbose=False)"
+    assert by_line[29]["signature"] == "(path, *, strict=True)"
+
+
+def test_unparsable_files_are_indexed_empty(tmp_path):
+    path = tmp_path / 'broken.py'
+    path.write_text('def broken(:\n')
+    entry = symbols.symbols_chunk(str(path))
+    assert entry["symbols"] == [] and entry["error"]
+    assert "Could not parse" in symbols.format_outline(str(path), entry)
+
+
+def test_find_project_root(project, tmp_path):
+    assert symbols.find_project_root(str(project / 'pkg')) == str(project)
+    # Without markers the directory itself is the root
+    (tmp_path / 'loose').mkdir()
+    assert symbols.find_project_root(str(tmp_path / 'loose')) == str(tmp_path / 'loose')
+    assert symbols.find_project_root(os.sep) is None
+
+
+def test_lookup_by_name_and_class_method(project):
+    index = symbols.SymbolIndex(str(project))
+    shapes = os.path.join('pkg', 'shapes.py')
+    assert [(rel, s["parent"]) for rel, s in index.lookup('area')] == [(shapes, 'Shape'), (shapes, 'Circle')]
+    assert [s["parent"] for _, s in index.lookup('Circle.area')] == ['Circle']
+    assert [s["parent"] for _, s in index.lookup('Meta.describe')] == ['Shape.Meta']
+    assert [(rel, s["kind"]) for rel, s in index.lookup('circle')] == [(shapes, 'class')]
+    # No exact name: substring matches
+    assert [s["name"] for _, s in index.lookup('ma')] == ['main']
+    assert index.lookup('Square.area') == []
+    assert index.stats() == {"root": str(project), "files": 2, "symbols": 9, "watching": False}
+
+
+def test_periodic_rescans_pick_up_edits_and_removals(project, monkeypatch):
+    index = symbols.SymbolIndex(str(project))
+    assert index.lookup('main')
+    monkeypatch.setattr(symbols, 'SCAN_INTERVAL', 0)
+
+    edit(project / 'main.py', 'def run():\n    pass\n')
+    (project / 'pkg' / 'extra.py').write_text('class Extra:\n    pass\n')
+    assert index.refresh() == 2
+    assert [s["name"] for _, s in index.lookup('main')] == []
+    assert index.lookup('run') and index.lookup('Extra')
+
+    (project / 'pkg' / 'extra.py').unlink()
+    assert index.refresh() == 1
+    assert index.lookup('Extra') == []
+    # Nothing changed, nothing re-parsed
+    assert index.refresh() == 0
+
+
+def test_with_file_events_only_reported_directories_are_rescanned(project):
+    watcher = ManualWatcher()
+    index = symbols.SymbolIndex(str(project), watcher=watcher)
+    assert index.stats()["watching"]
+    assert index.refresh() == 2
+
+    (project / 'pkg' / 'extra.py').write_text('def extra():\n    pass\n')
+    assert index.refresh() == 0 and index.lookup('extra') == []
+    watcher.change(str(project / 'pkg'))
+    assert [s["name"] for _, s in index.lookup('extra')] == ['extra']
+
+    # A new subdirectory is walked in full
+    (project / 'pkg' / 'sub' / 'deep').mkdir(parents=True)
+    (project / 'pkg' / 'sub' / 'deep' / 'inner.py').write_text('INNER = 1\n')
+    watcher.change(str(project / 'pkg'))
+    assert index.lookup('INNER')
+
+    # Events inside skipped directories are ignored
+    watcher.change(str(project / '.venv'))
+    assert index.refresh() == 0
+
+    index.close()
+    assert not index.stats()["watching"]
+
+
+def test_the_index_is_saved_and_loaded_by_a_later_process(project, tmp_path):
+    index_path = symbols.index_path_for(str(tmp_path / 'state'), str(project))
+    index = symbols.SymbolIndex(str(project), index_path)
+    assert index.refresh() == 2
+    index.close()
+    assert os.path.exists(index_path)
+
+    later = symbols.SymbolIndex(str(project), index_path)
+    assert later.stats()["files"] == 2
+    # Loaded entries are current, so nothing is parsed again
+    assert later.refresh() == 0
+    assert later.lookup('Circle')
+
+    # An index saved for another root is ignored
+    other = symbols.SymbolIndex(str(tmp_path), index_path)
+    assert other.files == {}
+
+
+def test_format_symbol():
+    symbol = {"name": "area", "kind": "method", "line": 23, "parent": "Circle",
+              "signature": "(self)", "doc": "Area of the circle."}
+    assert symbols.format_symbol('pkg/shapes.py', symbol) == \
+        "pkg/shapes.py:23: method Circle.area(self)  # Area of the circle."
+
+
+def test_symbols_builtin(api, project):
+    api.current_path = str(project / 'pkg')
+    try:
+        result = api.execute_command('symbols Circle.area')
+        assert result["exit_code"] == 0
+        assert os.path.join('pkg', 'shapes.py') + ":23: method Circle.area(self)  # Area of the circle." in result["output"]
+        assert "1 match in" in result["output"]
+
+        result = api.execute_command('symbols Missing')
+        assert result["exit_code"] == 1 and "no definition of 'Missing'" in result["output"]
+
+        result = api.execute_command('symbols')
+        assert result["exit_code"] == 0 and "9 symbols in 2 files" in result["output"]
+    finally:
+        symbols._indexes.pop(str(project)).close()
@@ -0,0 +1,223 @@
+import ast
+import textwrap
+
+import pytest
+
+import testgen
+
+MODULE = '''
+    """Parsing helpers."""
+
+
+    def parse(text, strict=False, *, encoding, errors=None):
+        """Parse text into tokens."""
+        return text.split()
+
+
+    async def fetch(url, /, timeout=5):
+        return url
+
+
+    def _private():
+        pass
+
+
+    class Parser:
+        def __init__(self, grammar):
+            self.grammar = grammar
+
+        def feed(self, chunk):
+            return chunk
+
+        @staticmethod
+        def version(major):
+            return major
+
+        def _reset(self):
+            pass
+
+
+    class Empty:
+        pass
+
+
+    class _Hidden:
+        def run(self):
+            pass
+'''
+
+
+@pytest.fixture
+def package(tmp_path):
+    """tmp_path/src/pkg/text.py inside a package, with tmp_path/src/tests next to it."""
+    pkg = tmp_path / 'src' / 'pkg'
+    pkg.mkdir(parents=True)
+    (pkg / '__init__.py').write_text('')
+    (pkg / 'text.py').write_text(textwrap.dedent(MODULE))
+    (tmp_path / 'src' / 'tests').mkdir()
+    return pkg
+
+
+def parse(source):
+    return ast.parse(textwrap.dedent(source))
+
+
+def test_public_definitions():
+    definitions = testgen.public_definitions(parse(MODULE))
+    assert [(node.name, [m.name for m in methods]) for node, methods in definitions] == [
+        ('parse', []), ('fetch', []), ('Parser', ['__init__', 'feed', 'version']), ('Empty', [])]
+
+
+def test_module_name_and_import_root_climb_through_packages(package, tmp_path):
+    path = str(package / 'text.py')
+    assert testgen.module_name(path) == 'pkg.text'
+    assert testgen.import_root(path) == str(tmp_path / 'src')
+    assert testgen.module_name(str(package / '__init__.py')) == 'pkg'
+    assert testgen.module_name(str(tmp_path / 'loose.py')) == 'loose'
+
+
+def test_find_test_file(package, tmp_path):
+    path = str(package / 'text.py')
+    assert testgen.find_test_file(path) is None
+    # ../tests relative to the module's directory
+    (tmp_path / 'src' / 'tests' / 'test_text.py').write_text('')
+    assert testgen.find_test_file(path) == str(tmp_path / 'src' / 'tests' / 'test_text.py')
+    # Next to the module wins
+    (package / 'text_test.py').write_text('')
+    assert testgen.find_test_file(path) == str(package / 'text_test.py')
+    # A test file is its own test file
+    assert testgen.find_test_file(str(package / 'text_test.py')) == str(package / 'text_test.py')
+
+
+def test_collect_tests():
+    tree = parse('''
+        def test_a(): pass
+        def helper(): pass
+        async def test_b(): pass
+        class TestThing:
+            def test_c(self): pass
+            def setup_method(self): pass
+        class Helper:
+            def test_d(self): pass
+    ''')
+    assert testgen.collect_tests(tree) == ['test_a', 'test_b', 'TestThing::test_c']
+
+
+def test_call_examples_name_only_required_arguments():
+    definitions = {node.name: (node, methods) for node, methods in testgen.public_definitions(parse(MODULE))}
+    assert testgen._call_example(definitions['parse'][0]) == 'parse(text=..., encoding=...)'
+    # Positional-only arguments cannot be passed by name
+    assert testgen._call_example(definitions['fetch'][0]) == 'fetch(...)'
+    _, feed, version = definitions['Parser'][1]
+    assert testgen._call_example(feed, bound=True) == 'feed(chunk=...)'
+    # staticmethods have no self to drop
+    assert testgen._call_example(version, bound=True) == 'version(major=...)'
+
+
+def test_generated_skeletons(package):
+    path = str(package / 'text.py')
+    source, count = testgen.generate_tests(path, parse(MODULE))
+    assert count == 6
+    compile(source, 'test_text.py', 'exec')
+    assert source.startswith("import asyncio\nimport pytest\n\nfrom pkg.text import parse, fetch, Parser, Empty\n")
+    assert testgen.collect_tests(ast.parse(source)) == [
+        'test_parse', 'test_fetch', 'TestParser::test_init', 'TestParser::test_feed',
+        'TestParser::test_version', 'TestEmpty::test_create']
+    assert '"""Parse text into tokens."""' in source
+    assert 'result = asyncio.run(fetch(...))' in source
+    assert 'instance = Parser(grammar=...)' in source
+    assert 'result = Parser(...).feed(chunk=...)' in source
+    assert '_private' not in source and '_Hidden' not in source and '_reset' not in source
+
+
+def test_existing_tests_are_left_out(package):
+    path = str(package / 'text.py')
+    existing = parse('''
+        def test_parse(): pass
+        def test_fetch(): pass
+        class TestParser:
+            def test_init(self): pass
+            def test_feed(self): pass
+    ''')
+    source, count = testgen.generate_tests(path, parse(MODULE), existing)
+    assert count == 2
+    assert 'asyncio' not in source
+    assert "from pkg.text import Parser, Empty\n" in source
+    assert testgen.collect_tests(ast.parse(source)) == ['TestParser::test_version', 'TestEmpty::test_create']
+
+    covered = parse('''
+        def test_parse(): pass
+        def test_fetch(): pass
+        class TestParser:
+            def test_init(self): pass
+            def test_feed(self): pass
+            def test_version(self): pass
+        class TestEmpty:
+            def test_create(self): pass
+    ''')
+    assert testgen.generate_tests(path, parse(MODULE), covered) == ("", 0)
+
+
+def test_run_tests_reports_every_outcome(package, tmp_path):
+    test_file = tmp_path / 'src' / 'tests' / 'test_text.py'
+    test_file.write_text(textwrap.dedent('''
+        import pytest
+
+        from pkg.text import parse
+
+
+        def test_passes():
+            assert parse("a b", encoding="utf-8") == ["a", "b"]
+
+
+        def test_fails():
+            assert parse("a", encoding="utf-8") == []
+
+
+        @pytest.mark.parametrize("text", ["a", "b"])
+        def test_cases(text):
+            assert parse(text, encoding="utf-8") == [text]
+
+
+        class TestParser:
+            def test_skipped(self):
+                pytest.skip("later")
+    '''))
+    ids = testgen.collect_tests(ast.parse(test_file.read_text()))
+    results, processes = testgen.run_tests(str(test_file), ids, 2, testgen.import_root(str(package / 'text.py')))
+    assert processes == 2
+    assert {test_id: result["outcome"] for test_id, result in results.items()} == {
+        'test_passes': 'passed', 'test_fails': 'failed', 'test_cases[a]': 'passed',
+        'test_cases[b]': 'passed', 'TestParser::test_skipped': 'skipped'}
+    assert results['TestParser::test_skipped']["message"] == 'later'
+
+    output, exit_code = testgen.format_run(str(test_file), ids, results, processes, 0.5)
+    assert exit_code == 1
+    assert output.startswith(f"Ran 5 tests from {test_file} in 0.50s (2 processes)")
+    assert output.splitlines()[-1] == "1 failed, 3 passed, 1 skipped"
+
+
+def test_format_run_reports_tests_pytest_never_ran():
+    results = {'test_a': {"outcome": "passed", "time": 0.2, "message": ""}}
+    output, exit_code = testgen.format_run('test_x.py', ['test_a', 'test_b'], results, 1, 0.2)
+    assert exit_code == 1
+    assert "ERROR      0.000s  test_b" in output and "not reported by pytest" in output
+
+
+def test_codemate_test_command(api, package, tmp_path):
+    api.current_path = str(package)
+    result = api.execute_command('codemate test text.py')
+    assert result["exit_code"] == 0
+    assert result["output"].startswith("# 6 test stubs for text.py\n")
+
+    (tmp_path / 'src' / 'tests' / 'test_text.py').write_text(
+        'from pkg.text import parse\n\n\ndef test_parse():\n    assert parse("x", encoding=None) == ["x"]\n')
+    result = api.execute_command('codemate test text.py')
+    assert result["output"].startswith("# 5 test stubs for text.py; tests already in ")
+    assert 'def test_parse' not in result["output"]
+
+    result = api.execute_command('codemate test text.py --run')
+    assert result["exit_code"] == 0 and "1 passed" in result["output"]
+
+    result = api.execute_command('codemate test missing.py')
+    assert result["exit_code"] == 1 and "File not found" in result["output"]
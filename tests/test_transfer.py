@@ -0,0 +1,97 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from transfer import MIN_CHUNK_SIZE, UploadError, UploadManager
+
+CHUNK = MIN_CHUNK_SIZE
+
+
+def sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def send(uploads, upload_id, data, offset, chunk=CHUNK, digest=None):
+    piece = data[offset:offset + chunk]
+    return uploads.write_chunk(upload_id, offset, len(piece), io.BytesIO(piece), digest or sha256(piece))
+
+
+@pytest.fixture
+def data():
+    return os.urandom(CHUNK * 2 + 100)
+
+
+@pytest.fixture
+def uploads(tmp_path):
+    return UploadManager(str(tmp_path / 'state'))
+
+
+def test_chunks_are_committed_in_order_and_the_file_moved_into_place(tmp_path, uploads, data):
+    target = tmp_path / 'upload.bin'
+    status = uploads.start(str(target), len(data), CHUNK)
+    for offset in range(0, len(data), CHUNK):
+        assert not target.exists()
+        status = send(uploads, status['upload_id'], data, offset)
+    assert status['complete'] and status['offset'] == len(data)
+    assert target.read_bytes() == data
+    assert [p.name for p in tmp_path.iterdir() if p.name.startswith('.')] == []
+
+
+def test_starting_again_resumes_from_the_committed_offset(tmp_path, data):
+    target = str(tmp_path / 'upload.bin')
+    first = UploadManager(str(tmp_path / 'state'))
+    upload_id = first.start(target, len(data), CHUNK)['upload_id']
+    send(first, upload_id, data, 0)
+
+    # A new manager, as after a server restart, finds the unfinished upload
+    restarted = UploadManager(str(tmp_path / 'state'))
+    status = restarted.start(target, len(data), CHUNK)
+    assert (status['upload_id'], status['offset']) == (upload_id, CHUNK)
+    for offset in range(CHUNK, len(data), CHUNK):
+        status = send(restarted, upload_id, data, offset)
+    assert status['complete']
+    with open(target, 'rb') as f:
+        assert f.read() == data
+
+
+def test_a_chunk_at_the_wrong_offset_is_rejected_with_the_committed_one(uploads, tmp_path, data):
+    upload_id = uploads.start(str(tmp_path / 'upload.bin'), len(data), CHUNK)['upload_id']
+    with pytest.raises(UploadError) as error:
+        send(uploads, upload_id, data, CHUNK)
+    assert (error.value.status, error.value.offset) == (409, 0)
+    assert uploads.status(upload_id)['offset'] == 0
+
+
+def test_a_short_chunk_is_rejected(uploads, tmp_path, data):
+    upload_id = uploads.start(str(tmp_path / 'upload.bin'), len(data), CHUNK)['upload_id']
+    with pytest.raises(UploadError, match='must be'):
+        send(uploads, upload_id, data, 0, chunk=CHUNK - 1)
+    assert uploads.status(upload_id)['offset'] == 0
+
+
+def test_a_hash_mismatch_does_not_move_the_offset(uploads, tmp_path, data):
+    upload_id = uploads.start(str(tmp_path / 'upload.bin'), len(data), CHUNK)['upload_id']
+    with pytest.raises(UploadError, match='hash mismatch') as error:
+        send(uploads, upload_id, data, 0, digest=sha256(b'something else'))
+    assert error.value.offset == 0
+    assert uploads.status(upload_id)['offset'] == 0
+    # Sending the chunk again intact succeeds
+    assert send(uploads, upload_id, data, 0)['offset'] == CHUNK
+
+
+def test_a_chunk_without_a_hash_is_rejected(uploads, tmp_path, data):
+    upload_id = uploads.start(str(tmp_path / 'upload.bin'), len(data), CHUNK)['upload_id']
+    piece = data[:CHUNK]
+    with pytest.raises(UploadError, match='X-Chunk-SHA256'):
+        uploads.write_chunk(upload_id, 0, len(piece), io.BytesIO(piece), None)
+
+
+def test_chunks_after_completion_are_refused(uploads, tmp_path):
+    data = b'small file'
+    upload_id = uploads.start(str(tmp_path / 'small.txt'), len(data), CHUNK)['upload_id']
+    assert send(uploads, upload_id, data, 0)['complete']
+    with pytest.raises(UploadError) as error:
+        send(uploads, upload_id, data, 0)
+    assert (error.value.status, error.value.offset) == (409, len(data))
@@ -0,0 +1,144 @@
+import json
+import time
+
+import pytest
+
+from jobs import JobRegistry
+from trash import PURGE_PREFIX, Trash
+
+
+def wait_for(registry, job_ids):
+    deadline = time.monotonic() + 10
+    while any(registry.get(job_id)["status"] == 'running' for job_id in job_ids):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / 'work' / 'project'
+    (root / 'src' / 'pkg').mkdir(parents=True)
+    for i in range(20):
+        (root / 'src' / 'pkg' / f'm{i}.py').write_text('x')
+    return root
+
+
+@pytest.fixture
+def registry():
+    return JobRegistry()
+
+
+def test_delete_moves_the_tree_away_and_restore_brings_it_back(tmp_path, tree, registry):
+    trash = Trash('session_a', registry, trash_dir=str(tmp_path / 'trash'), retention=60)
+    entry_id = trash.delete(str(tree))
+    assert entry_id and not tree.exists()
+    assert [entry["id"] for entry in trash.entries()] == [entry_id]
+
+    assert trash.restore(entry_id) == str(tree)
+    assert (tree / 'src' / 'pkg' / 'm19.py').read_text() == 'x'
+    assert trash.entries() == []
+    # The emptied session directory goes too
+    assert not (tmp_path / 'trash' / 'session_a').exists()
+
+
+def test_restore_does_not_overwrite(tmp_path, tree, registry):
+    trash = Trash('session_a', registry, trash_dir=str(tmp_path / 'trash'), retention=60)
+    entry_id = trash.delete(str(tree))
+    tree.mkdir()
+    with pytest.raises(FileExistsError):
+        trash.restore(entry_id)
+    with pytest.raises(KeyError):
+        trash.restore('missing')
+
+
+def test_without_retention_entries_are_purged_in_the_background(tmp_path, tree, registry):
+    trash = Trash('session_a', registry, trash_dir=str(tmp_path / 'trash'), retention=0)
+    trash.delete(str(tree))
+    jobs = registry.list()
+    assert len(jobs) == 1
+    wait_for(registry, [jobs[0]["id"]])
+    assert registry.get(jobs[0]["id"])["exit_code"] == 0
+    assert trash.entries() == []
+    assert not (tmp_path / 'trash' / 'session_a').exists()
+
+
+def test_empty_purges_entries_still_in_retention(tmp_path, tree, registry):
+    trash = Trash('session_a', registry, trash_dir=str(tmp_path / 'trash'), retention=3600)
+    trash.delete(str(tree))
+    job_ids = trash.purge_expired(force=True)
+    assert len(job_ids) == 1
+    wait_for(registry, job_ids)
+    assert trash.entries() == []
+
+
+def expire(trash_dir, session_id, entry_id):
+    """Move an entry's recorded expiry into the past."""
+    info_path = trash_dir / session_id / entry_id / 'info.json'
+    info = json.loads(info_path.read_text())
+    info["expires_at"] = time.time() - 1
+    info_path.write_text(json.dumps(info))
+
+
+def test_a_later_process_sweeps_what_earlier_sessions_left(tmp_path, tree, registry):
+    trash_dir = tmp_path / 'trash'
+    entry_id = Trash('session_old', registry, trash_dir=str(trash_dir), retention=3600).delete(str(tree))
+    expire(trash_dir, 'session_old', entry_id)
+    # A purge the old process claimed but did not finish
+    claimed = trash_dir / 'session_old' / (PURGE_PREFIX + 'deadbeef') / 'payload' / 'deep'
+    claimed.mkdir(parents=True)
+
+    later = Trash('session_new', registry, trash_dir=str(trash_dir), retention=3600)
+    assert later.entries() == []
+    assert later.entries(all_sessions=True) != []
+    assert later.sweep(resume=True) == 2
+    assert later.entries(all_sessions=True) == []
+    assert not (trash_dir / 'session_old').exists()
+
+
+def test_entries_keep_the_retention_they_were_deleted_under(tmp_path, tree, registry):
+    trash_dir = str(tmp_path / 'trash')
+    entry_id = Trash('session_old', registry, trash_dir=trash_dir, retention=3600).delete(str(tree))
+    # A process without retention does not cut that short
+    later = Trash('session_new', registry, trash_dir=trash_dir, retention=0)
+    assert later.sweep(resume=True) == 0
+    assert [entry["id"] for entry in later.entries(all_sessions=True)] == [entry_id]
+
+
+def test_other_sessions_entries_without_a_recorded_expiry_are_kept(tmp_path, tree, registry):
+    trash_dir = tmp_path / 'trash'
+    entry_id = Trash('session_old', registry, trash_dir=str(trash_dir), retention=3600).delete(str(tree))
+    info_path = trash_dir / 'session_old' / entry_id / 'info.json'
+    info = json.loads(info_path.read_text())
+    del info["expires_at"]
+    info_path.write_text(json.dumps(info))
+
+    later = Trash('session_new', registry, trash_dir=str(trash_dir), retention=0)
+    assert later.sweep() == 0
+    assert [entry["expires_at"] for entry in later.entries(all_sessions=True)] == [None]
+
+
+def test_the_main_trash_directory_is_used_on_the_same_filesystem(tmp_path, tree, registry):
+    trash = Trash('session_a', registry, trash_dir=str(tmp_path / 'trash'), retention=3600)
+    trash.delete(str(tree / 'src'))
+    assert (tmp_path / 'trash' / 'session_a').is_dir()
+    assert not any(path.name == '.codemate-trash' for path in tmp_path.rglob('*'))
+    assert not (tmp_path / 'trash' / 'roots.list').exists()
+
+
+def test_nothing_is_trashed_into_the_tree_being_deleted(tmp_path, registry):
+    home = tmp_path / 'home'
+    (home / 'docs').mkdir(parents=True)
+    trash = Trash('session_a', registry, trash_dir=str(home / '.codemate' / 'trash'), retention=3600)
+    assert trash.delete(str(home)) is None
+    assert not any(path.name == '.codemate-trash' for path in tmp_path.rglob('*'))
+
+
+def test_trash_directories_elsewhere_are_indexed(tmp_path, tree, registry):
+    trash_dir = tmp_path / 'trash'
+    trash = Trash('session_a', registry, trash_dir=str(trash_dir), retention=3600)
+    base = str(tmp_path / 'elsewhere' / '.codemate-trash')
+    trash._remember_base(base)
+    trash._remember_base(base)
+    assert (trash_dir / 'roots.list').read_text() == base + '\n'
+    # A later process reads the index
+    assert base in Trash('session_b', registry, trash_dir=str(trash_dir))._all_bases()